@@ -7,13 +7,56 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-import cv2
-import numpy as np
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, WebSocket
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from functools import partial
+from typing import List
+import asyncio
 import io
+import json
+import lzma
+import struct
+import tarfile
+import time
+import zipfile
+import zlib
 
-# Importamos apenas a função de OCR do nosso utilitário
-from util_debian import ler_placas2
+# O modelo de OCR não é carregado neste processo quando há workers: cada
+# processo do pool importa o util_debian por conta própria
+import cronometragem
+from lote_ocr import LoteadorOCR, FilaCheia
+from pool_ocr import PoolOCR, NUM_WORKERS_OCR, processar_lote_bytes
+from resultados_ocr import ArmazemResultados
+from metricas import RegistroMetricas, MetricasOCR
+from servidor_prefork import memoria_processo
+
+# Tempo máximo (s) que uma requisição fica presa esperando o OCR (wait=true / long-poll)
+ESPERA_MAX_RESULTADO_S = float(os.getenv("ESPERA_MAX_RESULTADO_S", "30"))
+# Tamanho máximo de um upload (bytes) e valor do Retry-After quando a fila está cheia
+TAMANHO_MAX_UPLOAD = int(os.getenv("TAMANHO_MAX_UPLOAD", str(5 * 1024 * 1024)))
+RETRY_AFTER_S = int(os.getenv("OCR_RETRY_AFTER_S", "1"))
+# Máximo de imagens aceitas em uma única requisição de lote
+LOTE_MAX_ARQUIVOS = int(os.getenv("LOTE_MAX_ARQUIVOS", "1000"))
+# Rotas de uma imagem por requisição, com admissão e limite de tamanho antes de ler o corpo
+ROTAS_UPLOAD_UNICO = ("/processar_imagem/",)
+MARGEM_MULTIPART = 64 * 1024  # Cabeçalhos e delimitadores do multipart além da imagem
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+EXTENSOES_COMPACTADAS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+ERRO_IMAGEM_GRANDE = f"Imagem maior que o limite de {TAMANHO_MAX_UPLOAD} bytes."
+# O que zipfile/tarfile (e os descompressores por baixo) levantam com um arquivo corrompido ou truncado
+ERROS_COMPACTADO = (zipfile.BadZipFile, tarfile.TarError, zlib.error, lzma.LZMAError, EOFError, OSError)
+
+# WebSocket de câmera: quadros binários com cabeçalho (tipo, seq, largura, altura)
+# em big-endian seguido do conteúdo. Tipo 0 = imagem codificada (JPEG, PNG...),
+# largura/altura ignorados; tipo 1 = tons de cinza crus com largura*altura bytes.
+CABECALHO_QUADRO = struct.Struct("!BIHH")
+QUADRO_CODIFICADO = 0
+QUADRO_CINZA_CRU = 1
+# Quadros de uma mesma conexão em OCR ao mesmo tempo; uma câmera rápida não ocupa a fila toda
+WS_MAX_PENDENTES = int(os.getenv("WS_MAX_PENDENTES", "4"))
 
 
 # --- Criação da Aplicação FastAPI ---
@@ -23,47 +66,537 @@ app = FastAPI(
     description="Serviço para reconhecimento de placas, sem dependências externas.",
 )
 
-# --- Nossa função de processamento pesado ---
-def tarefa_de_ocr(imagem_bytes: bytes, nome_arquivo: str):
-    """Esta função será executada em segundo plano."""
+# Executor do OCR: pool de processos (OCR_WORKERS > 0) ou, com OCR_WORKERS=0,
+# o estágio de micro-lotes numa thread deste mesmo processo.
+# Tamanho e espera máximos dos lotes via OCR_LOTE_MAX / OCR_LOTE_ESPERA_MS.
+if NUM_WORKERS_OCR > 0:
+    executor_ocr = PoolOCR(NUM_WORKERS_OCR)
+else:
+    from util_debian import aquecer_ocr
+    executor_ocr = LoteadorOCR(processar_lote_bytes, aquecer=aquecer_ocr)
+
+# Resultados por job_id (limite de tamanho e TTL via RESULTADOS_MAX / RESULTADOS_TTL_S)
+armazem_resultados = ArmazemResultados()
+
+# Métricas expostas em /metrics (formato Prometheus)
+registro_metricas = RegistroMetricas()
+metricas_ocr = MetricasOCR(registro_metricas)
+registro_metricas.medidor(
+    "ocr_fila_jobs", "Jobs aceitos e ainda não concluídos (fila + OCR em andamento)",
+    funcao=lambda: executor_ocr.admissao.resumo()["ocupados"],
+)
+registro_metricas.medidor(
+    "ocr_fila_capacidade", "Capacidade da fila de admissão do OCR",
+    funcao=lambda: executor_ocr.admissao.capacidade,
+)
+executor_ocr.estatisticas.observadores.append(metricas_ocr.tamanho_lote.observar)
+if NUM_WORKERS_OCR == 0:
+    # Com o pool, cada worker tem o próprio cache e filtro; os acertos aparecem em ocr_etapa_segundos{etapa="cache"}
+    from util_debian import cache_ocr, filtro_presenca
+    if cache_ocr is not None:
+        cache_ocr.registrar_metricas(registro_metricas)
+    if filtro_presenca is not None:
+        filtro_presenca.registrar_metricas(registro_metricas)
+
+
+@app.on_event("startup")
+def iniciar_executor_ocr():
+    executor_ocr.iniciar()
+    if cronometragem.CRONOMETRAGEM:
+        # kill -USR1 <pid da API> imprime os tempos por etapa; com o pool, eles estão nos workers
+        cronometragem.instalar_sinal(repassar=getattr(executor_ocr, "pids_workers", None))
+
+
+@app.on_event("shutdown")
+def parar_executor_ocr():
+    executor_ocr.parar()
+
+
+# --- Registro do resultado do processamento pesado ---
+def registrar_resultado_ocr(nome_arquivo: str, futuro):
+    """Chamada quando o OCR de uma imagem termina (no pool ou na thread de lotes)."""
     try:
-        print(f"[INFO] Iniciando processamento em background para: {nome_arquivo}")
-        nparr = np.frombuffer(imagem_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+        resultado = futuro.result()
+    except Exception as e:
+        print(f"[ERRO] Erro inesperado no OCR para {nome_arquivo}: {e}")
+        return
 
-        if img is None:
-            print(f"[ERRO] Falha ao decodificar imagem na tarefa de fundo: {nome_arquivo}")
-            return
+    if resultado.get("erro"):
+        print(f"[ERRO] {resultado['erro']}: {nome_arquivo}")
+        return
 
-        texto, confianca = ler_placas2(img)
-        if texto and confianca:
-            # Imprimimos o resultado diretamente no log do contêiner
-            print("--- RESULTADO DO OCR ---")
-            print(f"Placa Lida: {texto}")
-            print(f"Confiança: {confianca:.4f}")
-            print("------------------------")
-        else:
-            print(f"[INFO] OCR não encontrou placa com confiança suficiente para o arquivo: {nome_arquivo}")
+    texto, confianca = resultado["placa"], resultado["confianca"]
+    if texto and confianca:
+        # Imprimimos o resultado diretamente no log do contêiner
+        print("--- RESULTADO DO OCR ---")
+        print(f"Placa Lida: {texto}")
+        print(f"Confiança: {confianca:.4f}")
+        print("------------------------")
+    else:
+        print(f"[INFO] OCR não encontrou placa com confiança suficiente para o arquivo: {nome_arquivo}")
 
+
+def observar_job(inicio: float, futuro):
+    """Registra nas métricas o resultado e os tempos por etapa de um job."""
+    try:
+        resultado = futuro.result()
     except Exception as e:
-        print(f"[ERRO] Erro inesperado na tarefa de background para {nome_arquivo}: {e}")
+        resultado = {"erro": str(e)}
+    metricas_ocr.observar_resultado(resultado, time.monotonic() - inicio)
+
+
+def submeter_ocr(carga):
+    """Submete ao executor com as métricas ligadas. Levanta FilaCheia (já contada)."""
+    try:
+        futuro = executor_ocr.submeter(carga)
+    except FilaCheia:
+        metricas_ocr.leituras.inc(resultado="rejeitado")
+        raise
+    futuro.add_done_callback(partial(observar_job, time.monotonic()))
+    return futuro
+
+
+def erro_fila_cheia():
+    return HTTPException(
+        status_code=429,
+        detail="Fila de OCR cheia. Tente novamente em instantes.",
+        headers={"Retry-After": str(RETRY_AFTER_S)},
+    )
+
+
+class AdmissaoUploadMiddleware:
+    """
+    Admissão e limite de tamanho das ROTAS_UPLOAD_UNICO antes de o corpo ser lido.
+    O FastAPI lê e guarda o multipart inteiro antes de chamar o endpoint, então
+    checar a fila ou o tamanho lá dentro não poupa memória nem I/O. Aqui a fila
+    cheia (429) e o Content-Length acima do limite (413) são respondidos só com
+    os cabeçalhos; sem Content-Length (chunked), o corpo é lido no máximo até o limite.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in ROTAS_UPLOAD_UNICO:
+            await self.app(scope, receive, send)
+            return
+
+        if executor_ocr.admissao.cheia():
+            executor_ocr.admissao.registrar_rejeitado()
+            metricas_ocr.leituras.inc(resultado="rejeitado")
+            resposta = JSONResponse(status_code=429, content={"detail": "Fila de OCR cheia. Tente novamente em instantes."},
+                                    headers={"Retry-After": str(RETRY_AFTER_S)})
+            await resposta(scope, receive, send)
+            return
+
+        limite = TAMANHO_MAX_UPLOAD + MARGEM_MULTIPART
+        tamanho = dict(scope["headers"]).get(b"content-length")
+        if tamanho is not None:
+            if not tamanho.isdigit():
+                await JSONResponse(status_code=400, content={"detail": "Content-Length inválido."})(scope, receive, send)
+            elif int(tamanho) > limite:
+                await JSONResponse(status_code=413, content={"detail": ERRO_IMAGEM_GRANDE})(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        # Sem Content-Length: guarda as partes até o fim do corpo ou até passar do limite
+        mensagens = []
+        recebido = 0
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] != "http.request":
+                return  # Cliente desconectou
+            recebido += len(mensagem.get("body", b""))
+            if recebido > limite:
+                await JSONResponse(status_code=413, content={"detail": ERRO_IMAGEM_GRANDE})(scope, receive, send)
+                return
+            mensagens.append(mensagem)
+            if not mensagem.get("more_body", False):
+                break
+
+        async def repetir_corpo():
+            return mensagens.pop(0) if mensagens else await receive()
+
+        await self.app(scope, repetir_corpo, send)
+
+
+app.add_middleware(AdmissaoUploadMiddleware)
 
 
 # --- Endpoint Principal da API ---
 @app.post("/processar_imagem/")
-async def processar_imagem_endpoint(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def processar_imagem_endpoint(
+    file: UploadFile = File(...),
+    wait: bool = Query(False, description="Espera o OCR terminar e devolve a placa na própria resposta"),
+    timeout: float = Query(ESPERA_MAX_RESULTADO_S, ge=0, description="Espera máxima em segundos quando wait=true"),
+):
     """
-    Recebe uma imagem, responde imediatamente e agenda o processamento de OCR.
+    Recebe uma imagem e agenda o processamento de OCR.
+    Responde na hora com o job_id ou, com wait=true, com o resultado do OCR.
+    Com a fila de OCR cheia responde 429 com o cabeçalho Retry-After; a fila e
+    o tamanho são checados antes de o corpo ser lido (AdmissaoUploadMiddleware).
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Arquivo inválido. Apenas imagens são aceitas.")
 
-    contents = await file.read()
-    background_tasks.add_task(tarefa_de_ocr, contents, file.filename)
+    # O Content-Length já passou pelo middleware; aqui vale o tamanho exato da imagem
+    contents = await file.read(TAMANHO_MAX_UPLOAD + 1)
+    if len(contents) > TAMANHO_MAX_UPLOAD:
+        raise HTTPException(status_code=413, detail=ERRO_IMAGEM_GRANDE)
+
+    try:
+        futuro = submeter_ocr(contents)
+    except FilaCheia:
+        raise erro_fila_cheia()
+    print(f"[INFO] Agendando processamento para: {file.filename}")
+    futuro.add_done_callback(partial(registrar_resultado_ocr, file.filename))
+    job = armazem_resultados.novo_job(file.filename, futuro)
+
+    if wait:
+        job = await armazem_resultados.aguardar(job["job_id"], min(timeout, ESPERA_MAX_RESULTADO_S)) or job
+        return job
 
-    return {"message": "Imagem recebida e agendada para processamento."}
+    return {"message": "Imagem recebida e agendada para processamento.", "job_id": job["job_id"]}
+
+# --- Envio em lote (várias imagens ou um .zip/.tar) ---
+def eh_arquivo_compactado(upload: UploadFile):
+    nome = (upload.filename or "").lower()
+    return nome.endswith(EXTENSOES_COMPACTADAS) or upload.content_type in (
+        "application/zip", "application/x-zip-compressed", "application/x-tar", "application/gzip", "application/x-gzip",
+    )
+
+
+class ArquivoCompactadoInvalido(Exception):
+    """O .zip/.tar do lote não pôde ser aberto ou terminou no meio (corrompido, truncado ou de outro tipo)."""
+
+
+def validar_arquivo_compactado(arquivo):
+    """
+    Abre o .zip (diretório central) ou o .tar (cabeçalho do primeiro membro) antes
+    de responder, para um arquivo inválido virar 400 e não um 200 com corpo vazio.
+    """
+    try:
+        arquivo.seek(0)
+        if zipfile.is_zipfile(arquivo):
+            arquivo.seek(0)
+            with zipfile.ZipFile(arquivo):
+                pass
+        else:
+            arquivo.seek(0)
+            with tarfile.open(fileobj=arquivo, mode="r|*"):
+                pass  # Em modo "r|" o open já lê o primeiro membro
+    except ERROS_COMPACTADO as e:
+        raise ArquivoCompactadoInvalido(f"Arquivo compactado inválido: {e}") from e
+    finally:
+        arquivo.seek(0)
+
+
+def iterar_arquivo_compactado(arquivo):
+    """
+    Percorre as imagens de um .zip ou .tar (com ou sem compressão) direto do
+    arquivo do upload, sem extrair nada para o disco. Gera (nome, bytes, erro).
+    Levanta ArquivoCompactadoInvalido se o arquivo se mostrar corrompido no meio.
+    """
+    try:
+        yield from _iterar_membros(arquivo)
+    except ERROS_COMPACTADO as e:
+        raise ArquivoCompactadoInvalido(f"Arquivo compactado corrompido ou truncado: {e}") from e
+
+
+def _iterar_membros(arquivo):
+    arquivo.seek(0)
+    if zipfile.is_zipfile(arquivo):
+        arquivo.seek(0)
+        with zipfile.ZipFile(arquivo) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(EXTENSOES_IMAGEM):
+                    continue
+                if info.file_size > TAMANHO_MAX_UPLOAD:
+                    yield info.filename, None, ERRO_IMAGEM_GRANDE
+                    continue
+                yield info.filename, zf.read(info), None
+        return
+
+    arquivo.seek(0)
+    # Modo "r|*": leitura sequencial do tar, sem precisar de seek entre os membros
+    with tarfile.open(fileobj=arquivo, mode="r|*") as tar:
+        for membro in tar:
+            if not membro.isfile() or not membro.name.lower().endswith(EXTENSOES_IMAGEM):
+                continue
+            if membro.size > TAMANHO_MAX_UPLOAD:
+                yield membro.name, None, ERRO_IMAGEM_GRANDE
+                continue
+            yield membro.name, tar.extractfile(membro).read(), None
+
+
+def iterar_uploads(arquivos):
+    """Gera (nome, bytes, erro) para cada (nome, content_type, arquivo) de assumir_arquivos()."""
+    for nome, content_type, arquivo in arquivos:
+        if not (content_type or "").startswith("image/"):
+            yield nome, None, "Arquivo inválido. Apenas imagens são aceitas."
+            continue
+        conteudo = arquivo.read(TAMANHO_MAX_UPLOAD + 1)
+        if len(conteudo) > TAMANHO_MAX_UPLOAD:
+            yield nome, None, ERRO_IMAGEM_GRANDE
+            continue
+        yield nome, conteudo, None
+
+
+def assumir_arquivos(files: List[UploadFile]):
+    """
+    Tira os arquivos temporários do multipart das mãos do FastAPI. Na versão
+    fixada em requirements.txt eles são fechados assim que o endpoint retorna,
+    antes de o StreamingResponse ler o primeiro arquivo. Retorna
+    [(nome, content_type, arquivo)]; quem chama fecha com fechar_arquivos().
+    """
+    arquivos = []
+    for upload in files:
+        arquivos.append((upload.filename, upload.content_type, upload.file))
+        upload.file = io.BytesIO()  # É este que o FastAPI fecha ao sair do endpoint
+    return arquivos
+
+
+def fechar_arquivos(arquivos):
+    for _, _, arquivo in arquivos:
+        arquivo.close()
+
+
+async def submeter_aguardando_vaga(conteudo: bytes, timeout: float):
+    """
+    Dentro de um lote, a fila cheia não derruba a requisição: espera abrir vaga
+    (até timeout segundos). Retorna o Future do OCR ou None se desistiu.
+    """
+    limite = asyncio.get_running_loop().time() + timeout
+    while True:
+        try:
+            return executor_ocr.submeter(conteudo)
+        except FilaCheia:
+            if asyncio.get_running_loop().time() >= limite:
+                metricas_ocr.leituras.inc(resultado="rejeitado")
+                return None
+            await asyncio.sleep(0.05)
+
+
+def linha_ndjson(dados: dict):
+    return json.dumps(dados, ensure_ascii=False) + "\n"
+
+
+async def gerar_resultados_lote(entradas, nome_lote=None):
+    """
+    Submete as imagens à medida que são lidas e emite uma linha NDJSON por
+    arquivo assim que o OCR dela termina (a ordem segue a conclusão). Se o
+    arquivo compactado se mostrar corrompido no meio, as imagens já lidas
+    terminam e a última linha traz o erro (o status 200 já foi enviado).
+    """
+    pendentes = {}  # Future do asyncio -> job_id
+    total = 0
+    erro_lote = None
+    try:
+        async for nome, conteudo, erro in entradas:
+            total += 1
+            if total > LOTE_MAX_ARQUIVOS:
+                yield linha_ndjson({"arquivo": nome, "status": "rejeitado", "erro": f"Lote limitado a {LOTE_MAX_ARQUIVOS} imagens"})
+                continue
+            if erro:
+                yield linha_ndjson({"arquivo": nome, "status": "erro", "erro": erro})
+                continue
+
+            futuro = await submeter_aguardando_vaga(conteudo, ESPERA_MAX_RESULTADO_S)
+            if futuro is None:
+                yield linha_ndjson({"arquivo": nome, "status": "rejeitado", "erro": "Fila de OCR cheia"})
+                continue
+            futuro.add_done_callback(partial(observar_job, time.monotonic()))
+            futuro.add_done_callback(partial(registrar_resultado_ocr, nome))
+            job = armazem_resultados.novo_job(nome, futuro)
+            pendentes[asyncio.wrap_future(futuro)] = job["job_id"]
+
+            # Emite o que já terminou enquanto o restante do lote ainda está sendo lido
+            for concluido in [f for f in pendentes if f.done()]:
+                yield linha_ndjson(armazem_resultados.obter(pendentes.pop(concluido)) or {})
+    except ArquivoCompactadoInvalido as e:
+        print(f"[WARN] Lote {nome_lote}: {e}")
+        erro_lote = str(e)
+
+    while pendentes:
+        concluidos, _ = await asyncio.wait(pendentes, timeout=ESPERA_MAX_RESULTADO_S, return_when=asyncio.FIRST_COMPLETED)
+        if not concluidos:
+            # Timeout: devolve o estado atual (pendente) dos que faltam; seguem consultáveis em /resultado
+            for job_id in pendentes.values():
+                yield linha_ndjson(armazem_resultados.obter(job_id) or {"job_id": job_id, "status": "pendente"})
+            break
+        for concluido in concluidos:
+            yield linha_ndjson(armazem_resultados.obter(pendentes.pop(concluido)) or {})
+
+    if erro_lote is not None:
+        yield linha_ndjson({"arquivo": nome_lote, "status": "erro", "erro": erro_lote})
+
+
+@app.post("/processar_lote/")
+async def processar_lote_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Recebe várias imagens num único multipart, ou um único .zip/.tar com as
+    imagens, e devolve os resultados por arquivo em NDJSON (uma linha por
+    imagem, enviada assim que o OCR dela termina).
+    """
+    compactado = len(files) == 1 and eh_arquivo_compactado(files[0])
+    arquivos = assumir_arquivos(files)
+    nome_lote = None
+    if compactado:
+        nome_lote = arquivos[0][0]
+        try:
+            await run_in_threadpool(validar_arquivo_compactado, arquivos[0][2])
+        except ArquivoCompactadoInvalido as e:
+            fechar_arquivos(arquivos)
+            raise HTTPException(status_code=400, detail=str(e))
+        entradas = iterate_in_threadpool(iterar_arquivo_compactado(arquivos[0][2]))
+    else:
+        entradas = iterate_in_threadpool(iterar_uploads(arquivos))
+    # Os arquivos são lidos enquanto o corpo é enviado; a BackgroundTask roda depois do último byte
+    return StreamingResponse(gerar_resultados_lote(entradas, nome_lote), media_type="application/x-ndjson",
+                             background=BackgroundTask(fechar_arquivos, arquivos))
+
+# --- Streaming contínuo de câmeras por WebSocket ---
+def interpretar_quadro(mensagem: bytes):
+    """Separa cabeçalho e conteúdo. Retorna (seq, carga para o executor, erro)."""
+    if len(mensagem) < CABECALHO_QUADRO.size:
+        return None, None, "Quadro menor que o cabeçalho"
+    tipo, seq, largura, altura = CABECALHO_QUADRO.unpack_from(mensagem)
+    conteudo = mensagem[CABECALHO_QUADRO.size:]
+    if len(conteudo) > TAMANHO_MAX_UPLOAD:
+        return seq, None, ERRO_IMAGEM_GRANDE
+    if tipo == QUADRO_CODIFICADO:
+        return seq, conteudo, None
+    if tipo == QUADRO_CINZA_CRU:
+        if largura * altura != len(conteudo) or largura == 0:
+            return seq, None, "Tamanho do quadro cru não confere com largura x altura"
+        return seq, (conteudo, (altura, largura)), None
+    return seq, None, f"Tipo de quadro desconhecido: {tipo}"
+
+
+@app.websocket("/ws/camera")
+async def camera_websocket(websocket: WebSocket, camera: str = "sem_nome"):
+    """
+    Mantém uma conexão aberta por câmera. Cada mensagem binária é um quadro
+    (ver CABECALHO_QUADRO); o resultado volta como JSON na mesma conexão, com o
+    seq do quadro, assim que o OCR termina (a ordem segue a conclusão).
+    Controle de fluxo: no máximo WS_MAX_PENDENTES quadros por conexão em OCR;
+    atingido o limite o servidor para de ler a conexão até algum terminar.
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+    vagas = asyncio.Semaphore(WS_MAX_PENDENTES)
+    saida = asyncio.Queue()
+    print(f"[INFO] Câmera conectada via WebSocket: {camera}")
+
+    async def enviar_resultados():
+        while True:
+            mensagem = await saida.get()
+            if mensagem is None:
+                return
+            await websocket.send_json(mensagem)
+
+    def ao_concluir(seq, inicio, futuro):
+        # Roda na thread que concluiu o OCR; devolve o resultado para o event loop
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            resultado = {"erro": str(e)}
+        mensagem = {"seq": seq, "latencia_ms": round((time.monotonic() - inicio) * 1000, 1)}
+        if resultado.get("erro"):
+            mensagem.update(status="expirado" if resultado.get("expirado") else "erro", erro=resultado["erro"])
+        else:
+            mensagem.update(status="concluido", placa=resultado.get("placa"), confianca=resultado.get("confianca"))
+        loop.call_soon_threadsafe(saida.put_nowait, mensagem)
+        loop.call_soon_threadsafe(vagas.release)
+
+    tarefa_envio = asyncio.create_task(enviar_resultados())
+    try:
+        while True:
+            await vagas.acquire()
+            mensagem = await websocket.receive()
+            if mensagem["type"] == "websocket.disconnect":
+                break
+            if mensagem.get("bytes") is None:
+                vagas.release()
+                await saida.put({"seq": None, "status": "erro", "erro": "Envie quadros binários"})
+                continue
+
+            seq, carga, erro = interpretar_quadro(mensagem["bytes"])
+            if erro:
+                vagas.release()
+                await saida.put({"seq": seq, "status": "erro", "erro": erro})
+                continue
+            try:
+                futuro = submeter_ocr(carga)
+            except FilaCheia:
+                # Para câmera ao vivo é melhor descartar o quadro do que atrasar os próximos
+                vagas.release()
+                await saida.put({"seq": seq, "status": "rejeitado", "erro": "Fila de OCR cheia"})
+                continue
+            futuro.add_done_callback(partial(ao_concluir, seq, time.monotonic()))
+    except Exception as e:
+        print(f"[WARN] Conexão WebSocket da câmera {camera} encerrada com erro: {e}")
+    finally:
+        saida.put_nowait(None)
+        tarefa_envio.cancel()
+        print(f"[INFO] Câmera desconectada: {camera}")
+
+# --- Resultado de um job (long-poll) ---
+@app.get("/resultado/{job_id}")
+async def resultado_endpoint(
+    job_id: str,
+    timeout: float = Query(ESPERA_MAX_RESULTADO_S, ge=0, description="Espera máxima em segundos pelo fim do OCR"),
+):
+    """
+    Devolve o estado do job. Se o OCR ainda não terminou, segura a requisição
+    até ele terminar ou até o timeout (status continua "pendente").
+    """
+    job = await armazem_resultados.aguardar(job_id, min(timeout, ESPERA_MAX_RESULTADO_S))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado.")
+    return job
 
 # --- Endpoint de verificação de saúde (Health Check) ---
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+# --- Prontidão: só aceita tráfego depois do aquecimento do OCR ---
+@app.get("/ready")
+def ready_check():
+    """
+    /health diz apenas que o processo está vivo; /ready responde 200 só depois
+    que o modelo foi carregado e aquecido (OCR_AQUECIMENTO_*), e 503 antes disso.
+    """
+    erro_inicio = getattr(executor_ocr, "erro_inicio", None)
+    if erro_inicio:
+        return JSONResponse(status_code=503, content={"status": "erro", "erro": erro_inicio})
+    if not executor_ocr.pronto():
+        return JSONResponse(status_code=503, content={"status": "aquecendo"})
+    return {"status": "pronto", "aquecimento_s": executor_ocr.duracao_aquecimento}
+
+# --- Distribuição dos tamanhos de lote do OCR ---
+@app.get("/estatisticas/lote")
+def estatisticas_lote():
+    return executor_ocr.estatisticas.resumo()
+
+# --- Estado do executor de OCR (pool de processos ou thread de lotes) ---
+@app.get("/estatisticas/executor")
+def estatisticas_executor():
+    return executor_ocr.resumo()
+
+# --- Memória deste processo (no servidor_prefork, do worker que atendeu) ---
+@app.get("/estatisticas/memoria")
+def estatisticas_memoria():
+    return {"pid": os.getpid(), **memoria_processo()}
+
+# --- Métricas no formato Prometheus ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registro_metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# --- Ocupação do armazém de resultados ---
+@app.get("/estatisticas/resultados")
+def estatisticas_resultados():
+    return armazem_resultados.resumo()
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Mede a memória alocada por imagem no ler_placas2 com e sem o pré-processamento
+direto (util_debian.PREPROCESSAMENTO_DIRETO), usando tracemalloc.
+
+Para cada imagem: pico de memória alocada acima da linha de base durante a
+chamada (o NumPy e o OpenCV alocam pelo alocador rastreado pelo tracemalloc),
+além do tempo médio e das coletas do gc geradas.
+
+Uso:
+    python benchmark_alocacoes.py --sinteticas 200
+    python benchmark_alocacoes.py --pasta teste --repeticoes 3
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmark_ocr import carregar_imagens
+
+
+def medir(util_debian, imagens, repeticoes):
+    picos_leitura = []
+    picos_preprocessamento = []
+    coletas_antes = sum(estatistica["collections"] for estatistica in gc.get_stats())
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for _, img, _ in imagens:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            util_debian.preprocessar_placa(img, reutilizar_buffer=True)
+            picos_preprocessamento.append(tracemalloc.get_traced_memory()[1] - base)
+
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            util_debian.ler_placas2(img, usar_cache=False)
+            picos_leitura.append(tracemalloc.get_traced_memory()[1] - base)
+    duracao = time.perf_counter() - inicio
+    coletas = sum(estatistica["collections"] for estatistica in gc.get_stats()) - coletas_antes
+    total = len(picos_leitura)
+    return {
+        "imagens": total,
+        "pico_preprocessamento_kb": round(sum(picos_preprocessamento) / total / 1024, 1),
+        "pico_ler_placas2_kb": round(sum(picos_leitura) / total / 1024, 1),
+        "coletas_gc_por_1000": round(1000 * coletas / total, 1),
+        # Inclui o pré-processamento medido à parte; serve para comparar os modos entre si
+        "ms_por_imagem": round(1000 * duracao / total, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alocações por imagem do ler_placas2 com e sem pré-processamento direto")
+    parser.add_argument("--pasta", help="Pasta com recortes de placas")
+    parser.add_argument("--sinteticas", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+    if not args.pasta and not args.sinteticas:
+        args.sinteticas = 100
+
+    import util_debian
+
+    imagens = carregar_imagens(args.pasta, args.sinteticas)
+    util_debian.aquecer_ocr()
+    tracemalloc.start()
+
+    resultados = {}
+    for nome, direto in (("padrao", False), ("direto", True)):
+        util_debian.PREPROCESSAMENTO_DIRETO = direto
+        util_debian.ler_placas2(imagens[0][1], usar_cache=False)  # Buffers do modo já alocados
+        resultados[nome] = medir(util_debian, imagens, max(1, args.repeticoes))
+    tracemalloc.stop()
+
+    print(f"{'modo':<8} {'pré-proc. KB':>13} {'ler_placas2 KB':>15} {'gc/1000':>8} {'ms/img':>8}")
+    for nome, r in resultados.items():
+        print(f"{nome:<8} {r['pico_preprocessamento_kb']:>13} {r['pico_ler_placas2_kb']:>15} "
+              f"{r['coletas_gc_por_1000']:>8} {r['ms_por_imagem']:>8}")
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
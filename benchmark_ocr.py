@@ -0,0 +1,174 @@
+"""
+Compara os backends de inferência do OCR (motor_ocr.py) no mesmo conjunto de imagens.
+
+Cada backend roda num subprocesso próprio (o modelo é carregado na importação
+do util_debian), com o cache de resultados desligado e depois do aquecimento.
+Mede latência por imagem (ler_placas2), vazão sequencial e em lote
+(ler_placas2_lote) e acurácia quando o nome do arquivo traz a placa esperada
+(ABC1234.jpg ou ABC1234_qualquer.jpg).
+
+Uso:
+    python benchmark_ocr.py --pasta teste --backends paddle,onnx,openvino
+    python benchmark_ocr.py --sinteticas 200 --saida resultado.json
+
+Os backends onnx/openvino usam OCR_DET_MODELO / OCR_REC_MODELO do ambiente.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+
+import cv2
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+PADRAO_PLACA = re.compile(r"^[A-Z]{3}[0-9][A-Z0-9][0-9]{2}$")
+
+
+def placa_esperada(nome_arquivo):
+    """Placa indicada no nome do arquivo, ou None se o nome não trouxer uma."""
+    prefixo = os.path.splitext(os.path.basename(nome_arquivo))[0].split("_")[0].upper()
+    return prefixo if PADRAO_PLACA.match(prefixo) else None
+
+
+def carregar_imagens(pasta=None, sinteticas=0, semente=0):
+    """Lista de (nome, imagem em tons de cinza, placa esperada ou None)."""
+    imagens = []
+    if pasta:
+        for nome in sorted(os.listdir(pasta)):
+            if not nome.lower().endswith(EXTENSOES_IMAGEM):
+                continue
+            img = cv2.imread(os.path.join(pasta, nome), cv2.IMREAD_GRAYSCALE)
+            if img is not None:
+                imagens.append((nome, img, placa_esperada(nome)))
+    if sinteticas:
+        from placas_sinteticas import gerar_placa_sintetica, texto_placa_aleatorio
+
+        rng = random.Random(semente)
+        for i in range(sinteticas):
+            mercosul = i % 2 == 1
+            texto = texto_placa_aleatorio(rng, mercosul=mercosul)
+            largura = rng.randint(200, 480)
+            img = gerar_placa_sintetica(texto, largura, int(largura / 3.1), mercosul=mercosul)
+            imagens.append((f"sintetica_{i:04d}_{texto}", img, texto))
+    return imagens
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir_backend(backend, imagens, tamanho_lote):
+    """Roda no subprocesso do backend: carrega o OCR e mede o conjunto de imagens."""
+    os.environ["OCR_BACKEND"] = backend
+    os.environ["OCR_CACHE_TAMANHO"] = "0"  # Repetições não podem vir do cache
+    inicio = time.perf_counter()
+    import util_debian
+    carga_s = time.perf_counter() - inicio
+    aquecimento_s = util_debian.aquecer_ocr()
+
+    latencias = []
+    acertos = 0
+    com_gabarito = 0
+    for _, img, esperado in imagens:
+        t = time.perf_counter()
+        placa, _ = util_debian.ler_placas2(img)
+        latencias.append(time.perf_counter() - t)
+        if esperado:
+            com_gabarito += 1
+            acertos += placa == esperado
+
+    t = time.perf_counter()
+    crops = [img for _, img, _ in imagens]
+    for i in range(0, len(crops), tamanho_lote):
+        util_debian.ler_placas2_lote(crops[i:i + tamanho_lote])
+    duracao_lote = time.perf_counter() - t
+
+    return {
+        "backend": backend,
+        "precisao": os.getenv("OCR_PRECISAO", "fp32"),
+        "imagens": len(imagens),
+        "carga_s": round(carga_s, 2),
+        "aquecimento_s": round(aquecimento_s, 2),
+        "latencia_ms": {
+            "media": round(1000 * sum(latencias) / len(latencias), 2) if latencias else None,
+            "p50": round(1000 * percentil(latencias, 50), 2) if latencias else None,
+            "p95": round(1000 * percentil(latencias, 95), 2) if latencias else None,
+            "p99": round(1000 * percentil(latencias, 99), 2) if latencias else None,
+        },
+        "vazao_img_s": round(len(latencias) / sum(latencias), 2) if latencias else None,
+        "vazao_lote_img_s": round(len(crops) / duracao_lote, 2) if duracao_lote > 0 else None,
+        "acuracia": round(acertos / com_gabarito, 4) if com_gabarito else None,
+        "imagens_com_gabarito": com_gabarito,
+    }
+
+
+def executar_em_subprocesso(backend, args, ambiente=None):
+    """Mede um backend num subprocesso; ambiente (dict) sobrepõe variáveis, ex.: OCR_PRECISAO."""
+    comando = [sys.executable, os.path.abspath(__file__), "--backend-interno", backend,
+               "--lote", str(args.lote), "--semente", str(args.semente)]
+    if args.pasta:
+        comando += ["--pasta", args.pasta]
+    if args.sinteticas:
+        comando += ["--sinteticas", str(args.sinteticas)]
+    processo = subprocess.run(comando, capture_output=True, text=True, env={**os.environ, **(ambiente or {})})
+    # O util_debian imprime as placas no stdout; o resultado é a última linha
+    for linha in reversed(processo.stdout.strip().splitlines()):
+        if linha.startswith("{"):
+            return json.loads(linha)
+    erro = (processo.stderr or processo.stdout).strip().splitlines()[-5:]
+    precisao = (ambiente or {}).get("OCR_PRECISAO", os.getenv("OCR_PRECISAO", "fp32"))
+    return {"backend": backend, "precisao": precisao, "erro": " | ".join(erro) or f"código de saída {processo.returncode}"}
+
+
+def imprimir_tabela(resultados):
+    print(f"{'backend':<10} {'precisão':<8} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'lote img/s':>11} {'acurácia':>9}")
+    for r in resultados:
+        if "erro" in r:
+            print(f"{r['backend']:<10} {r['precisao']:<8} ERRO: {r['erro']}")
+            continue
+        acuracia = f"{r['acuracia']:.2%}" if r["acuracia"] is not None else "-"
+        print(f"{r['backend']:<10} {r['precisao']:<8} {r['latencia_ms']['p50']:>8} {r['latencia_ms']['p95']:>8} "
+              f"{r['vazao_img_s']:>8} {r['vazao_lote_img_s']:>11} {acuracia:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara backends de inferência do OCR")
+    parser.add_argument("--pasta", help="Pasta com recortes de placas (placa esperada no nome do arquivo)")
+    parser.add_argument("--sinteticas", type=int, default=0, help="Quantidade de placas sintéticas a incluir")
+    parser.add_argument("--backends", default="paddle,onnx,openvino")
+    parser.add_argument("--lote", type=int, default=8, help="Tamanho do lote na medição de vazão em lote")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar os resultados")
+    parser.add_argument("--backend-interno", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.pasta and not args.sinteticas:
+        args.sinteticas = 100
+
+    if args.backend_interno:
+        imagens = carregar_imagens(args.pasta, args.sinteticas, args.semente)
+        print(json.dumps(medir_backend(args.backend_interno, imagens, max(1, args.lote))))
+        return
+
+    resultados = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(f"[INFO] Medindo backend {backend}...")
+        resultados.append(executar_em_subprocesso(backend, args))
+
+    imprimir_tabela(resultados)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] Resultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
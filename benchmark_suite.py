@@ -0,0 +1,168 @@
+"""
+Benchmark reprodutível de velocidade e acurácia do OCR em placas sintéticas.
+
+Gera um corpus com semente (placas antigas e Mercosul, limpas, com ruído,
+desfoque, rotação e de duas linhas; ver placas_sinteticas.gerar_corpus), sem
+arquivos externos, e roda o ler_placas2 de util e de util_debian, cada um num
+subprocesso próprio (o modelo é carregado na importação e o pico de RSS fica
+separado). Mede:
+
+- latência por imagem e por etapa (p50/p95/p99, em ms);
+- imagens por segundo;
+- pico de RSS do processo;
+- acurácia de placa exata (geral e por variação do corpus).
+
+O resultado sai em JSON; com --base, compara com um resultado anterior.
+
+Uso:
+    python benchmark_suite.py --quantidade 300 --saida resultado.json
+    python benchmark_suite.py --modulos util_debian --base resultado.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmark_ocr import percentil
+from placas_sinteticas import VARIACOES_CORPUS, gerar_corpus
+
+MODULOS_OCR = ("util", "util_debian")
+
+
+def _estatisticas_ms(valores):
+    if not valores:
+        return None
+    return {
+        "media": round(1000 * sum(valores) / len(valores), 3),
+        "p50": round(1000 * percentil(valores, 50), 3),
+        "p95": round(1000 * percentil(valores, 95), 3),
+        "p99": round(1000 * percentil(valores, 99), 3),
+    }
+
+
+def medir_modulo(nome_modulo, corpus, aquecimento):
+    """Roda no subprocesso do módulo: carrega o OCR e mede o corpus inteiro."""
+    os.environ["OCR_CACHE_TAMANHO"] = "0"  # Placas repetidas não podem vir do cache
+    inicio = time.perf_counter()
+    modulo = __import__(nome_modulo)
+    carga_s = time.perf_counter() - inicio
+
+    for _, img, _, _ in corpus[:aquecimento]:
+        modulo.ler_placas2(img)
+
+    latencias = []
+    etapas = {}
+    acertos = {}
+    for _, img, esperado, variacao in corpus:
+        tempos = {}
+        t = time.perf_counter()
+        placa, _ = modulo.ler_placas2(img, tempos=tempos)
+        latencias.append(time.perf_counter() - t)
+        for etapa, duracao in tempos.items():
+            etapas.setdefault(etapa, []).append(duracao)
+        acertos.setdefault(variacao, []).append(placa == esperado)
+
+    total_acertos = sum(sum(lista) for lista in acertos.values())
+    return {
+        "modulo": nome_modulo,
+        "imagens": len(corpus),
+        "carga_s": round(carga_s, 2),
+        "latencia_ms": _estatisticas_ms(latencias),
+        "etapas_ms": {etapa: _estatisticas_ms(valores) for etapa, valores in etapas.items()},
+        "vazao_img_s": round(len(latencias) / sum(latencias), 2) if latencias else None,
+        # ru_maxrss vem em KB no Linux
+        "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "acuracia": round(total_acertos / len(corpus), 4) if corpus else None,
+        "acuracia_por_variacao": {
+            variacao: round(sum(lista) / len(lista), 4) for variacao, lista in acertos.items()
+        },
+    }
+
+
+def executar_em_subprocesso(nome_modulo, args):
+    comando = [sys.executable, os.path.abspath(__file__), "--modulo-interno", nome_modulo,
+               "--quantidade", str(args.quantidade), "--semente", str(args.semente),
+               "--variacoes", args.variacoes, "--aquecimento", str(args.aquecimento)]
+    processo = subprocess.run(comando, capture_output=True, text=True)
+    # Os módulos imprimem as placas no stdout; o resultado é a última linha JSON
+    for linha in reversed(processo.stdout.strip().splitlines()):
+        if linha.startswith("{"):
+            return json.loads(linha)
+    erro = (processo.stderr or processo.stdout).strip().splitlines()[-5:]
+    return {"modulo": nome_modulo, "erro": " | ".join(erro) or f"código de saída {processo.returncode}"}
+
+
+def imprimir_tabela(resultados, base=None):
+    anteriores = {r["modulo"]: r for r in (base or {}).get("resultados", []) if "erro" not in r}
+    print(f"{'módulo':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'img/s':>8} {'RSS MB':>8} {'acurácia':>9}")
+    for r in resultados:
+        if "erro" in r:
+            print(f"{r['modulo']:<12} ERRO: {r['erro']}")
+            continue
+        latencia = r["latencia_ms"]
+        print(f"{r['modulo']:<12} {latencia['p50']:>8} {latencia['p95']:>8} {latencia['p99']:>8} "
+              f"{r['vazao_img_s']:>8} {r['pico_rss_mb']:>8} {r['acuracia']:>9.2%}")
+        for etapa, valores in r["etapas_ms"].items():
+            print(f"  {etapa:<18} p50 {valores['p50']:>8} ms  p95 {valores['p95']:>8} ms")
+        anterior = anteriores.get(r["modulo"])
+        if anterior:
+            print(f"  vs. base: p50 {latencia['p50'] - anterior['latencia_ms']['p50']:+.3f} ms, "
+                  f"img/s {r['vazao_img_s'] - anterior['vazao_img_s']:+.2f}, "
+                  f"RSS {r['pico_rss_mb'] - anterior['pico_rss_mb']:+.1f} MB, "
+                  f"acurácia {r['acuracia'] - anterior['acuracia']:+.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de velocidade e acurácia do OCR em placas sintéticas")
+    parser.add_argument("--quantidade", type=int, default=200, help="Placas no corpus")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--variacoes", default=",".join(VARIACOES_CORPUS))
+    parser.add_argument("--modulos", default=",".join(MODULOS_OCR))
+    parser.add_argument("--aquecimento", type=int, default=5, help="Imagens do corpus rodadas antes de medir")
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o resultado")
+    parser.add_argument("--base", help="Resultado JSON anterior para comparar")
+    parser.add_argument("--modulo-interno", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    variacoes = tuple(v.strip() for v in args.variacoes.split(",") if v.strip())
+    desconhecidas = set(variacoes) - set(VARIACOES_CORPUS)
+    if desconhecidas:
+        parser.error(f"variações desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    if args.modulo_interno:
+        corpus = gerar_corpus(args.quantidade, args.semente, variacoes)
+        print(json.dumps(medir_modulo(args.modulo_interno, corpus, args.aquecimento)))
+        return
+
+    resultados = []
+    for modulo in [m.strip() for m in args.modulos.split(",") if m.strip()]:
+        print(f"[INFO] Medindo {modulo}...")
+        resultados.append(executar_em_subprocesso(modulo, args))
+
+    relatorio = {
+        "corpus": {"quantidade": args.quantidade, "semente": args.semente, "variacoes": list(variacoes)},
+        "ambiente": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "backend": os.getenv("OCR_BACKEND", "paddle"),
+        },
+        "resultados": resultados,
+    }
+    base = None
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+    imprimir_tabela(resultados, base)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] Resultado gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
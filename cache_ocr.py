@@ -0,0 +1,124 @@
+"""
+Cache de resultados do OCR por conteúdo da imagem.
+
+O mesmo recorte (ou um quase idêntico) costuma chegar várias vezes: carro
+parado na cancela, arquivo reenviado depois de uma falha de rede. A chave
+exata é um hash do conteúdo dos pixels; opcionalmente, um dHash de 64 bits
+encontra recortes quase iguais (distância de Hamming até o limite).
+LRU com TTL e número máximo de entradas.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+CACHE_TAMANHO = int(os.getenv("OCR_CACHE_TAMANHO", "2048"))  # 0 = cache desligado
+CACHE_TTL_S = float(os.getenv("OCR_CACHE_TTL_S", "120"))
+# Distância de Hamming máxima do dHash para considerar dois recortes iguais (-1 = só hash exato)
+CACHE_DISTANCIA_DHASH = int(os.getenv("OCR_CACHE_DISTANCIA_DHASH", "-1"))
+
+
+def hash_conteudo(img):
+    """Hash exato dos pixels (inclui a forma, para imagens com o mesmo buffer e dimensões diferentes)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(img.shape).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+def dhash(img):
+    """Hash perceptual de diferença (64 bits): compara pixels vizinhos numa miniatura 9x8."""
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    miniatura = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (miniatura[:, 1:] > miniatura[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class CacheResultadosOCR:
+    """LRU + TTL de (placa, confiança) por conteúdo da imagem. Thread-safe."""
+
+    def __init__(self, max_itens=CACHE_TAMANHO, ttl_s=CACHE_TTL_S, distancia_dhash=CACHE_DISTANCIA_DHASH):
+        self.max_itens = max(1, int(max_itens))
+        self.ttl_s = float(ttl_s)
+        self.distancia_dhash = int(distancia_dhash)
+        self._itens = OrderedDict()  # hash exato -> (expira_em, dhash ou None, resultado)
+        self._lock = threading.Lock()
+        self.acertos_exatos = 0
+        self.acertos_similares = 0
+        self.falhas = 0
+        self.evictados = 0
+
+    def chaves(self, img):
+        """Calcula (hash exato, dhash ou None) de uma imagem."""
+        return hash_conteudo(img), (dhash(img) if self.distancia_dhash >= 0 else None)
+
+    def obter(self, chaves):
+        """Resultado em cache para as chaves, ou None se não houver."""
+        exato, perceptual = chaves
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._itens.get(exato)
+            if entrada is not None and entrada[0] >= agora:
+                self._itens.move_to_end(exato)
+                self.acertos_exatos += 1
+                return entrada[2]
+
+            if perceptual is not None:
+                for chave, (expira_em, outro, resultado) in reversed(self._itens.items()):
+                    if expira_em >= agora and outro is not None and (perceptual ^ outro).bit_count() <= self.distancia_dhash:
+                        self._itens.move_to_end(chave)
+                        self.acertos_similares += 1
+                        return resultado
+
+            self.falhas += 1
+            return None
+
+    def guardar(self, chaves, resultado):
+        exato, perceptual = chaves
+        agora = time.monotonic()
+        with self._lock:
+            self._itens[exato] = (agora + self.ttl_s, perceptual, resultado)
+            self._itens.move_to_end(exato)
+            # Expirados saem primeiro; depois os menos usados, até caber no limite
+            for chave in [c for c, (expira_em, _, _) in self._itens.items() if expira_em < agora]:
+                del self._itens[chave]
+                self.evictados += 1
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.evictados += 1
+
+    def resumo(self):
+        with self._lock:
+            consultas = self.acertos_exatos + self.acertos_similares + self.falhas
+            return {
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "acertos_exatos": self.acertos_exatos,
+                "acertos_similares": self.acertos_similares,
+                "falhas": self.falhas,
+                "evictados": self.evictados,
+                "taxa_acerto": round((self.acertos_exatos + self.acertos_similares) / consultas, 3) if consultas else 0.0,
+            }
+
+    def registrar_metricas(self, registro):
+        """Itens e taxa de acerto atuais; totais de acertos (exatos e por dHash), falhas e remoções do cache."""
+        registro.medidor("ocr_cache_itens", "Resultados guardados no cache do OCR",
+                         funcao=lambda: self.resumo()["itens"])
+        registro.medidor("ocr_cache_taxa_acerto", "Fração das consultas ao cache do OCR que acertaram",
+                         funcao=lambda: self.resumo()["taxa_acerto"])
+        registro.contador("ocr_cache_acertos_total", "Consultas ao cache do OCR que acertaram, por tipo de chave",
+                          rotulos=("tipo",), funcao=self._acertos_por_tipo)
+        registro.contador("ocr_cache_falhas_total", "Consultas ao cache do OCR sem resultado guardado",
+                          funcao=lambda: self.resumo()["falhas"])
+        registro.contador("ocr_cache_evictados_total", "Resultados removidos do cache do OCR (expirados ou pelo limite)",
+                          funcao=lambda: self.resumo()["evictados"])
+
+    def _acertos_por_tipo(self):
+        resumo = self.resumo()
+        return {("exato",): resumo["acertos_exatos"], ("similar",): resumo["acertos_similares"]}
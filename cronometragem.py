@@ -0,0 +1,213 @@
+"""
+Cronometragem por etapa do ler_placas2 (util e util_debian).
+
+Cada chamada usa um Cronometro que guarda uma marca de tempo monotônica
+(time.perf_counter) no fim de cada etapa; a duração de uma etapa é a diferença
+para a marca anterior. O resultado da leitura volta como ResultadoOCR, uma
+tupla (placa, confiança) comum que também carrega .marcas e .tempos.
+
+Com OCR_CRONOMETRAGEM=1, todas as leituras alimentam o agregador do processo
+(percentis por etapa), que é impresso ao receber SIGUSR1 depois que o ponto
+de entrada do processo chamou instalar_sinal():
+
+    kill -USR1 <pid>
+
+Desligado (e sem tempos pedido pelo chamador), o cronômetro é o INATIVO, cujo
+marcar() não faz nada: o custo é uma chamada de método vazia por etapa.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+
+CRONOMETRAGEM = os.getenv("OCR_CRONOMETRAGEM", "0") == "1"
+AMOSTRAS_MAX = int(os.getenv("OCR_CRONOMETRAGEM_AMOSTRAS", "4096"))  # Amostras recentes por etapa
+
+_local = threading.local()
+
+
+class Cronometro:
+    """Marcas (etapa, instante) de uma chamada, na ordem em que as etapas terminaram."""
+
+    __slots__ = ("marcas",)
+    ativo = True
+
+    def __init__(self):
+        self.marcas = [("inicio", time.perf_counter())]
+
+    def marcar(self, etapa):
+        self.marcas.append((etapa, time.perf_counter()))
+
+    def tempos(self):
+        """Segundos por etapa (etapas repetidas são somadas)."""
+        return tempos_das_marcas(self.marcas)
+
+
+class _CronometroInativo:
+    __slots__ = ()
+    ativo = False
+    marcas = ()
+
+    def marcar(self, etapa):
+        pass
+
+    def tempos(self):
+        return {}
+
+
+INATIVO = _CronometroInativo()
+
+
+def tempos_das_marcas(marcas):
+    tempos = {}
+    for (_, anterior), (etapa, instante) in zip(marcas, marcas[1:]):
+        tempos[etapa] = tempos.get(etapa, 0.0) + (instante - anterior)
+    return tempos
+
+
+def iniciar(forcar=False):
+    """Cronometro novo se a cronometragem estiver ligada (ou forcar), senão INATIVO."""
+    return Cronometro() if (forcar or CRONOMETRAGEM) else INATIVO
+
+
+class ResultadoOCR(tuple):
+    """(placa, confiança) com as marcas de tempo da leitura em .marcas e as durações em .tempos."""
+
+    def __new__(cls, placa, confianca, marcas=()):
+        resultado = super().__new__(cls, (placa, confianca))
+        resultado.marcas = list(marcas)
+        return resultado
+
+    @property
+    def tempos(self):
+        return tempos_das_marcas(self.marcas)
+
+
+def concluir(cronometro, resultado, tempos=None):
+    """
+    Fecha a cronometragem de uma leitura: soma as durações em tempos (dict do
+    chamador, se houver), alimenta o agregador e devolve o resultado como
+    ResultadoOCR. Com o cronômetro inativo devolve o resultado sem mudança.
+    """
+    if not cronometro.ativo:
+        return resultado
+    duracoes = cronometro.tempos()
+    if tempos is not None:
+        for etapa, duracao in duracoes.items():
+            tempos[etapa] = tempos.get(etapa, 0.0) + duracao
+    if CRONOMETRAGEM:
+        agregador.observar(duracoes)
+    placa, confianca = resultado
+    return ResultadoOCR(placa, confianca, cronometro.marcas)
+
+
+def definir_atual(cronometro):
+    """Cronômetro da leitura em andamento nesta thread, para as EtapaCronometrada (None limpa)."""
+    _local.cronometro = cronometro if cronometro is not None and cronometro.ativo else None
+
+
+class EtapaCronometrada:
+    """
+    Envolve um componente chamável do PaddleOCR (ex.: ocr.text_detector) para marcar,
+    no cronômetro atual da thread, a etapa `antes` ao entrar e `depois` ao sair.
+    Atributos são repassados ao componente.
+    """
+
+    def __init__(self, componente, antes, depois):
+        self.componente = componente
+        self.antes = antes
+        self.depois = depois
+
+    def __call__(self, *args, **kwargs):
+        cronometro = getattr(_local, "cronometro", None)
+        if cronometro is None:
+            return self.componente(*args, **kwargs)
+        cronometro.marcar(self.antes)
+        try:
+            return self.componente(*args, **kwargs)
+        finally:
+            cronometro.marcar(self.depois)
+
+    def __getattr__(self, nome):
+        return getattr(self.componente, nome)
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+class AgregadorTempos:
+    """Durações por etapa de todas as leituras do processo (amostras recentes para os percentis). Thread-safe."""
+
+    def __init__(self, amostras_max=AMOSTRAS_MAX):
+        self.amostras_max = max(1, int(amostras_max))
+        self._lock = threading.Lock()
+        self._amostras = {}  # etapa -> deque das durações recentes
+        self._contagens = {}
+        self._totais = {}
+
+    def observar(self, tempos):
+        with self._lock:
+            for etapa, duracao in tempos.items():
+                amostras = self._amostras.get(etapa)
+                if amostras is None:
+                    amostras = self._amostras[etapa] = deque(maxlen=self.amostras_max)
+                amostras.append(duracao)
+                self._contagens[etapa] = self._contagens.get(etapa, 0) + 1
+                self._totais[etapa] = self._totais.get(etapa, 0.0) + duracao
+
+    def resumo(self):
+        with self._lock:
+            copias = {etapa: sorted(amostras) for etapa, amostras in self._amostras.items()}
+            contagens = dict(self._contagens)
+            totais = dict(self._totais)
+        return {
+            etapa: {
+                "n": contagens[etapa],
+                "media_ms": round(1000 * totais[etapa] / contagens[etapa], 3),
+                "p50_ms": round(1000 * _percentil(ordenados, 50), 3),
+                "p95_ms": round(1000 * _percentil(ordenados, 95), 3),
+                "p99_ms": round(1000 * _percentil(ordenados, 99), 3),
+                "max_ms": round(1000 * ordenados[-1], 3),
+            }
+            for etapa, ordenados in copias.items()
+        }
+
+    def despejar(self):
+        print(f"[INFO] Tempos por etapa do OCR (pid {os.getpid()}): {json.dumps(self.resumo(), ensure_ascii=False)}",
+              flush=True)
+
+
+agregador = AgregadorTempos()
+
+
+def instalar_sinal(sinal=getattr(signal, "SIGUSR1", None), repassar=None):
+    """
+    Imprime o resumo do agregador ao receber o sinal. Chamado pelos pontos de
+    entrada (API, leitores, servidor_prefork, workers do pool), na thread
+    principal; importar este módulo não mexe em sinais. repassar() devolve pids
+    de processos filhos que recebem o mesmo sinal (ex.: workers do pool de OCR,
+    onde ficam os tempos); com ele, o resumo local só sai se houver amostras.
+    """
+    if sinal is None:
+        return False
+
+    def _ao_receber(*_):
+        pids = list(repassar()) if repassar is not None else []
+        if not pids or agregador.resumo():
+            agregador.despejar()
+        for pid in pids:
+            try:
+                os.kill(pid, sinal)
+            except OSError:
+                pass  # Filho já saiu
+
+    try:
+        signal.signal(sinal, _ao_receber)
+        return True
+    except ValueError:
+        print("[WARN] Sinal de cronometragem não instalado: chamado fora da thread principal")
+        return False
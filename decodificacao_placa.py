@@ -0,0 +1,234 @@
+"""
+Decodificação restrita de placas a partir das probabilidades por caractere do reconhecedor.
+
+O reconhecedor do PaddleOCR (CTC) devolve, para cada recorte, uma matriz
+T x C com a probabilidade de cada caractere em cada posição horizontal.
+A decodificação gulosa do PaddleOCR pega o melhor caractere de cada posição e
+só depois o formato é verificado (license_complies_format). Aqui a busca de
+Viterbi já é feita dentro das gramáticas LLLNNNN / LLLNLNN: em posições de
+letra só letras são possíveis, em posições de número só dígitos, e a massa de
+caracteres confundíveis (O/0, I/1, S/5...) é somada à do caractere que a
+posição aceita, pelos mesmos mapas do corrigir_placa.
+
+A confiança da placa vem da probabilidade do caminho de Viterbi inteiro
+(caracteres, brancos e quadros que o caminho teve de absorver), normalizada
+por caractere: P ** (1/7). Fica na mesma escala da confiança média do
+PaddleOCR usada pela leitura gulosa, então o drop_score (0.5) e os pesos da
+votação valem para as duas. Um caractere que sobra (ex.: "ABC12345") custa a
+probabilidade do quadro que o caminho teve de ignorar; leituras com mais
+caracteres que a placa são recusadas e ficam para a leitura gulosa, assim como
+as em que o caminho restrito é muito pior que o guloso (OCR_RAZAO_MIN_RESTRITA).
+A confiança pode ser recalibrada com OCR_CALIBRACAO="a,b" (escala de Platt
+sobre o logit, parâmetros obtidos com ajustar_calibracao em leituras conferidas).
+"""
+
+import os
+import string
+
+import numpy as np
+
+LETRAS = string.ascii_uppercase
+DIGITOS = string.digits
+SIMBOLOS = LETRAS + DIGITOS  # 26 letras nas colunas 0-25, 10 dígitos nas colunas 26-35
+# Posição 4: dígito na placa antiga (LLLNNNN), letra na Mercosul (LLLNLNN)
+TIPOS_POSICAO = "LLLNXNN"
+TAMANHO_PLACA = len(TIPOS_POSICAO)
+# Leituras gulosas com menos caracteres que SEGMENTOS_MIN não são tratadas como placa; com mais que
+# a placa sobraria texto (outra caixa, caractere duplicado) que o caminho restrito teria de engolir
+SEGMENTOS_MIN = 5
+SEGMENTOS_MAX = TAMANHO_PLACA
+# Abaixo dessa confiança (bruta, por caractere) a leitura restrita é descartada e vale a gulosa;
+# o padrão é o drop_score do PaddleOCR, aplicado às leituras gulosas
+CONFIANCA_MIN = float(os.getenv("OCR_CONFIANCA_MIN_RESTRITA", "0.5"))
+# Leitura restrita com probabilidade por caractere abaixo dessa fração da gulosa: vale a gulosa
+RAZAO_MIN_GULOSA = float(os.getenv("OCR_RAZAO_MIN_RESTRITA", "0.5"))
+_LOG_ZERO = -1e9
+
+
+def _ler_calibracao():
+    try:
+        a, b = (float(v) for v in os.getenv("OCR_CALIBRACAO", "1,0").split(","))
+        return a, b
+    except ValueError:
+        print("[WARN] OCR_CALIBRACAO inválido (esperado 'a,b'); usando calibração identidade")
+        return 1.0, 0.0
+
+
+CALIBRACAO = _ler_calibracao()
+
+
+def _logit(p):
+    p = np.clip(p, 1e-6, 1 - 1e-6)
+    return np.log(p / (1 - p))
+
+
+def calibrar_confianca(bruta, calibracao=CALIBRACAO):
+    """Aplica a escala de Platt (a, b) sobre o logit da confiança bruta."""
+    a, b = calibracao
+    if (a, b) == (1.0, 0.0):
+        return float(bruta)
+    return float(1 / (1 + np.exp(-(a * _logit(bruta) + b))))
+
+
+def ajustar_calibracao(confiancas, acertos, iteracoes=50):
+    """
+    Ajusta (a, b) de calibrar_confianca por regressão logística (Newton) a partir de
+    confianças brutas e de se cada leitura estava certa. Resultado vai em OCR_CALIBRACAO.
+    """
+    x = _logit(np.asarray(confiancas, dtype=np.float64))
+    y = np.asarray(acertos, dtype=np.float64)
+    X = np.stack([x, np.ones_like(x)], axis=1)
+    pesos = np.array([1.0, 0.0])
+    for _ in range(iteracoes):
+        p = 1 / (1 + np.exp(-X @ pesos))
+        gradiente = X.T @ (p - y)
+        hessiana = X.T @ (X * (p * (1 - p))[:, None]) + 1e-6 * np.eye(2)
+        passo = np.linalg.solve(hessiana, gradiente)
+        pesos -= passo
+        if np.abs(passo).max() < 1e-8:
+            break
+    return float(pesos[0]), float(pesos[1])
+
+
+class DecodificadorPlaca:
+    """
+    Viterbi CTC restrito às gramáticas de placa.
+    caracteres é a lista de classes do decodificador CTC do PaddleOCR (índice 0 = blank);
+    char_to_int / int_to_char são os mapas de caracteres confundíveis do util_debian.
+    """
+
+    def __init__(self, caracteres, char_to_int, int_to_char):
+        num_classes = len(caracteres)
+        # Matrizes classe -> símbolo: bruta (só maiúsc./minúsc.) e com confundíveis somados
+        bruta = np.zeros((num_classes, len(SIMBOLOS)), dtype=np.float32)
+        letra = np.zeros_like(bruta)
+        numero = np.zeros_like(bruta)
+        separadores = np.zeros(num_classes, dtype=np.float32)
+        separadores[0] = 1.0  # blank
+        for indice, caractere in enumerate(caracteres[1:], start=1):
+            c = caractere.upper()
+            if len(c) != 1:
+                continue
+            if c in SIMBOLOS:
+                bruta[indice, SIMBOLOS.index(c)] = 1.0
+                if c in LETRAS:
+                    letra[indice, SIMBOLOS.index(c)] = 1.0
+                    if c in char_to_int:
+                        numero[indice, SIMBOLOS.index(char_to_int[c])] = 1.0
+                else:
+                    numero[indice, SIMBOLOS.index(c)] = 1.0
+                    if c in int_to_char:
+                        letra[indice, SIMBOLOS.index(int_to_char[c])] = 1.0
+            elif not c.isalnum():
+                # Hífen, ponto, espaço... contam como separação entre caracteres
+                separadores[indice] = 1.0
+        self._matrizes = {"L": letra, "N": numero, "X": bruta}
+        self._separadores = separadores
+        self._mascaras = {
+            "L": np.array([0.0] * 26 + [_LOG_ZERO] * 10),
+            "N": np.array([_LOG_ZERO] * 26 + [0.0] * 10),
+            "X": np.zeros(len(SIMBOLOS)),
+        }
+        self._validos = np.array([c in SIMBOLOS for c in (x.upper() for x in caracteres)])
+
+    def _segmentos(self, probs):
+        """Quantidade de caracteres alfanuméricos na leitura gulosa (CTC colapsado)."""
+        melhores = probs.argmax(axis=1)
+        mudou = np.concatenate([[True], melhores[1:] != melhores[:-1]])
+        return int(np.count_nonzero(mudou & self._validos[melhores] & (melhores != 0)))
+
+    def decodificar(self, matrizes):
+        """
+        Decodifica a placa mais provável a partir das matrizes T x C dos recortes
+        de uma imagem, na ordem de leitura. Retorna (texto, confiança, padrão) ou None.
+        """
+        if not matrizes:
+            return None
+        probs = np.concatenate([np.asarray(m, dtype=np.float32) for m in matrizes], axis=0)
+        total = probs.shape[0]
+        if total < TAMANHO_PLACA or not SEGMENTOS_MIN <= self._segmentos(probs) <= SEGMENTOS_MAX:
+            return None
+
+        log_blank = np.log(probs @ self._separadores + 1e-12)
+        # Emissão por posição da placa: (T, 7, 36)
+        emissao_tipo = {
+            tipo: np.log(probs @ matriz + 1e-12) + self._mascaras[tipo]
+            for tipo, matriz in self._matrizes.items()
+        }
+        emissao = np.stack([emissao_tipo[tipo] for tipo in TIPOS_POSICAO], axis=1)
+
+        linhas = np.arange(TAMANHO_PLACA)
+        caracteres = np.full((TAMANHO_PLACA, len(SIMBOLOS)), _LOG_ZERO)
+        brancos = np.full(TAMANHO_PLACA + 1, _LOG_ZERO)
+        caracteres[0] = emissao[0, 0]
+        brancos[0] = log_blank[0]
+        escolhas_caractere = np.zeros((total, TAMANHO_PLACA, len(SIMBOLOS)), dtype=np.int8)
+        escolhas_branco = np.zeros((total, TAMANHO_PLACA + 1), dtype=np.int8)
+        melhores_anteriores = np.zeros((total, TAMANHO_PLACA), dtype=np.int64)
+        segundos_anteriores = np.zeros((total, TAMANHO_PLACA), dtype=np.int64)
+
+        for t in range(1, total):
+            # Melhor e segundo melhor caractere de cada posição no instante anterior:
+            # passar direto de uma posição à seguinte exige caracteres diferentes (regra do CTC)
+            melhor = caracteres.argmax(axis=1)
+            valor_melhor = caracteres[linhas, melhor]
+            sem_melhor = caracteres.copy()
+            sem_melhor[linhas, melhor] = _LOG_ZERO
+            segundo = sem_melhor.argmax(axis=1)
+            valor_segundo = sem_melhor[linhas, segundo]
+            melhores_anteriores[t] = melhor
+            segundos_anteriores[t] = segundo
+
+            da_posicao_anterior = np.full_like(caracteres, _LOG_ZERO)
+            da_posicao_anterior[1:] = valor_melhor[:-1, None]
+            da_posicao_anterior[linhas[1:], melhor[:-1]] = valor_segundo[:-1]
+
+            candidatos = np.stack([caracteres, np.broadcast_to(brancos[:-1, None], caracteres.shape), da_posicao_anterior])
+            escolhas_caractere[t] = candidatos.argmax(axis=0)
+            novos_caracteres = candidatos.max(axis=0) + emissao[t]
+
+            candidatos_branco = np.stack([brancos, np.concatenate([[_LOG_ZERO], valor_melhor])])
+            escolhas_branco[t] = candidatos_branco.argmax(axis=0)
+            brancos = candidatos_branco.max(axis=0) + log_blank[t]
+            caracteres = novos_caracteres
+
+        final_caractere = caracteres[-1].max()
+        log_caminho = max(final_caractere, brancos[-1])
+        if log_caminho <= _LOG_ZERO / 2:
+            return None
+        bruta = float(np.exp(log_caminho / TAMANHO_PLACA))
+        # Caminho guloso (melhor classe em cada quadro, sem gramática) na mesma escala
+        gulosa = float(np.exp(np.log(probs.max(axis=1) + 1e-12).sum() / TAMANHO_PLACA))
+        if bruta < CONFIANCA_MIN or bruta < RAZAO_MIN_GULOSA * gulosa:
+            return None
+
+        # Volta pelo caminho guardando o caractere de cada posição
+        escolhidos = [None] * TAMANHO_PLACA
+        if brancos[-1] >= final_caractere:
+            tipo, posicao, simbolo = "branco", TAMANHO_PLACA, None
+        else:
+            tipo, posicao, simbolo = "caractere", TAMANHO_PLACA - 1, int(caracteres[-1].argmax())
+        for t in range(total - 1, -1, -1):
+            if tipo == "caractere":
+                escolhidos[posicao] = simbolo
+                if t == 0:
+                    break
+                escolha = escolhas_caractere[t, posicao, simbolo]
+                if escolha == 1:
+                    tipo = "branco"
+                elif escolha == 2:
+                    anterior = melhores_anteriores[t, posicao - 1]
+                    simbolo = int(segundos_anteriores[t, posicao - 1] if anterior == simbolo else anterior)
+                    posicao -= 1
+            else:
+                if t == 0:
+                    break
+                if escolhas_branco[t, posicao] == 1:
+                    tipo, posicao = "caractere", posicao - 1
+                    simbolo = int(melhores_anteriores[t, posicao])
+
+        if any(s is None for s in escolhidos):
+            return None
+        texto = "".join(SIMBOLOS[s] for s in escolhidos)
+        padrao = "LLLNLNN" if texto[4] in LETRAS else "LLLNNNN"
+        return texto, calibrar_confianca(bruta), padrao
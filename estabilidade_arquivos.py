@@ -0,0 +1,135 @@
+"""
+Estabilidade dos arquivos de recorte sem dormir.
+
+verificar_arquivo_completo media o tamanho, dormia tempo_estabilidade (1 s no
+Debian, 2 s no leitor_placas.py) e media de novo, um arquivo por vez na única
+thread: 1.000 recortes acumulados esperavam 1.000 s antes do primeiro OCR.
+
+O RastreadorEstabilidade guarda (tamanho, mtime) de cada arquivo pendente entre
+varreduras/eventos e responde na hora se ele já pode ser lido:
+
+- fechado por quem escrevia (IN_CLOSE_WRITE) ou renomeado para a pasta
+  (IN_MOVED_TO): pronto imediatamente;
+- mtime há mais de intervalo_s: ninguém escreveu nele nesse intervalo (cada
+  write atualiza o mtime), pronto — é o caso de todo o acúmulo na partida;
+- senão, pronto quando (tamanho, mtime) ficar igual por intervalo_s, contados
+  no relógio do leitor (protege de mtime no futuro, ex.: relógio de outra máquina).
+
+Quem chama não espera: arquivos ainda instáveis ficam para a próxima passada,
+e espera_restante() diz quando vale a pena voltar.
+"""
+
+import os
+import threading
+import time
+
+# Acima disso, entradas de arquivos que sumiram sem serem consultados de novo são descartadas
+MAX_PENDENTES = 10000
+IDADE_MAXIMA_PENDENTE_S = 600
+
+
+class RastreadorEstabilidade:
+    """Estado (tamanho, mtime, desde quando) dos arquivos ainda não estáveis. Thread-safe."""
+
+    def __init__(self, intervalo_s=1.0):
+        self.intervalo_s = max(0.0, float(intervalo_s))
+        self._lock = threading.Lock()
+        self._pendentes = {}  # caminho -> (tamanho, mtime_ns, monotonic da primeira vez com essa assinatura)
+        self._fechados = set()
+        self.prontos_evento = 0
+        self.prontos_idade = 0
+        self.prontos_observados = 0
+
+    def marcar_fechado(self, caminho):
+        """Arquivo fechado/renomeado por quem escrevia: a próxima consulta o dá como pronto."""
+        with self._lock:
+            self._fechados.add(caminho)
+
+    def estavel(self, caminho, agora=None):
+        """
+        True se o arquivo pode ser lido agora (e deixa de ser rastreado); False se
+        ainda pode estar sendo escrito ou não existe. Não bloqueia.
+        """
+        agora = time.monotonic() if agora is None else agora
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            self.esquecer(caminho)
+            return False
+        assinatura = (estado.st_size, estado.st_mtime_ns)
+        with self._lock:
+            if caminho in self._fechados:
+                self._fechados.discard(caminho)
+                self._pendentes.pop(caminho, None)
+                self.prontos_evento += 1
+                return True
+            if time.time() - estado.st_mtime >= self.intervalo_s:
+                self._pendentes.pop(caminho, None)
+                self.prontos_idade += 1
+                return True
+            anterior = self._pendentes.get(caminho)
+            if anterior is not None and anterior[:2] == assinatura:
+                if agora - anterior[2] >= self.intervalo_s:
+                    del self._pendentes[caminho]
+                    self.prontos_observados += 1
+                    return True
+                return False
+            if anterior is None and len(self._pendentes) >= MAX_PENDENTES:
+                self._descartar_antigos(agora)
+            self._pendentes[caminho] = assinatura + (agora,)
+            return False
+
+    def _descartar_antigos(self, agora):
+        for caminho in [c for c, (_, _, desde) in self._pendentes.items() if agora - desde > IDADE_MAXIMA_PENDENTE_S]:
+            del self._pendentes[caminho]
+
+    def espera_restante(self, caminho=None, agora=None):
+        """
+        Segundos até o arquivo (ou, sem caminho, o primeiro dos pendentes) poder ficar
+        estável se não mudar mais; None se não há nada pendente.
+        """
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            if caminho is not None:
+                entrada = self._pendentes.get(caminho)
+                desdes = [entrada[2]] if entrada is not None else []
+            else:
+                desdes = [desde for _, _, desde in self._pendentes.values()]
+        if not desdes:
+            return None
+        return max(0.0, min(desdes) + self.intervalo_s - agora)
+
+    def pausa(self, maximo):
+        """Quanto dormir entre varreduras: maximo, ou menos se um pendente puder ficar estável antes."""
+        espera = self.espera_restante()
+        return maximo if espera is None else min(maximo, espera + 0.05)
+
+    def esquecer(self, caminho):
+        with self._lock:
+            self._pendentes.pop(caminho, None)
+            self._fechados.discard(caminho)
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._pendentes)
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "intervalo_s": self.intervalo_s,
+                "pendentes": len(self._pendentes),
+                "prontos_evento": self.prontos_evento,
+                "prontos_idade": self.prontos_idade,
+                "prontos_observados": self.prontos_observados,
+            }
+
+    def registrar_metricas(self, registro):
+        """Arquivos aguardando agora e totais de arquivos liberados por motivo (evento, idade do mtime, observação)."""
+        registro.medidor("estabilidade_arquivos_pendentes", "Arquivos aguardando ficar estáveis para o OCR",
+                         funcao=self.pendentes)
+        registro.contador("estabilidade_prontos_evento_total", "Arquivos liberados por fechamento/renomeação (inotify)",
+                          funcao=lambda: self.resumo()["prontos_evento"])
+        registro.contador("estabilidade_prontos_idade_total", "Arquivos liberados por mtime mais antigo que o intervalo",
+                          funcao=lambda: self.resumo()["prontos_idade"])
+        registro.contador("estabilidade_prontos_observados_total", "Arquivos liberados por tamanho e mtime iguais no intervalo",
+                          funcao=lambda: self.resumo()["prontos_observados"])
@@ -0,0 +1,180 @@
+"""
+Pré-filtro barato de presença de placa, antes de chamar o OCR.
+
+Boa parte dos recortes que chegam são falsos positivos de movimento
+(para-choque, sombra, asfalto). Cada um custa uma chamada completa do OCR só
+para voltar (None, None). O filtro dá uma nota de 0 a 1 ao recorte, numa
+miniatura em tons de cinza, a partir de três medidas:
+
+- contraste: amplitude entre os percentis 5 e 95 dos pixels;
+- transições por linha: quantas vezes uma linha binarizada (Otsu) troca de claro
+  para escuro (7 caracteres dão bem mais que 10, mas não as dezenas de uma textura);
+- densidade de bordas verticais: fração de pixels com gradiente horizontal forte
+  (os traços dos caracteres).
+
+As duas últimas são medidas só nas linhas com mais transições, onde estaria o texto.
+
+A nota é a média geométrica das três medidas normalizadas: um recorte só passa
+se tiver as três. Abaixo de OCR_FILTRO_LIMIAR o OCR não é chamado.
+
+Com OCR_FILTRO_AVALIACAO=1 nada é descartado: o OCR roda sempre e cada recorte
+que seria descartado mas teve placa lida conta como falso descarte. Para
+escolher o limiar com dados conferidos, rode este módulo sobre uma pasta:
+
+    python filtro_placa.py --pasta teste --ocr
+"""
+
+import argparse
+import os
+import threading
+
+import cv2
+import numpy as np
+
+FILTRO_PRESENCA = os.getenv("OCR_FILTRO_PRESENCA", "1") != "0"
+FILTRO_LIMIAR = float(os.getenv("OCR_FILTRO_LIMIAR", "0.25"))
+FILTRO_AVALIACAO = os.getenv("OCR_FILTRO_AVALIACAO", "0") == "1"
+
+ALTURA_MINIATURA = 48  # Altura da miniatura analisada; a largura segue a proporção (máx. 4x)
+# |diferença| horizontal mínima para contar como borda: fração da amplitude p5-p95, com piso
+FRACAO_BORDA = 0.3
+GRADIENTE_BORDA_MIN = 8
+FRACAO_LINHAS_TEXTO = 0.2  # Fração das linhas da miniatura analisadas como linhas de texto
+# Valores das medidas a partir dos quais cada uma vale 1 na nota
+CONTRASTE_REFERENCIA = 0.35
+DENSIDADE_REFERENCIA = 0.08
+TRANSICOES_REFERENCIA = 10.0
+# Acima disso as transições já não são de caracteres e sim de textura/ruído (asfalto, grade);
+# a medida cai linearmente até zero em TRANSICOES_RUIDO
+TRANSICOES_MAX_PLACA = 36.0
+TRANSICOES_RUIDO = 72.0
+
+
+def _miniatura(img):
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    altura, largura = img.shape[:2]
+    largura_mini = int(np.clip(round(largura * ALTURA_MINIATURA / max(1, altura)), 8, 4 * ALTURA_MINIATURA))
+    return cv2.resize(img, (largura_mini, ALTURA_MINIATURA), interpolation=cv2.INTER_AREA)
+
+
+def medidas_presenca(img):
+    """Medidas brutas (contraste, densidade de bordas, transições por linha) de um recorte."""
+    mini = _miniatura(img)
+    p5, p95 = np.percentile(mini, (5, 95))
+    contraste = (p95 - p5) / 255.0
+
+    # Limiar de borda relativo à amplitude: placas escuras (noite) têm traços mais fracos
+    limiar_borda = max(GRADIENTE_BORDA_MIN, FRACAO_BORDA * (p95 - p5))
+    bordas = np.abs(np.diff(mini.astype(np.int16), axis=1)) > limiar_borda
+    _, binaria = cv2.threshold(mini, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    transicoes_linha = np.count_nonzero(np.diff(binaria, axis=1), axis=1)
+
+    # Só as linhas mais movimentadas (as que cortam os caracteres): o recorte pode
+    # trazer para-choque ou carroceria em volta da placa
+    linhas_texto = np.argsort(transicoes_linha)[-max(1, int(len(transicoes_linha) * FRACAO_LINHAS_TEXTO)):]
+    densidade = float(bordas[linhas_texto].mean())
+    transicoes = float(np.median(transicoes_linha[linhas_texto]))
+    return contraste, densidade, transicoes
+
+
+def nota_presenca(img):
+    """Nota de 0 a 1 de haver texto de placa no recorte."""
+    contraste, densidade, transicoes = medidas_presenca(img)
+    normalizadas = np.clip([
+        contraste / CONTRASTE_REFERENCIA,
+        densidade / DENSIDADE_REFERENCIA,
+        min(transicoes / TRANSICOES_REFERENCIA,
+            (TRANSICOES_RUIDO - transicoes) / (TRANSICOES_RUIDO - TRANSICOES_MAX_PLACA)),
+    ], 0.0, 1.0)
+    return float(np.prod(normalizadas) ** (1 / 3))
+
+
+class FiltroPresencaPlaca:
+    """Decide quais recortes vão ao OCR e conta descartes (e falsos descartes na avaliação). Thread-safe."""
+
+    def __init__(self, limiar=FILTRO_LIMIAR, avaliacao=FILTRO_AVALIACAO):
+        self.limiar = float(limiar)
+        self.avaliacao = bool(avaliacao)
+        self._lock = threading.Lock()
+        self.avaliados = 0
+        self.descartados = 0
+        self.falsos_descartes = 0
+
+    def descartar(self, img):
+        """
+        Retorna (descartar, descartaria): descartaria diz se a nota ficou abaixo do
+        limiar; descartar, se o OCR pode de fato ser pulado (nunca no modo de
+        avaliação, em que o resultado do OCR vai para conferir()).
+        """
+        descartaria = nota_presenca(img) < self.limiar
+        with self._lock:
+            self.avaliados += 1
+            self.descartados += descartaria
+        return descartaria and not self.avaliacao, descartaria
+
+    def conferir(self, descartaria, resultado):
+        """Modo de avaliação: registra falso descarte se o OCR leu uma placa num recorte que seria descartado."""
+        if descartaria and resultado and resultado[0]:
+            with self._lock:
+                self.falsos_descartes += 1
+            print(f"[WARN] Filtro de presença descartaria uma placa lida: {resultado[0]}")
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "limiar": self.limiar,
+                "avaliacao": self.avaliacao,
+                "avaliados": self.avaliados,
+                "descartados": self.descartados,
+                "falsos_descartes": self.falsos_descartes,
+                "taxa_descarte": round(self.descartados / self.avaliados, 3) if self.avaliados else 0.0,
+            }
+
+    def registrar_metricas(self, registro):
+        """Totais desde o início do processo: recortes avaliados, abaixo do limiar e falsos descartes."""
+        registro.contador("ocr_filtro_avaliados_total", "Recortes avaliados pelo filtro de presença de placa",
+                          funcao=lambda: self.resumo()["avaliados"])
+        registro.contador("ocr_filtro_descartados_total",
+                          "Recortes abaixo do limiar do filtro de presença (no modo de avaliação, os que seriam descartados)",
+                          funcao=lambda: self.resumo()["descartados"])
+        registro.contador("ocr_filtro_falsos_descartes_total",
+                          "Modo de avaliação: recortes abaixo do limiar em que o OCR leu uma placa",
+                          funcao=lambda: self.resumo()["falsos_descartes"])
+
+
+def main():
+    from benchmark_ocr import carregar_imagens
+
+    parser = argparse.ArgumentParser(description="Notas do filtro de presença de placa e falsos descartes por limiar")
+    parser.add_argument("--pasta", help="Pasta com recortes (placa esperada no nome, opcional)")
+    parser.add_argument("--sinteticas", type=int, default=0)
+    parser.add_argument("--ocr", action="store_true", help="Roda o OCR para contar falsos descartes")
+    parser.add_argument("--limiares", default="0.1,0.15,0.2,0.25,0.3,0.4")
+    args = parser.parse_args()
+    if not args.pasta and not args.sinteticas:
+        parser.error("informe --pasta e/ou --sinteticas")
+
+    imagens = carregar_imagens(args.pasta, args.sinteticas)
+    notas = [nota_presenca(img) for _, img, _ in imagens]
+    # Com placa: a lida pelo OCR (--ocr) ou, sem OCR, a esperada pelo nome do arquivo
+    if args.ocr:
+        os.environ["OCR_FILTRO_PRESENCA"] = "0"
+        import util_debian
+
+        com_placa = [bool(util_debian.ler_placas2(img, usar_cache=False)[0]) for _, img, _ in imagens]
+    else:
+        com_placa = [esperado is not None for _, _, esperado in imagens]
+
+    total_com_placa = sum(com_placa)
+    print(f"[INFO] {len(imagens)} recortes, {total_com_placa} com placa")
+    print(f"{'limiar':>7} {'descartados':>12} {'falsos descartes':>17} {'taxa falso desc.':>17}")
+    for limiar in (float(v) for v in args.limiares.split(",")):
+        descartados = [nota < limiar for nota in notas]
+        falsos = sum(d and p for d, p in zip(descartados, com_placa))
+        taxa = f"{falsos / total_com_placa:.2%}" if total_com_placa else "-"
+        print(f"{limiar:>7} {sum(descartados):>12} {falsos:>17} {taxa:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Índice incremental de pasta_base/<data>/ para a varredura periódica.
+
+Cada passada do main() fazia os.listdir de todas as subpastas, os.path.isfile e
+os.path.getmtime por arquivo (o sort chama getmtime de novo) e ainda consultava
+o set de processados: O(n log n) em stat para pastas que chegam a dezenas de
+milhares de arquivos depois de uma queda. O IndiceDiretorios:
+
+- guarda o mtime de pasta_base e de cada subpasta; o mtime de um diretório só
+  muda quando entradas são criadas, removidas ou renomeadas nele, então uma
+  subpasta com o mesmo mtime não é listada de novo;
+- lista com os.scandir (o tipo da entrada vem do próprio diretório, sem stat) e
+  só faz stat nos arquivos que ainda não conhecia;
+- mantém os pendentes num heap por mtime (os mais antigos primeiro).
+
+O custo de uma passada fica proporcional aos arquivos novos. Como o mtime do
+diretório tem resolução limitada, uma subpasta modificada há menos de
+MARGEM_MTIME_S da última listagem é listada de novo na passada seguinte.
+"""
+
+import heapq
+import os
+import time
+
+MARGEM_MTIME_S = 2.0
+
+
+class IndiceDiretorios:
+    """
+    Arquivos de pasta_base/<data>/ ainda não concluídos, em ordem de mtime.
+    retirar() entrega os pendentes; o chamador devolve cada um com concluir()
+    (processado) ou adiar() (tentar de novo na próxima passada).
+    """
+
+    def __init__(self, pasta_base, aceitar_arquivo=lambda nome: True):
+        self.pasta_base = pasta_base
+        self.aceitar_arquivo = aceitar_arquivo
+        self._base = None  # {"mtime": ns, "listada_em": time.time()} de pasta_base
+        self._subpastas = {}  # caminho -> {"mtime": ns, "listada_em": time.time(), "arquivos": {nome: mtime_ns}}
+        self._pendentes = {}  # caminho -> mtime_ns dos que ainda não foram concluídos
+        self._heap = []  # (mtime_ns, caminho); entradas que saíram de _pendentes são puladas ao retirar
+        self._adiados = []
+        self.listagens = 0
+        self.subpastas_puladas = 0
+
+    @staticmethod
+    def _precisa_listar(estado, mtime_ns):
+        if estado is None or estado["mtime"] != mtime_ns:
+            return True
+        # Modificação muito perto da listagem: uma entrada nova pode ter o mesmo mtime
+        return estado["listada_em"] - mtime_ns / 1e9 < MARGEM_MTIME_S
+
+    def atualizar(self):
+        """
+        Lista só o que mudou desde a última passada e coloca os arquivos novos no heap.
+        Levanta FileNotFoundError/PermissionError se pasta_base não puder ser lida.
+        """
+        for caminho in self._adiados:
+            mtime_ns = self._pendentes.get(caminho)
+            if mtime_ns is None:  # Já concluído (ex.: devolvido pelo pipeline): volta se ainda existir
+                try:
+                    mtime_ns = self._pendentes[caminho] = os.stat(caminho).st_mtime_ns
+                except OSError:
+                    continue
+            heapq.heappush(self._heap, (mtime_ns, caminho))
+        self._adiados = []
+
+        mtime_base = os.stat(self.pasta_base).st_mtime_ns
+        if self._precisa_listar(self._base, mtime_base):
+            agora = time.time()
+            with os.scandir(self.pasta_base) as entradas:
+                atuais = {e.path for e in entradas if e.is_dir(follow_symlinks=False)}
+            for pasta in set(self._subpastas) - atuais:
+                self._esquecer_subpasta(pasta)
+            for pasta in atuais - set(self._subpastas):
+                self._subpastas[pasta] = None
+            self._base = {"mtime": mtime_base, "listada_em": agora}
+
+        for pasta in sorted(self._subpastas):
+            try:
+                mtime_ns = os.stat(pasta).st_mtime_ns
+                if self._precisa_listar(self._subpastas[pasta], mtime_ns):
+                    self._listar_subpasta(pasta, mtime_ns)
+                else:
+                    self.subpastas_puladas += 1
+            except (FileNotFoundError, NotADirectoryError):
+                self._esquecer_subpasta(pasta)
+            except PermissionError as e:
+                print(f"[WARN] Problema ao acessar subpasta {pasta}: {e}. Pulando.")
+
+    def _listar_subpasta(self, pasta, mtime_ns):
+        self.listagens += 1
+        agora = time.time()
+        estado = self._subpastas[pasta]
+        anteriores = estado["arquivos"] if estado is not None else {}
+        arquivos = {}
+        with os.scandir(pasta) as entradas:
+            for entrada in entradas:
+                nome = entrada.name
+                if nome in anteriores:
+                    arquivos[nome] = anteriores[nome]
+                    continue
+                if not self.aceitar_arquivo(nome):
+                    continue
+                try:
+                    if not entrada.is_file():
+                        continue
+                    mtime_arquivo = entrada.stat().st_mtime_ns
+                except OSError:
+                    continue  # Removido durante a listagem
+                arquivos[nome] = mtime_arquivo
+                self._pendentes[entrada.path] = mtime_arquivo
+                heapq.heappush(self._heap, (mtime_arquivo, entrada.path))
+        for nome in anteriores.keys() - arquivos.keys():
+            self._pendentes.pop(os.path.join(pasta, nome), None)
+        self._subpastas[pasta] = {"mtime": mtime_ns, "listada_em": agora, "arquivos": arquivos}
+
+    def _esquecer_subpasta(self, pasta):
+        estado = self._subpastas.pop(pasta, None)
+        if estado is not None:
+            for nome in estado["arquivos"]:
+                self._pendentes.pop(os.path.join(pasta, nome), None)
+
+    def retirar(self):
+        """Todos os pendentes, dos mais antigos para os mais novos (mtime). Cada um sai do heap."""
+        caminhos = []
+        while self._heap:
+            mtime_ns, caminho = heapq.heappop(self._heap)
+            if self._pendentes.get(caminho) == mtime_ns:
+                caminhos.append(caminho)
+        return caminhos
+
+    def concluir(self, caminho):
+        """O arquivo foi processado: não volta mais, enquanto continuar na pasta."""
+        self._pendentes.pop(caminho, None)
+
+    def adiar(self, caminho):
+        """O arquivo não pôde ser processado agora: volta ao heap na próxima atualizar()."""
+        self._adiados.append(caminho)
+
+    def pendentes(self):
+        return len(self._pendentes)
+
+    def resumo(self):
+        return {
+            "subpastas": len(self._subpastas),
+            "pendentes": len(self._pendentes),
+            "listagens": self.listagens,
+            "subpastas_puladas": self.subpastas_puladas,
+        }
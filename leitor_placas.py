@@ -4,15 +4,20 @@ import time
 import gc
 import signal  # Import for signal handling
 from datetime import datetime, timedelta
+import cronometragem
 from util import (
     ler_placas2,
     salvar_no_postgres,
     flush_buffer_leituras,
     close_db_connection,
 )  # Import new functions
+from estabilidade_arquivos import RastreadorEstabilidade
+from indice_pastas import IndiceDiretorios
 
 pasta_base = os.path.join(os.path.expanduser("~"), "Desktop", "placas_detectadas")
 confianca_gravar_texto = 0.1  # Mantido, mas a lógica de correção pode ajudar placas com menor confiança inicial
+# Arquivo só vai ao OCR depois de 2 s sem mudar de tamanho/mtime, sem dormir entre as medidas
+rastreador_estabilidade = RastreadorEstabilidade(intervalo_s=2)
 
 
 def remover_arquivo_com_retry(caminho_arquivo, max_tentativas=3, delay=0.1):
@@ -41,26 +46,14 @@ def remover_arquivo_com_retry(caminho_arquivo, max_tentativas=3, delay=0.1):
     return False
 
 
-def verificar_arquivo_completo(caminho_arquivo, tempo_estabilidade=2):
+def verificar_arquivo_completo(caminho_arquivo):
     """
     Verifica se um arquivo está completo (não está sendo escrito).
-    Compara o tamanho do arquivo em intervalos para detectar se ainda está sendo escrito.
+    Tamanho e mtime são comparados entre varreduras pelo rastreador_estabilidade
+    (ver estabilidade_arquivos.py); arquivos ainda instáveis ficam para a próxima.
     """
     try:
-        if not os.path.exists(caminho_arquivo):
-            return False
-        
-        tamanho_inicial = os.path.getsize(caminho_arquivo)
-        time.sleep(tempo_estabilidade)
-        
-        if not os.path.exists(caminho_arquivo):
-            return False
-            
-        tamanho_final = os.path.getsize(caminho_arquivo)
-        
-        # Se o tamanho mudou, o arquivo ainda está sendo escrito
-        if tamanho_inicial != tamanho_final:
-            print(f"[INFO] Arquivo ainda sendo escrito: {os.path.basename(caminho_arquivo)}")
+        if not rastreador_estabilidade.estavel(caminho_arquivo):
             return False
             
         # Verifica se consegue abrir o arquivo para leitura (sem locks de escrita)
@@ -196,6 +189,11 @@ def main():
     print(f"[INFO] Monitorando pasta: {pasta_base}")
     print(f"[INFO] Confiança mínima para gravação: {confianca_gravar_texto}")
 
+    # Índice incremental: só as subpastas que mudaram são listadas, pendentes em ordem de mtime
+    indice_pastas = IndiceDiretorios(
+        pasta_base,
+        lambda nome: not any(nome.endswith(ext) for ext in arquivos_ignorados) and not nome.startswith("~"),
+    )
     processed_files_in_current_run = set()  # Para evitar reprocessar arquivos já vistos nesta execução
     ultima_limpeza = datetime.now()
     intervalo_limpeza = timedelta(hours=6)  # Limpeza a cada 6 horas
@@ -209,70 +207,55 @@ def main():
                 time.sleep(30)  # Espera mais se a pasta base sumir
                 continue
 
-            # Listar datas (subpastas)
+            # Lista só as subpastas de data que mudaram; pendentes dos mais antigos para os mais novos
             try:
-                subpastas_data = sorted(
-                    [d for d in os.listdir(pasta_base) if os.path.isdir(os.path.join(pasta_base, d))]
-                )
+                indice_pastas.atualizar()
+                arquivos_pendentes = indice_pastas.retirar()
             except FileNotFoundError:
                 print(f"[WARN] Pasta base {pasta_base} desapareceu durante listagem. Tentando novamente.")
                 time.sleep(5)
                 continue
 
-            for data_dir in subpastas_data:
-                pasta_data = os.path.join(pasta_base, data_dir)
-
-                try:
-                    # Ordenar por data de modificação para processar os mais antigos primeiro
-                    arquivos_na_pasta = sorted(
-                        [
-                            f
-                            for f in os.listdir(pasta_data)
-                            if os.path.isfile(os.path.join(pasta_data, f))
-                            and not any(f.endswith(ext) for ext in arquivos_ignorados)
-                            and not f.startswith("~")
-                        ],
-                        key=lambda x: os.path.getmtime(os.path.join(pasta_data, x)),
-                    )
-                except FileNotFoundError:
-                    print(f"[WARN] Subpasta {pasta_data} desapareceu durante listagem. Pulando.")
-                    continue  # Pula para a próxima subpasta_data
-
-                for nome_arquivo in arquivos_na_pasta:
-                    caminho_arquivo = os.path.join(pasta_data, nome_arquivo)
-
-                    if caminho_arquivo in processed_files_in_current_run:
-                        continue  # Já processado nesta sessão
-
-                    # Checagem adicional de arquivo temporário (ex: lock files do windows)
-                    if nome_arquivo.startswith("~$") or nome_arquivo.endswith(".lock"):
-                        print(f"[INFO] Ignorando arquivo de lock/temporário: {nome_arquivo}")
-                        continue
-
-                    print(f"[INFO] Processando arquivo: {nome_arquivo}")
-                    
-                    # Processa o arquivo e verifica se foi bem-sucedido
-                    sucesso_processamento = processar_imagem(caminho_arquivo)
-                    
-                    if sucesso_processamento:
-                        processed_files_in_current_run.add(caminho_arquivo)  # Adiciona ao set de processados apenas se sucesso
-                        encontrou_novos_arquivos = True
-                    else:
-                        print(f"[WARN] Falha no processamento de {nome_arquivo}, será tentado novamente")
-                    
-                    # Pequena pausa para não sobrecarregar I/O ou CPU
-                    # time.sleep(0.1)
+            for caminho_arquivo in arquivos_pendentes:
+                nome_arquivo = os.path.basename(caminho_arquivo)
+
+                if caminho_arquivo in processed_files_in_current_run:
+                    indice_pastas.concluir(caminho_arquivo)
+                    continue  # Já processado nesta sessão
+
+                # Checagem adicional de arquivo temporário (ex: lock files do windows)
+                if nome_arquivo.startswith("~$") or nome_arquivo.endswith(".lock"):
+                    print(f"[INFO] Ignorando arquivo de lock/temporário: {nome_arquivo}")
+                    indice_pastas.concluir(caminho_arquivo)
+                    continue
+
+                print(f"[INFO] Processando arquivo: {nome_arquivo}")
+                
+                # Processa o arquivo e verifica se foi bem-sucedido
+                sucesso_processamento = processar_imagem(caminho_arquivo)
+                
+                if sucesso_processamento:
+                    processed_files_in_current_run.add(caminho_arquivo)  # Adiciona ao set de processados apenas se sucesso
+                    indice_pastas.concluir(caminho_arquivo)
+                    encontrou_novos_arquivos = True
+                else:
+                    print(f"[WARN] Falha no processamento de {nome_arquivo}, será tentado novamente")
+                    indice_pastas.adiar(caminho_arquivo)
+                
+                # Pequena pausa para não sobrecarregar I/O ou CPU
+                # time.sleep(0.1)
 
             # Se não encontrou novos arquivos, descarrega o buffer e espera mais tempo
             if not encontrou_novos_arquivos:
                 flush_buffer_leituras()  # Garante que o buffer seja salvo antes de uma longa espera
                 # print("[INFO] Nenhum arquivo novo encontrado. Aguardando...")
-                time.sleep(10)  # Tempo de espera original
+                # Tempo de espera original, menor se houver arquivo esperando ficar estável
+                time.sleep(rastreador_estabilidade.pausa(10))
             else:
                 # Se encontrou arquivos, pode ser que haja mais chegando, espera um pouco menos
                 # ou apenas continua o loop para verificar rapidamente.
                 # flush_buffer_leituras() # Salva o que tiver no buffer após um ciclo de processamento
-                time.sleep(1)  # Espera curta se houve processamento
+                time.sleep(rastreador_estabilidade.pausa(1))  # Espera curta se houve processamento
 
             # Limpeza periódica de arquivos órfãos
             agora = datetime.now()
@@ -312,4 +295,6 @@ if __name__ == "__main__":
     # Registrar handlers para SIGINT (Ctrl+C) e SIGTERM (finalização)
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    if cronometragem.CRONOMETRAGEM:
+        cronometragem.instalar_sinal()  # kill -USR1 <pid> imprime os tempos por etapa do OCR
     main()
\ No newline at end of file
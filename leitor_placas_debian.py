@@ -4,18 +4,70 @@ import time
 import gc
 import signal  # Import for signal handling
 from datetime import datetime, timedelta
-from util_debian import (
-    ler_placas2,
+from itertools import islice
+import cronometragem
+from banco_debian import (
     salvar_no_postgres,
     flush_buffer_leituras,
     close_db_connection,
-)  # Import new functions from Debian-specific module
+)  # Gravação das leituras, sem carregar o modelo de OCR (ver carregar_ocr_local)
+from metricas import RegistroMetricas, MetricasOCR, servir_metricas, gravar_metricas
+from selecao_quadros import SeletorQuadros, SELECAO_QUADROS
+from votacao_placa import AgregadorPlacas, VOTACAO_PLACA
+from leitura_imagem import DecodificacaoAntecipada, decodificar_arquivo, LEITURA_THREADS
+from observador_pasta import ObservadorPasta, LEITOR_INOTIFY, LEITOR_ESPERA_S
+from estabilidade_arquivos import RastreadorEstabilidade
+from indice_pastas import IndiceDiretorios
+from pipeline_leitor import PipelineLeitor, LEITOR_PIPELINE
+from pool_ocr import PoolOCR, NUM_WORKERS_OCR, processar_lote_bytes
+from lote_ocr import LoteadorOCR, ControleAdmissao
 
 # Caminho para ambiente Linux/Debian - usando diretório home do usuário
 pasta_base = os.path.join(os.path.expanduser("~"), "placas_detectadas")
 # Pasta de teste simples na raiz do projeto
 pasta_teste = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teste")
 confianca_gravar_texto = 0.1  # Mantido, mas a lógica de correção pode ajudar placas com menor confiança inicial
+# Arquivos ignorados adaptados para Linux (sem .crdownload que é específico do Chrome/Windows)
+arquivos_ignorados = {".tmp", ".part", ".lock", ".swp", ".~"}
+
+# Métricas do leitor: porta HTTP (/metrics) e/ou arquivo para o textfile collector do node_exporter
+METRICAS_PORTA = int(os.getenv("METRICAS_PORTA", "0"))  # 0 = desligado
+METRICAS_ARQUIVO = os.getenv("METRICAS_ARQUIVO", "")
+registro_metricas = RegistroMetricas()
+metricas_ocr = MetricasOCR(registro_metricas)
+arquivos_pendentes_metrica = registro_metricas.medidor(
+    "leitor_arquivos_pendentes", "Arquivos encontrados na última varredura e ainda não processados"
+)
+
+# O modelo (util_debian) só é carregado neste processo quando o OCR roda aqui; com o
+# pipeline e OCR_WORKERS > 0 ele existe apenas nos processos do PoolOCR
+OCR_NESTE_PROCESSO = not (LEITOR_PIPELINE and NUM_WORKERS_OCR > 0)
+
+# Seleção dos melhores quadros por car_id (SELECAO_QUADROS=1): só os top-k de cada carro vão ao OCR
+seletor_quadros = SeletorQuadros() if SELECAO_QUADROS else None
+if seletor_quadros is not None:
+    seletor_quadros.registrar_metricas(registro_metricas)
+
+# Decodificação (reduzida, ver leitura_imagem.py) dos próximos arquivos em threads, enquanto o OCR roda
+# (com o pipeline, a decodificação já é um estágio próprio)
+decodificacao_antecipada = DecodificacaoAntecipada() if LEITURA_THREADS > 0 and not LEITOR_PIPELINE else None
+if decodificacao_antecipada is not None:
+    registro_metricas.medidor(
+        "leitor_decodificacoes_antecipadas", "Arquivos decodificados (ou em decodificação) à frente do OCR",
+        funcao=decodificacao_antecipada.pendentes,
+    )
+
+# Arquivo só vai ao OCR depois de fechado por quem escreve ou sem mudanças por ARQUIVO_ESTABILIDADE_S (sem sleep)
+rastreador_estabilidade = RastreadorEstabilidade(float(os.getenv("ARQUIVO_ESTABILIDADE_S", "1")))
+rastreador_estabilidade.registrar_metricas(registro_metricas)
+
+# Votação por caractere entre as leituras de um car_id (VOTACAO_PLACA=1): uma leitura final por carro
+agregador_placas = AgregadorPlacas() if VOTACAO_PLACA else None
+if agregador_placas is not None:
+    agregador_placas.registrar_metricas(registro_metricas)
+
+# Pipeline em estágios (LEITOR_PIPELINE=1): criado em main() por criar_pipeline
+pipeline = None
 
 
 def remover_arquivo_com_retry(caminho_arquivo, max_tentativas=3, delay=0.1):
@@ -51,32 +103,23 @@ def remover_arquivo_com_retry(caminho_arquivo, max_tentativas=3, delay=0.1):
     return False
 
 
-def verificar_arquivo_completo(caminho_arquivo, tempo_estabilidade=1):
+def verificar_arquivo_completo(caminho_arquivo, arquivo_fechado=False):
     """
-    Verifica se um arquivo está completo (não está sendo escrito).
-    Adaptado para ambiente Linux/Debian com tempo menor de estabilidade.
+    Verifica se um arquivo está completo (não está sendo escrito), sem esperar:
+    a estabilidade vem do rastreador_estabilidade (ver estabilidade_arquivos.py).
+    Arquivos ainda instáveis retornam False e são consultados de novo na próxima passada.
+    arquivo_fechado (evento IN_CLOSE_WRITE/IN_MOVED_TO do inotify) dá o arquivo como estável.
     """
     try:
-        if not os.path.exists(caminho_arquivo):
+        if arquivo_fechado:
+            rastreador_estabilidade.marcar_fechado(caminho_arquivo)
+        if not rastreador_estabilidade.estavel(caminho_arquivo):
             return False
-        
+
         # Verifica permissões de leitura
         if not os.access(caminho_arquivo, os.R_OK):
             print(f"[WARN] Sem permissão de leitura para: {os.path.basename(caminho_arquivo)}")
             return False
-        
-        tamanho_inicial = os.path.getsize(caminho_arquivo)
-        time.sleep(tempo_estabilidade)
-        
-        if not os.path.exists(caminho_arquivo):
-            return False
-            
-        tamanho_final = os.path.getsize(caminho_arquivo)
-        
-        # Se o tamanho mudou, o arquivo ainda está sendo escrito
-        if tamanho_inicial != tamanho_final:
-            print(f"[INFO] Arquivo ainda sendo escrito: {os.path.basename(caminho_arquivo)}")
-            return False
             
         # Verifica se consegue abrir o arquivo para leitura
         try:
@@ -93,16 +136,8 @@ def verificar_arquivo_completo(caminho_arquivo, tempo_estabilidade=1):
         return False
 
 
-def processar_imagem(caminho_arquivo):
-    nome = os.path.basename(caminho_arquivo)
-    arquivo_processado_com_sucesso = False
-    img_carregada = False
-    
-    # Verifica se o arquivo está completo antes de processar
-    if not verificar_arquivo_completo(caminho_arquivo):
-        print(f"[INFO] Arquivo não está pronto para processamento: {nome}")
-        return False
-    
+def interpretar_nome_arquivo(nome):
+    """Extrai (frame_nmr, car_id) do nome do arquivo; -1 no que não puder ser lido."""
     try:
         partes = nome.split("_")
         # Adicionar mais validações para evitar IndexError
@@ -127,45 +162,109 @@ def processar_imagem(caminho_arquivo):
         print(f"[WARN] Erro ao parsear nome do arquivo '{nome}': {e}")
         frame_nmr = -1
         car_id = -1
+    return frame_nmr, car_id
+
+
+def arquivo_aceito(nome):
+    """False para arquivos temporários, ocultos ou de escrita parcial, que não devem ir ao OCR."""
+    return (
+        not any(nome.endswith(ext) for ext in arquivos_ignorados)
+        and not nome.startswith(".")  # Ignora arquivos ocultos do Linux
+        and not nome.startswith("~")  # Ignora arquivos temporários
+    )
+
+
+class OCRAdiado(Exception):
+    """O executor de OCR do pipeline não atendeu (fila cheia ou job expirado); o arquivo fica para depois."""
+
+
+def carregar_ocr_local():
+    """Importa o util_debian (carrega o modelo), publica as métricas do cache e do filtro e aquece o OCR."""
+    import util_debian
+    if util_debian.cache_ocr is not None:
+        util_debian.cache_ocr.registrar_metricas(registro_metricas)
+    if util_debian.filtro_presenca is not None:
+        util_debian.filtro_presenca.registrar_metricas(registro_metricas)
+    util_debian.aquecer_ocr()
+
 
+def ler_placa(img, tempos=None):
+    """
+    OCR de uma imagem em tons de cinza fora dos estágios do pipeline (pasta de teste, leitor sem pipeline).
+    Com o pipeline ativo, vai pelo executor dele: o modelo não pode ser usado por duas threads ao mesmo
+    tempo e, com OCR_WORKERS > 0, nem está carregado neste processo. Levanta OCRAdiado se não for atendido.
+    """
+    if pipeline is None:
+        from util_debian import ler_placas2
+        return ler_placas2(img, tempos=tempos)
     try:
-        # Carregar a imagem
-        img = cv2.imread(caminho_arquivo, cv2.IMREAD_GRAYSCALE)
+        resultado = pipeline.executor_ocr.submeter((img.tobytes(), img.shape[:2])).result()
+    except Exception as e:
+        # Fila cheia ou falha do executor (worker morto, pool parado): não é culpa da imagem
+        raise OCRAdiado(str(e))
+    if resultado.get("expirado"):
+        raise OCRAdiado(resultado["erro"])
+    if "erro" in resultado:
+        raise RuntimeError(resultado["erro"])
+    if tempos is not None:
+        tempos.update(resultado.get("tempos") or {})
+    return resultado["placa"], resultado["confianca"]
+
+
+def processar_imagem(caminho_arquivo, img=None, tempos=None, arquivo_fechado=False):
+    """
+    Lê a placa de um arquivo, grava a leitura e remove o arquivo.
+    Com img (já carregada e verificada, como na seleção de quadros), pula a
+    verificação de arquivo completo e a leitura do disco; tempos traz a decodificação.
+    arquivo_fechado vem do evento do inotify (ver verificar_arquivo_completo).
+    """
+    nome = os.path.basename(caminho_arquivo)
+    arquivo_processado_com_sucesso = False
+    img_carregada = img is not None
+    adiado = False
+    frame_nmr, car_id = interpretar_nome_arquivo(nome)
+
+    if descartar_carro_finalizado(caminho_arquivo, car_id):
+        return True
+    
+    # Verifica se o arquivo está completo antes de processar
+    if img is None and not verificar_arquivo_completo(caminho_arquivo, arquivo_fechado):
+        print(f"[INFO] Arquivo não está pronto para processamento: {nome}")
+        return False
+
+    try:
+        observar_idade_job(caminho_arquivo)
+
         if img is None:
-            print(f"[ERRO] Não foi possível ler a imagem: {nome}")
-            # Remove arquivo corrompido ou ilegível
-            remover_arquivo_com_retry(caminho_arquivo)
-            return True  # Retorna True pois o arquivo foi "processado" (removido)
+            img, tempos = carregar_imagem(caminho_arquivo)
+            if img is None:
+                return True  # Retorna True pois o arquivo foi "processado" (removido)
 
         img_carregada = True
-        texto_detectado, confianca_texto_detectado = ler_placas2(img)
+        tempos = dict(tempos or {})
+        texto_detectado, confianca_texto_detectado = ler_placa(img, tempos=tempos)
 
         # Libera a imagem da memória explicitamente
         del img
 
-        if (
-            texto_detectado is not None
-            and confianca_texto_detectado is not None
-            and confianca_texto_detectado > confianca_gravar_texto
-        ):
-            print(
-                f"[INFO] Frame: {frame_nmr}, Carro ID: {car_id}, Placa: {texto_detectado}, Confiança: {confianca_texto_detectado:.2f}"
-            )
-            # Salva no "banco" (que agora só exibe no terminal)
-            salvar_no_postgres(frame_nmr, car_id, texto_detectado, confianca_texto_detectado)
-        
+        gravar_leitura(frame_nmr, car_id, texto_detectado, confianca_texto_detectado, tempos)
         arquivo_processado_com_sucesso = True
         
+    except OCRAdiado as e_adiado:
+        print(f"[WARN] OCR de {nome} adiado: {e_adiado}")
+        adiado = True
     except cv2.error as e_cv:
         print(f"[ERRO_CV2] Erro de OpenCV ao processar {nome}: {e_cv}")
+        metricas_ocr.leituras.inc(resultado="erro")
         arquivo_processado_com_sucesso = True  # Considera processado mesmo com erro
     except Exception as e_proc:
         print(f"[ERRO_PROC] Erro inesperado ao processar imagem {nome}: {e_proc}")
+        metricas_ocr.leituras.inc(resultado="erro")
         arquivo_processado_com_sucesso = True  # Considera processado mesmo com erro
     finally:
         # Remove o arquivo somente se foi carregado com sucesso ou houve erro no processamento
         # Isso garante que arquivos problemáticos não fiquem acumulando
-        if img_carregada or arquivo_processado_com_sucesso:
+        if (img_carregada or arquivo_processado_com_sucesso) and not adiado:
             sucesso_remocao = remover_arquivo_com_retry(caminho_arquivo)
             if not sucesso_remocao:
                 print(f"[ERRO] Arquivo não foi removido: {nome}")
@@ -175,6 +274,256 @@ def processar_imagem(caminho_arquivo):
     return arquivo_processado_com_sucesso
 
 
+def observar_idade_job(caminho_arquivo):
+    """Idade do "job": tempo desde que o arquivo foi gravado até o início do OCR."""
+    try:
+        metricas_ocr.idade_job.observar(max(0.0, time.time() - os.path.getmtime(caminho_arquivo)))
+    except OSError:
+        pass
+
+
+def gravar_leitura(frame_nmr, car_id, texto_detectado, confianca_texto_detectado, tempos):
+    """Registra a leitura nas métricas e grava a placa (pela votação, se ligada) acima da confiança mínima."""
+    metricas_ocr.observar_resultado({"placa": texto_detectado, "tempos": tempos})
+    if (
+        texto_detectado is not None
+        and confianca_texto_detectado is not None
+        and confianca_texto_detectado > confianca_gravar_texto
+    ):
+        print(
+            f"[INFO] Frame: {frame_nmr}, Carro ID: {car_id}, Placa: {texto_detectado}, Confiança: {confianca_texto_detectado:.2f}"
+        )
+        if agregador_placas is not None and car_id >= 0:
+            # Com a votação, grava só a leitura final do carro
+            final = agregador_placas.adicionar(car_id, texto_detectado, confianca_texto_detectado, frame_nmr)
+            if final is not None:
+                gravar_leitura_final(final)
+        else:
+            # Salva no "banco" (que agora só exibe no terminal)
+            salvar_no_postgres(frame_nmr, car_id, texto_detectado, confianca_texto_detectado)
+
+
+def descartar_carro_finalizado(caminho_arquivo, car_id):
+    """Com a votação, remove sem OCR o recorte de um carro que já teve a leitura final. Retorna True se removeu."""
+    if agregador_placas is None or car_id < 0 or not agregador_placas.finalizado(car_id, contar_descarte=True):
+        return False
+    print(f"[INFO] Carro ID {car_id} já finalizado pela votação; recorte descartado: {os.path.basename(caminho_arquivo)}")
+    remover_arquivo_com_retry(caminho_arquivo)
+    return True
+
+
+def gravar_leitura_final(final):
+    """Grava a leitura final de um carro produzida pelo AgregadorPlacas."""
+    print(
+        f"[INFO] Leitura final (votação de {final['leituras']} leitura(s)) - Frame: {final['frame_nmr']}, "
+        f"Carro ID: {final['car_id']}, Placa: {final['placa']}, Confiança: {final['confianca']:.2f}"
+    )
+    salvar_no_postgres(final["frame_nmr"], final["car_id"], final["placa"], final["confianca"])
+
+
+def finalizar_votacoes_expiradas(forcar=False):
+    """Grava as leituras finais dos carros cuja votação expirou (todas, com forcar). Retorna quantas."""
+    finais = agregador_placas.expirados(forcar=forcar)
+    for final in finais:
+        gravar_leitura_final(final)
+    return len(finais)
+
+
+def carregar_imagem(caminho_arquivo):
+    """
+    Lê o arquivo em tons de cinza (já decodificado pelas threads de antecipação, se
+    houver; JPEGs grandes em resolução reduzida). Retorna (img, tempos com a
+    decodificação) ou (None, None) se a imagem for ilegível; nesse caso o arquivo é removido.
+    Com a antecipação, o tempo de "decodificacao" é só a espera pelo resultado.
+    """
+    inicio = time.perf_counter()
+    antecipada = decodificacao_antecipada.obter(caminho_arquivo) if decodificacao_antecipada is not None else None
+    if antecipada is not None:
+        img = antecipada[0]
+    else:
+        try:
+            img = decodificar_arquivo(caminho_arquivo)[0]
+        except OSError:
+            img = None
+    if img is None:
+        print(f"[ERRO] Não foi possível ler a imagem: {os.path.basename(caminho_arquivo)}")
+        metricas_ocr.leituras.inc(resultado="erro")
+        # Remove arquivo corrompido ou ilegível
+        remover_arquivo_com_retry(caminho_arquivo)
+        return None, None
+    return img, {"decodificacao": time.perf_counter() - inicio}
+
+
+def selecionar_quadro(caminho_arquivo, arquivo_fechado=False):
+    """
+    Modo de seleção de quadros: lê o arquivo e o entrega ao seletor do seu car_id.
+    Recortes que ficam fora do top-k são removidos sem OCR; os selecionados são
+    processados por processar_quadros_selecionados quando a janela do carro fecha.
+    Retorna True se o arquivo foi tratado (mesmo que ainda aguarde a janela).
+    """
+    nome = os.path.basename(caminho_arquivo)
+    frame_nmr, car_id = interpretar_nome_arquivo(nome)
+    if descartar_carro_finalizado(caminho_arquivo, car_id):
+        return True
+    if not verificar_arquivo_completo(caminho_arquivo, arquivo_fechado):
+        print(f"[INFO] Arquivo não está pronto para processamento: {nome}")
+        return False
+
+    try:
+        img, tempos = carregar_imagem(caminho_arquivo)
+        if img is None:
+            return True
+        if car_id < 0:
+            # Sem car_id no nome não há como agrupar: vai direto ao OCR
+            return processar_imagem(caminho_arquivo, img, tempos)
+        guardar_quadro(caminho_arquivo, img, tempos, car_id, frame_nmr)
+    except Exception as e:
+        print(f"[ERRO] Erro na seleção de quadros de {nome}: {e}")
+        return processar_imagem(caminho_arquivo)
+    return True
+
+
+def processar_eventos_pasta(observador, processados):
+    """
+    Modo inotify: espera os arquivos que o observador entregar e processa cada um.
+    Falhas voltam à fila do observador para nova tentativa. Retorna True se algo foi processado.
+    """
+    lote = observador.proximos(LEITOR_ESPERA_S)
+    encontrou = False
+    for posicao, (caminho_arquivo, arquivo_fechado) in enumerate(lote):
+        arquivos_pendentes_metrica.definir(len(lote) - posicao + observador.pendentes())
+        if decodificacao_antecipada is not None:
+            decodificacao_antecipada.agendar(
+                c for c, _ in islice(lote, posicao, None) if c not in processados
+            )
+        if caminho_arquivo in processados:
+            continue
+
+        nome_arquivo = os.path.basename(caminho_arquivo)
+        print(f"[INFO] Processando arquivo: {nome_arquivo}")
+        sucesso_processamento = processar_arquivo(caminho_arquivo, arquivo_fechado)
+
+        if sucesso_processamento:
+            processados.add(caminho_arquivo)
+            encontrou = True
+        else:
+            print(f"[WARN] Falha no processamento de {nome_arquivo}, será tentado novamente")
+            # Ainda instável: volta quando puder estabilizar; outras falhas, em 1 s
+            espera = rastreador_estabilidade.espera_restante(caminho_arquivo)
+            observador.reenfileirar(caminho_arquivo, 1.0 if espera is None else espera + 0.05)
+    return encontrou
+
+
+def guardar_quadro(caminho_arquivo, img, tempos, car_id, frame_nmr):
+    """Entrega o quadro ao seletor do car_id e remove, sem OCR, os que saíram do top-k."""
+    for descartado in seletor_quadros.adicionar(car_id, img, caminho_arquivo, frame_nmr, tempos):
+        print(f"[INFO] Quadro descartado pela seleção (Carro ID {car_id}, nota {descartado.nota:.3f}): "
+              f"{os.path.basename(descartado.caminho)}")
+        remover_arquivo_com_retry(descartado.caminho)
+
+
+def processar_quadros_selecionados(forcar=False):
+    """Roda o OCR nos melhores quadros dos carros com janela fechada. Retorna quantos foram processados."""
+    processados = 0
+    for car_id, quadros in seletor_quadros.prontos(forcar=forcar):
+        print(f"[INFO] Carro ID {car_id}: {len(quadros)} quadro(s) selecionado(s) para o OCR")
+        for quadro in quadros:
+            if pipeline is not None:
+                pipeline.enviar_decodificado(quadro.caminho, quadro.img, quadro.tempos)
+            else:
+                processar_imagem(quadro.caminho, quadro.img, quadro.tempos)
+            processados += 1
+    return processados
+
+
+def processar_arquivo(caminho_arquivo, arquivo_fechado=False):
+    """Encaminha um arquivo da varredura: ao pipeline, à seleção de quadros ou direto ao OCR."""
+    if pipeline is not None:
+        return enviar_ao_pipeline(caminho_arquivo, arquivo_fechado)
+    if seletor_quadros is not None:
+        return selecionar_quadro(caminho_arquivo, arquivo_fechado)
+    return processar_imagem(caminho_arquivo, arquivo_fechado=arquivo_fechado)
+
+
+def criar_pipeline():
+    """
+    Pipeline de varredura -> decodificação -> OCR -> saída. O OCR roda no PoolOCR com
+    OCR_WORKERS processos ou, com OCR_WORKERS=0, no LoteadorOCR numa thread deste processo.
+    """
+    # Sem prazo por job (o OCR_IDADE_MAX_S da API): as filas limitadas do pipeline já seguram a
+    # varredura, e um job expirado só voltaria para ser lido e decodificado de novo
+    admissao = ControleAdmissao(idade_max_s=0)
+    if NUM_WORKERS_OCR > 0:
+        executor_ocr = PoolOCR(NUM_WORKERS_OCR, admissao=admissao)
+    else:
+        # O modelo deste processo já foi aquecido em main()
+        executor_ocr = LoteadorOCR(processar_lote_bytes, admissao=admissao)
+    return PipelineLeitor(decodificar_para_ocr, concluir_leitura, executor_ocr, decodificadores=LEITURA_THREADS)
+
+
+def pids_workers_ocr():
+    """Processos do pool de OCR do pipeline, que também recebem o kill -USR1 do leitor."""
+    if pipeline is not None and isinstance(pipeline.executor_ocr, PoolOCR):
+        return pipeline.executor_ocr.pids_workers()
+    return []
+
+
+def enviar_ao_pipeline(caminho_arquivo, arquivo_fechado=False):
+    """
+    Estágio de varredura do pipeline: descarta recortes de carros finalizados, confere
+    a estabilidade e põe o arquivo na fila de decodificação (bloqueia se ela estiver cheia).
+    """
+    nome = os.path.basename(caminho_arquivo)
+    _, car_id = interpretar_nome_arquivo(nome)
+    if descartar_carro_finalizado(caminho_arquivo, car_id):
+        return True
+    if not verificar_arquivo_completo(caminho_arquivo, arquivo_fechado):
+        print(f"[INFO] Arquivo não está pronto para processamento: {nome}")
+        return False
+    pipeline.enviar(caminho_arquivo)
+    return True
+
+
+def decodificar_para_ocr(caminho_arquivo):
+    """
+    Estágio de decodificação do pipeline: (img, tempos) para o OCR, ou (None, None) se
+    o arquivo já foi tratado aqui (ilegível e removido, ou guardado pela seleção de quadros).
+    """
+    observar_idade_job(caminho_arquivo)
+    img, tempos = carregar_imagem(caminho_arquivo)
+    if img is None or seletor_quadros is None:
+        return img, tempos
+    frame_nmr, car_id = interpretar_nome_arquivo(os.path.basename(caminho_arquivo))
+    if car_id < 0:
+        return img, tempos  # Sem car_id no nome não há como agrupar: vai direto ao OCR
+    guardar_quadro(caminho_arquivo, img, tempos, car_id, frame_nmr)
+    return None, None
+
+
+def concluir_leitura(caminho_arquivo, resultado, tempos):
+    """
+    Estágio de saída do pipeline: grava a leitura devolvida pelo executor de OCR e
+    remove o arquivo. Retorna False se o job expirou na fila (o arquivo volta à varredura).
+    Um {"erro"} aqui é da própria imagem, ou de um arquivo em que o executor já falhou
+    PIPELINE_TENTATIVAS_MAX vezes: as falhas anteriores o pipeline devolve à varredura.
+    """
+    nome = os.path.basename(caminho_arquivo)
+    if resultado.get("expirado"):
+        print(f"[WARN] OCR de {nome} expirou na fila, será tentado novamente")
+        return False
+    if "erro" in resultado:
+        print(f"[ERRO_PROC] Erro no OCR de {nome}: {resultado['erro']}")
+        metricas_ocr.leituras.inc(resultado="erro")
+    else:
+        frame_nmr, car_id = interpretar_nome_arquivo(nome)
+        tempos = dict(tempos or {})
+        tempos.update(resultado.get("tempos") or {})
+        gravar_leitura(frame_nmr, car_id, resultado["placa"], resultado["confianca"], tempos)
+    if not remover_arquivo_com_retry(caminho_arquivo):
+        print(f"[ERRO] Arquivo não foi removido: {nome}")
+    return True
+
+
 def limpar_arquivos_antigos(pasta_base, idade_maxima_horas=24):
     """
     Remove arquivos órfãos que são muito antigos (provavelmente não processados corretamente).
@@ -347,11 +696,12 @@ def processar_imagem_teste(caminho_arquivo):
     nome = os.path.basename(caminho_arquivo)
     arquivo_processado_com_sucesso = False
     img_carregada = False
+    adiado = False
     
     print(f"[TESTE] Processando imagem de teste: {nome}")
     
     # Verifica se o arquivo está completo antes de processar
-    if not verificar_arquivo_completo(caminho_arquivo, tempo_estabilidade=0.5):  # Tempo menor para teste
+    if not verificar_arquivo_completo(caminho_arquivo):
         print(f"[TESTE] Arquivo não está pronto: {nome}")
         return False
     
@@ -403,7 +753,7 @@ def processar_imagem_teste(caminho_arquivo):
         img_carregada = True
         print(f"[TESTE] Imagem carregada: {img.shape}")
         
-        texto_detectado, confianca_texto_detectado = ler_placas2(img)
+        texto_detectado, confianca_texto_detectado = ler_placa(img)
 
         # Libera a imagem da memória
         del img
@@ -426,6 +776,9 @@ def processar_imagem_teste(caminho_arquivo):
         
         arquivo_processado_com_sucesso = True
         
+    except OCRAdiado as e_adiado:
+        print(f"[TESTE] OCR adiado, será tentado novamente: {e_adiado}")
+        adiado = True
     except cv2.error as e_cv:
         print(f"[TESTE] Erro OpenCV: {e_cv}")
         arquivo_processado_com_sucesso = True
@@ -434,7 +787,7 @@ def processar_imagem_teste(caminho_arquivo):
         arquivo_processado_com_sucesso = True
     finally:
         # DELETA os arquivos após processamento conforme solicitado
-        if img_carregada or arquivo_processado_com_sucesso:
+        if (img_carregada or arquivo_processado_com_sucesso) and not adiado:
             sucesso_remocao = remover_arquivo_com_retry(caminho_arquivo)
             if sucesso_remocao:
                 print(f"[TESTE] �️ Arquivo de teste removido: {nome}")
@@ -447,12 +800,22 @@ def processar_imagem_teste(caminho_arquivo):
 
 
 def main():
-    # Arquivos ignorados adaptados para Linux (sem .crdownload que é específico do Chrome/Windows)
-    arquivos_ignorados = {".tmp", ".part", ".lock", ".swp", ".~"}
+    global pipeline
     print("[INFO] Iniciando leitor de placas (versão Debian/Linux)...")
     print(f"[INFO] Monitorando pasta: {pasta_base}")
     print(f"[INFO] Confiança mínima para gravação: {confianca_gravar_texto}")
 
+    if METRICAS_PORTA:
+        try:
+            servir_metricas(registro_metricas, METRICAS_PORTA)
+        except OSError as e:
+            print(f"[WARN] Não foi possível abrir a porta de métricas {METRICAS_PORTA}: {e}")
+
+    # Carrega e aquece o OCR antes do primeiro arquivo real (evita a lentidão das primeiras leituras);
+    # no pipeline com processos, cada worker do PoolOCR carrega e aquece o seu
+    if OCR_NESTE_PROCESSO:
+        carregar_ocr_local()
+
     # Cria a pasta base se necessário
     if not criar_pasta_base():
         print("[ERRO] Não foi possível configurar a pasta base. Encerrando.")
@@ -460,6 +823,12 @@ def main():
 
     # Cria estrutura de teste
     criar_estrutura_teste()
+
+    # Antes da pasta de teste, que também usa o OCR do pipeline quando ele está ativo
+    if LEITOR_PIPELINE:
+        pipeline = criar_pipeline()
+        pipeline.registrar_metricas(registro_metricas)
+        pipeline.iniciar()
     
     # Verifica se está em modo teste
     modo_teste = detectar_modo_teste()
@@ -470,29 +839,55 @@ def main():
         print("🧪 [TESTE] Para teste contínuo, o monitoramento normal continuará...")
         print("=" * 60)
 
+    # Com inotify os arquivos chegam por evento assim que são fechados; sem ele, varredura periódica
+    observador = None
+    if LEITOR_INOTIFY:
+        try:
+            observador = ObservadorPasta(pasta_base, arquivo_aceito)
+            observador.registrar_metricas(registro_metricas)
+            print("[INFO] Observando a pasta base por inotify")
+        except OSError as e:
+            print(f"[WARN] inotify indisponível ({e}); usando varredura periódica da pasta base")
+
+    # Sem inotify, a varredura periódica usa o índice incremental (só lista subpastas que mudaram)
+    indice_pastas = IndiceDiretorios(pasta_base, arquivo_aceito) if observador is None else None
+
     processed_files_in_current_run = set()  # Para evitar reprocessar arquivos já vistos nesta execução
+    leituras_sem_flush = False
     ultima_limpeza = datetime.now()
     intervalo_limpeza = timedelta(hours=6)  # Limpeza a cada 6 horas
 
     try:
         while True:
             encontrou_novos_arquivos = False
-            
+
+            if pipeline is not None:
+                # Arquivos que falharam em algum estágio voltam para a varredura
+                for caminho_arquivo in pipeline.retornados():
+                    processed_files_in_current_run.discard(caminho_arquivo)
+                    if observador is not None:
+                        observador.reenfileirar(caminho_arquivo)
+                    else:
+                        indice_pastas.adiar(caminho_arquivo)
+
+            if observador is not None:
+                # Espera os eventos do inotify (no lugar da varredura e das pausas entre passadas)
+                encontrou_novos_arquivos = processar_eventos_pasta(observador, processed_files_in_current_run)
+                arquivos_pendentes = []
             # Garante que a pasta base existe
-            if not os.path.exists(pasta_base):
+            elif not os.path.exists(pasta_base):
                 print(f"[ERRO] Pasta base {pasta_base} não encontrada. Aguardando...")
                 time.sleep(30)  # Espera mais se a pasta base sumir
                 continue
-
-            # Listar datas (subpastas)
-            try:
-                subpastas_data = sorted(
-                    [d for d in os.listdir(pasta_base) if os.path.isdir(os.path.join(pasta_base, d))]
-                )
-            except (FileNotFoundError, PermissionError) as e:
-                print(f"[WARN] Problema ao acessar pasta base {pasta_base}: {e}. Tentando novamente.")
-                time.sleep(5)
-                continue
+            else:
+                # Lista só as subpastas de data que mudaram; pendentes dos mais antigos para os mais novos
+                try:
+                    indice_pastas.atualizar()
+                    arquivos_pendentes = indice_pastas.retirar()
+                except (FileNotFoundError, PermissionError) as e:
+                    print(f"[WARN] Problema ao acessar pasta base {pasta_base}: {e}. Tentando novamente.")
+                    time.sleep(5)
+                    continue
 
             # Verifica pasta teste separadamente (estrutura simples)
             if os.path.exists(pasta_teste):
@@ -519,65 +914,76 @@ def main():
                     print(f"[WARN] Erro ao processar pasta teste: {e}")
 
             # Processa pastas de dados normais
-
-            for data_dir in subpastas_data:
-                pasta_data = os.path.join(pasta_base, data_dir)
-
-                try:
-                    # Ordenar por data de modificação para processar os mais antigos primeiro
-                    arquivos_na_pasta = sorted(
-                        [
-                            f
-                            for f in os.listdir(pasta_data)
-                            if os.path.isfile(os.path.join(pasta_data, f))
-                            and not any(f.endswith(ext) for ext in arquivos_ignorados)
-                            and not f.startswith(".")  # Ignora arquivos ocultos do Linux
-                            and not f.startswith("~")  # Ignora arquivos temporários
-                        ],
-                        key=lambda x: os.path.getmtime(os.path.join(pasta_data, x)),
+            for posicao, caminho_arquivo in enumerate(arquivos_pendentes):
+                nome_arquivo = os.path.basename(caminho_arquivo)
+                arquivos_pendentes_metrica.definir(len(arquivos_pendentes) - posicao)
+                if decodificacao_antecipada is not None:
+                    # Arquivo atual + os próximos ainda não processados decodificam em paralelo ao OCR
+                    decodificacao_antecipada.agendar(
+                        c for c in islice(arquivos_pendentes, posicao, None)
+                        if c not in processed_files_in_current_run
                     )
-                except (FileNotFoundError, PermissionError) as e:
-                    print(f"[WARN] Problema ao acessar subpasta {pasta_data}: {e}. Pulando.")
-                    continue  # Pula para a próxima subpasta_data
-
-                for nome_arquivo in arquivos_na_pasta:
-                    caminho_arquivo = os.path.join(pasta_data, nome_arquivo)
 
-                    if caminho_arquivo in processed_files_in_current_run:
-                        continue  # Já processado nesta sessão
+                if caminho_arquivo in processed_files_in_current_run:
+                    indice_pastas.concluir(caminho_arquivo)
+                    continue  # Já processado nesta sessão
 
-                    # Checagem adicional de arquivo temporário (Linux específico)
-                    if (nome_arquivo.startswith(".") or 
-                        nome_arquivo.endswith(".lock") or
-                        nome_arquivo.endswith(".tmp") or
-                        nome_arquivo.endswith(".swp")):
-                        print(f"[INFO] Ignorando arquivo temporário: {nome_arquivo}")
-                        continue
+                # Checagem adicional de arquivo temporário (Linux específico)
+                if (nome_arquivo.startswith(".") or 
+                    nome_arquivo.endswith(".lock") or
+                    nome_arquivo.endswith(".tmp") or
+                    nome_arquivo.endswith(".swp")):
+                    print(f"[INFO] Ignorando arquivo temporário: {nome_arquivo}")
+                    indice_pastas.concluir(caminho_arquivo)
+                    continue
 
-                    print(f"[INFO] Processando arquivo: {nome_arquivo}")
-                    
-                    # Usa processamento normal para arquivos da pasta base
-                    sucesso_processamento = processar_imagem(caminho_arquivo)
-                    
-                    if sucesso_processamento:
-                        processed_files_in_current_run.add(caminho_arquivo)  # Adiciona ao set de processados apenas se sucesso
-                        encontrou_novos_arquivos = True
-                    else:
-                        print(f"[WARN] Falha no processamento de {nome_arquivo}, será tentado novamente")
-                    
-                    # Pequena pausa para não sobrecarregar I/O ou CPU no Linux
+                print(f"[INFO] Processando arquivo: {nome_arquivo}")
+                
+                # Usa processamento normal para arquivos da pasta base (ou a seleção de quadros por carro, ou o pipeline)
+                sucesso_processamento = processar_arquivo(caminho_arquivo)
+                
+                if sucesso_processamento:
+                    processed_files_in_current_run.add(caminho_arquivo)  # Adiciona ao set de processados apenas se sucesso
+                    indice_pastas.concluir(caminho_arquivo)
+                    encontrou_novos_arquivos = True
+                else:
+                    print(f"[WARN] Falha no processamento de {nome_arquivo}, será tentado novamente")
+                    indice_pastas.adiar(caminho_arquivo)
+                
+                # Pequena pausa para não sobrecarregar I/O ou CPU no Linux (o pipeline se limita pelas filas)
+                if pipeline is None:
                     time.sleep(0.05)  # Pausa menor no Linux que geralmente tem I/O mais rápido
 
+            if seletor_quadros is not None and processar_quadros_selecionados():
+                encontrou_novos_arquivos = True
+            if agregador_placas is not None:
+                finalizar_votacoes_expiradas()
+
+            arquivos_pendentes_metrica.definir(0)
+            if METRICAS_ARQUIVO:
+                gravar_metricas(registro_metricas, METRICAS_ARQUIVO)
+
             # Se não encontrou novos arquivos, descarrega o buffer e espera mais tempo
-            if not encontrou_novos_arquivos:
+            if observador is not None:
+                # A espera já aconteceu em observador.proximos; descarrega uma vez quando a chegada para
+                if encontrou_novos_arquivos:
+                    leituras_sem_flush = True
+                elif leituras_sem_flush:
+                    flush_buffer_leituras()
+                    leituras_sem_flush = False
+            elif seletor_quadros is not None and seletor_quadros.pendentes():
+                # Janelas de seleção abertas: volta logo
+                time.sleep(rastreador_estabilidade.pausa(min(1, seletor_quadros.janela_s)))
+            elif not encontrou_novos_arquivos:
                 flush_buffer_leituras()  # Garante que o buffer seja salvo antes de uma longa espera
                 # print("[INFO] Nenhum arquivo novo encontrado. Aguardando...")
-                time.sleep(10)  # Tempo de espera original
+                # Tempo de espera original, menor se houver arquivo esperando ficar estável
+                time.sleep(rastreador_estabilidade.pausa(10))
             else:
                 # Se encontrou arquivos, pode ser que haja mais chegando, espera um pouco menos
                 # ou apenas continua o loop para verificar rapidamente.
                 # flush_buffer_leituras() # Salva o que tiver no buffer após um ciclo de processamento
-                time.sleep(1)  # Espera curta se houve processamento
+                time.sleep(rastreador_estabilidade.pausa(1))  # Espera curta se houve processamento
 
             # Limpeza periódica de arquivos órfãos
             agora = datetime.now()
@@ -599,6 +1005,18 @@ def main():
         print(f"[ERRO_FATAL] Erro inesperado no loop principal: {e_main}")
     finally:
         print("[INFO] Finalizando o programa. Salvando leituras pendentes e fechando conexão com DB.")
+        if seletor_quadros is not None:
+            # Quadros já selecionados seriam perdidos (os descartados do mesmo carro já foram removidos)
+            processar_quadros_selecionados(forcar=True)
+        if pipeline is not None:
+            # Termina o que já entrou no pipeline antes de fechar a votação e o banco
+            pipeline.encerrar()
+        if agregador_placas is not None:
+            finalizar_votacoes_expiradas(forcar=True)
+        if decodificacao_antecipada is not None:
+            decodificacao_antecipada.encerrar()
+        if observador is not None:
+            observador.fechar()
         close_db_connection()  # Garante que tudo seja salvo e a conexão fechada
         print("[INFO] Programa finalizado.")
 
@@ -617,5 +1035,9 @@ if __name__ == "__main__":
     
     # No Linux, também podemos capturar SIGHUP (hangup)
     signal.signal(signal.SIGHUP, signal_handler)
-    
+
+    if cronometragem.CRONOMETRAGEM:
+        # kill -USR1 <pid> imprime os tempos por etapa do OCR
+        cronometragem.instalar_sinal(repassar=pids_workers_ocr)
+
     main()
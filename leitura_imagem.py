@@ -0,0 +1,154 @@
+"""
+Leitura dos arquivos de recorte para o OCR: decodificação reduzida e antecipada.
+
+Decodificação reduzida: o OCR reduz toda imagem para o lado maior de
+det_limit_side_len (640) antes da detecção, então decodificar um JPEG grande
+em resolução cheia é trabalho jogado fora. O cabeçalho (marcador SOF) dá as
+dimensões e, se couber, o libjpeg decodifica direto em 1/2, 1/4 ou 1/8
+(IMREAD_REDUCED_GRAYSCALE_*), pulando a maior parte da IDCT. O fator só é
+usado se a imagem reduzida continuar com o lado maior >= LEITURA_LADO_ALVO e
+altura >= LEITURA_ALTURA_MIN (o reconhecedor trabalha com linhas de 48 px).
+
+Decodificação antecipada: um pool pequeno de threads lê e decodifica os
+próximos arquivos da varredura enquanto o OCR roda no arquivo atual (leitura
+de disco e imdecode liberam o GIL). Cada resultado guarda tamanho e mtime do
+arquivo; se o arquivo mudou até a hora do OCR, ele é lido de novo.
+"""
+
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+LEITURA_REDUZIDA = os.getenv("LEITURA_REDUZIDA", "1") != "0"
+LEITURA_LADO_ALVO = int(os.getenv("LEITURA_LADO_ALVO", "640"))  # Mesmo det_limit_side_len do util_debian
+LEITURA_ALTURA_MIN = int(os.getenv("LEITURA_ALTURA_MIN", "64"))
+LEITURA_THREADS = int(os.getenv("LEITURA_THREADS", "2"))  # 0 = sem decodificação antecipada
+LEITURA_ANTECIPACAO = int(os.getenv("LEITURA_ANTECIPACAO", "4"))  # Arquivos decodificados à frente do OCR
+
+FLAGS_REDUCAO = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+# Marcadores SOF com as dimensões do quadro (C4 = DHT, C8 = JPG, CC = DAC não são SOF)
+_MARCADORES_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def dimensoes_jpeg(dados):
+    """(largura, altura) lidas do cabeçalho de um JPEG em bytes/array, ou None se não for JPEG."""
+    dados = memoryview(dados).cast("B")
+    if len(dados) < 4 or dados[0] != 0xFF or dados[1] != 0xD8:
+        return None
+    posicao = 2
+    while posicao + 9 < len(dados):
+        if dados[posicao] != 0xFF:
+            return None
+        marcador = dados[posicao + 1]
+        if marcador == 0xFF:  # Preenchimento entre marcadores
+            posicao += 1
+            continue
+        if marcador in (0xD8, 0x01) or 0xD0 <= marcador <= 0xD7:  # Marcadores sem segmento
+            posicao += 2
+            continue
+        tamanho = (dados[posicao + 2] << 8) | dados[posicao + 3]
+        if marcador in _MARCADORES_SOF:
+            altura = (dados[posicao + 5] << 8) | dados[posicao + 6]
+            largura = (dados[posicao + 7] << 8) | dados[posicao + 8]
+            return (largura, altura) if largura and altura else None
+        if marcador == 0xDA:  # Início dos dados comprimidos sem ter achado o SOF
+            return None
+        posicao += 2 + tamanho
+    return None
+
+
+def fator_reducao(largura, altura, lado_alvo=LEITURA_LADO_ALVO, altura_min=LEITURA_ALTURA_MIN):
+    """Maior fator (8, 4, 2 ou 1) que ainda deixa a imagem com o lado maior e a altura mínimos."""
+    for fator in (8, 4, 2):
+        if max(largura, altura) / fator >= lado_alvo and altura / fator >= altura_min:
+            return fator
+    return 1
+
+
+def assinatura_arquivo(caminho):
+    estado = os.stat(caminho)
+    return estado.st_size, estado.st_mtime_ns
+
+
+def decodificar_arquivo(caminho, reduzida=LEITURA_REDUZIDA):
+    """
+    Lê e decodifica o arquivo em tons de cinza, reduzido quando possível.
+    Retorna (img ou None, fator de redução, assinatura (tamanho, mtime_ns) do arquivo lido).
+    """
+    assinatura = assinatura_arquivo(caminho)
+    dados = np.fromfile(caminho, dtype=np.uint8)
+    fator = 1
+    if reduzida:
+        dimensoes = dimensoes_jpeg(dados)
+        if dimensoes is not None:
+            fator = fator_reducao(*dimensoes)
+    img = cv2.imdecode(dados, FLAGS_REDUCAO[fator]) if dados.size else None
+    return img, fator, assinatura
+
+
+class DecodificacaoAntecipada:
+    """
+    Decodifica em threads os próximos arquivos da varredura. agendar() recebe a
+    janela atual (arquivo em OCR + os próximos) e cancela o que saiu dela;
+    obter() entrega o resultado de um arquivo, se ele foi agendado.
+    """
+
+    def __init__(self, threads=LEITURA_THREADS, antecipacao=LEITURA_ANTECIPACAO):
+        self.antecipacao = max(1, int(antecipacao))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(threads)), thread_name_prefix="decodificacao")
+        self._lock = threading.Lock()
+        self._futuros = {}  # caminho -> Future de decodificar_arquivo
+        self.aproveitadas = 0
+        self.refeitas = 0
+
+    def agendar(self, caminhos):
+        """Mantém decodificados (ou em andamento) só os primeiros `antecipacao` caminhos dados."""
+        janela = list(itertools.islice(caminhos, self.antecipacao))
+        with self._lock:
+            for caminho in [c for c in self._futuros if c not in janela]:
+                self._futuros.pop(caminho).cancel()
+            for caminho in janela:
+                if caminho not in self._futuros:
+                    self._futuros[caminho] = self._executor.submit(decodificar_arquivo, caminho)
+
+    def obter(self, caminho):
+        """
+        (img, fator) decodificados antecipadamente, se o arquivo não mudou desde então;
+        None se não foi agendado, falhou ou mudou (o chamador decodifica na hora).
+        """
+        with self._lock:
+            futuro = self._futuros.pop(caminho, None)
+        if futuro is None or futuro.cancelled():
+            return None
+        try:
+            img, fator, assinatura = futuro.result()
+            atual = assinatura_arquivo(caminho)
+        except OSError:
+            return None
+        if img is None or assinatura != atual:
+            with self._lock:
+                self.refeitas += 1
+            return None
+        with self._lock:
+            self.aproveitadas += 1
+        return img, fator
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._futuros)
+
+    def encerrar(self):
+        with self._lock:
+            for futuro in self._futuros.values():
+                futuro.cancel()
+            self._futuros.clear()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,250 @@
+"""
+Estágio de micro-lotes para o OCR.
+
+Recortes enviados por várias requisições ficam alguns milissegundos numa fila;
+a thread do loteador junta até OCR_LOTE_MAX imagens (ou o que chegar dentro de
+OCR_LOTE_ESPERA_MS) e roda o OCR do lote inteiro de uma vez. Cada requisição
+recebe o seu resultado por um Future.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+# Configuração via variáveis de ambiente (mesmo padrão do restante do projeto)
+TAMANHO_MAX_LOTE = int(os.getenv("OCR_LOTE_MAX", "8"))
+ESPERA_MAX_LOTE_MS = float(os.getenv("OCR_LOTE_ESPERA_MS", "10"))
+# Admissão: jobs aceitos e ainda não concluídos, e idade máxima de um job na fila (0 = sem limite)
+CAPACIDADE_FILA_OCR = int(os.getenv("OCR_FILA_MAX", "256"))
+IDADE_MAX_JOB_S = float(os.getenv("OCR_IDADE_MAX_S", "15"))
+
+RESULTADO_EXPIRADO = {"erro": "Job expirou na fila antes do OCR", "expirado": True}
+
+
+class FilaCheia(Exception):
+    """A fila de OCR atingiu a capacidade configurada; o job não foi aceito."""
+
+
+class ControleAdmissao:
+    """
+    Limita quantos jobs podem estar aceitos ao mesmo tempo (na fila ou em OCR)
+    e calcula o prazo de cada job. Thread-safe.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_FILA_OCR, idade_max_s=IDADE_MAX_JOB_S):
+        self.capacidade = max(1, int(capacidade))
+        self.idade_max_s = float(idade_max_s)
+        self._lock = threading.Lock()
+        self._ocupados = 0
+        self._rejeitados = 0
+        self._expirados = 0
+
+    def cheia(self):
+        return self._ocupados >= self.capacidade
+
+    def reservar(self):
+        """Ocupa uma vaga ou levanta FilaCheia. Retorna o prazo (time.monotonic) do job ou None."""
+        with self._lock:
+            if self._ocupados >= self.capacidade:
+                self._rejeitados += 1
+                raise FilaCheia(f"Fila de OCR cheia ({self.capacidade} jobs)")
+            self._ocupados += 1
+        return time.monotonic() + self.idade_max_s if self.idade_max_s > 0 else None
+
+    def registrar_rejeitado(self):
+        """Conta um job recusado antes de chegar a reservar() (ex.: checagem prévia da API)."""
+        with self._lock:
+            self._rejeitados += 1
+
+    def liberar(self, *_):
+        with self._lock:
+            self._ocupados = max(0, self._ocupados - 1)
+
+    def registrar_expirados(self, quantidade):
+        with self._lock:
+            self._expirados += quantidade
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "capacidade": self.capacidade,
+                "ocupados": self._ocupados,
+                "idade_max_s": self.idade_max_s,
+                "rejeitados": self._rejeitados,
+                "expirados": self._expirados,
+            }
+
+
+def expirado(prazo, agora=None):
+    """True se o prazo do job (time.monotonic, ou None para sem prazo) já passou."""
+    if prazo is None:
+        return False
+    return (time.monotonic() if agora is None else agora) > prazo
+
+
+def coletar_lote(fila, tamanho_max, espera_max_s):
+    """
+    Bloqueia até chegar o primeiro item e junta outros até o tamanho máximo
+    ou até esgotar o tempo de espera. Retorna None se receber o sinal de parada.
+    """
+    primeiro = fila.get()
+    if primeiro is None:
+        return None
+
+    lote = [primeiro]
+    prazo = time.monotonic() + espera_max_s
+    while len(lote) < tamanho_max:
+        restante = prazo - time.monotonic()
+        if restante <= 0:
+            break
+        try:
+            item = fila.get(timeout=restante)
+        except queue.Empty:
+            break
+        if item is None:
+            fila.put(None)  # Devolve o sinal de parada para a próxima coleta
+            break
+        lote.append(item)
+    return lote
+
+
+class EstatisticasLote:
+    """
+    Distribuição dos tamanhos de lote processados (thread-safe).
+    Funções em observadores são chamadas com o tamanho de cada lote (ex.: histograma de métricas).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._distribuicao = Counter()
+        self._itens = 0
+        self.observadores = []
+
+    def registrar(self, tamanho):
+        with self._lock:
+            self._distribuicao[tamanho] += 1
+            self._itens += tamanho
+        for observador in self.observadores:
+            observador(tamanho)
+
+    def resumo(self):
+        with self._lock:
+            lotes = sum(self._distribuicao.values())
+            return {
+                "lotes": lotes,
+                "itens": self._itens,
+                "tamanho_medio": round(self._itens / lotes, 2) if lotes else 0.0,
+                "distribuicao": {str(t): n for t, n in sorted(self._distribuicao.items())},
+            }
+
+
+class LoteadorOCR:
+    """
+    Junta imagens submetidas por várias threads em lotes e chama funcao_lote
+    (ex.: pool_ocr.processar_lote_bytes) uma vez por lote, numa thread dedicada.
+    Se aquecer for passado, ele roda nessa thread antes do primeiro lote e
+    pronto() só fica verdadeiro depois dele. admissao (ControleAdmissao) troca
+    a capacidade e o prazo padrão dos jobs (OCR_FILA_MAX, OCR_IDADE_MAX_S).
+    """
+
+    def __init__(self, funcao_lote, tamanho_max=TAMANHO_MAX_LOTE, espera_max_ms=ESPERA_MAX_LOTE_MS, aquecer=None,
+                 admissao=None):
+        self._funcao_lote = funcao_lote
+        self._aquecer = aquecer  # Chamada na thread do loteador antes de atender (retorna a duração)
+        self._pronto = threading.Event()
+        self.duracao_aquecimento = None
+        self.tamanho_max = max(1, int(tamanho_max))
+        self.espera_max_s = max(0.0, float(espera_max_ms)) / 1000.0
+        self.estatisticas = EstatisticasLote()
+        self.admissao = admissao if admissao is not None else ControleAdmissao()
+        self._fila = queue.Queue()
+        self._thread = None
+
+    def iniciar(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="loteador-ocr", daemon=True)
+        self._thread.start()
+        print(f"[INFO] Loteador de OCR iniciado (lote máximo: {self.tamanho_max}, espera máxima: {self.espera_max_s * 1000:.1f} ms)")
+
+    def parar(self, timeout=5):
+        if self._thread is None:
+            return
+        self._fila.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submeter(self, img):
+        """
+        Agenda um item (imagem ou bytes, conforme funcao_lote). Retorna um Future com o resultado.
+        Levanta FilaCheia se a capacidade de admissão estiver esgotada.
+        """
+        prazo = self.admissao.reservar()
+        futuro = Future()
+        futuro.add_done_callback(self.admissao.liberar)
+        self._fila.put((futuro, img, time.monotonic(), prazo))
+        return futuro
+
+    def pronto(self):
+        return self._pronto.is_set()
+
+    def marcar_aquecido(self, duracao):
+        """Dispensa o aquecimento na thread (já feito antes, ex.: no processo pai do servidor_prefork)."""
+        self._aquecer = None
+        self.duracao_aquecimento = round(duracao, 3)
+
+    def resumo(self):
+        return {
+            "modo": "thread",
+            "pronto": self.pronto(),
+            "aquecimento_s": self.duracao_aquecimento,
+            "workers": 1,
+            "pendentes": self._fila.qsize(),
+            "admissao": self.admissao.resumo(),
+        }
+
+    def _loop(self):
+        if self._aquecer is not None:
+            try:
+                self.duracao_aquecimento = round(self._aquecer(), 3)
+            except Exception as e:
+                print(f"[WARN] Falha no aquecimento do OCR: {e}")
+        self._pronto.set()
+
+        while True:
+            lote = coletar_lote(self._fila, self.tamanho_max, self.espera_max_s)
+            if lote is None:
+                break
+
+            # Jobs que passaram do prazo são descartados antes de gastar OCR com eles
+            agora = time.monotonic()
+            validos = []
+            for futuro, img, enfileirado_em, prazo in lote:
+                if expirado(prazo, agora):
+                    futuro.set_result(dict(RESULTADO_EXPIRADO))
+                else:
+                    validos.append((futuro, img, enfileirado_em))
+            if len(validos) < len(lote):
+                self.admissao.registrar_expirados(len(lote) - len(validos))
+            if not validos:
+                continue
+
+            futuros = [futuro for futuro, _, _ in validos]
+            imagens = [img for _, img, _ in validos]
+            self.estatisticas.registrar(len(validos))
+
+            try:
+                resultados = self._funcao_lote(imagens)
+            except Exception as e:
+                print(f"[ERRO] Falha no OCR do lote de {len(validos)} imagens: {e}")
+                for futuro in futuros:
+                    futuro.set_exception(e)
+                continue
+
+            for (futuro, _, enfileirado_em), resultado in zip(validos, resultados):
+                if isinstance(resultado, dict):
+                    resultado.setdefault("tempos", {})["fila"] = agora - enfileirado_em
+                futuro.set_result(resultado)
@@ -0,0 +1,247 @@
+"""
+Métricas no formato texto do Prometheus, sem dependências externas.
+
+Usado pela API (endpoint /metrics) e pelo leitor de pastas, que publica as
+mesmas métricas numa porta HTTP própria (METRICAS_PORTA) e/ou num arquivo
+para o textfile collector do node_exporter (METRICAS_ARQUIVO).
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (segundos) dos histogramas de latência: de 1 ms a 30 s
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_TAMANHO_LOTE = (1, 2, 4, 8, 16, 32, 64)
+
+# "cache" é a consulta ao cache de recortes (sozinha quando acertou); "filtro" é o
+# pré-filtro de presença de placa (sem as etapas seguintes quando o recorte foi descartado)
+ETAPAS_OCR = ("decodificacao", "cache", "filtro", "preprocessamento", "deteccao", "reconhecimento", "pos_processamento")
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    conteudo = ",".join(f'{nome}="{str(valor).replace(chr(34), "")}"' for nome, valor in pares)
+    return "{" + conteudo + "}"
+
+
+def _formatar_numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def _chave(self, rotulos):
+        return tuple(rotulos.get(nome, "") for nome in self.rotulos)
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        linhas.extend(self._linhas())
+        return linhas
+
+
+class _MetricaSimples(_Metrica):
+    """
+    Um valor por combinação de rótulos. Com funcao, o valor é lido na hora da exportação;
+    com rotulos, funcao devolve {tupla com os valores dos rótulos: valor}.
+    """
+
+    def __init__(self, nome, ajuda, rotulos=(), funcao=None):
+        super().__init__(nome, ajuda, rotulos)
+        self._funcao = funcao
+
+    def _linhas(self):
+        if self._funcao is not None:
+            try:
+                valor = self._funcao()
+            except Exception:
+                return []
+            if not self.rotulos:
+                return [f"{self.nome} {_formatar_numero(valor)}"]
+            itens = sorted(valor.items())
+        else:
+            with self._lock:
+                itens = sorted(self._valores.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(v)}" for chave, v in itens]
+
+
+class Contador(_MetricaSimples):
+    """Counter. Com funcao, lê um total acumulado mantido por outro objeto (ex.: descartes do filtro)."""
+
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+
+class Medidor(_MetricaSimples):
+    """Gauge. Com funcao, o valor é lido na hora da exportação (ex.: profundidade de fila)."""
+
+    tipo = "gauge"
+
+    def definir(self, valor, **rotulos):
+        with self._lock:
+            self._valores[self._chave(rotulos)] = valor
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            estado = self._valores.get(chave)
+            if estado is None:
+                estado = self._valores[chave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    estado[0][i] += 1
+                    break
+            estado[1] += valor
+            estado[2] += 1
+
+    def _linhas(self):
+        with self._lock:
+            itens = sorted((chave, (list(e[0]), e[1], e[2])) for chave, e in self._valores.items())
+        linhas = []
+        for chave, (contagens, soma, total) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, ("le", _formatar_numero(limite)))
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas exportadas juntas."""
+
+    def __init__(self):
+        self._metricas = []
+        self._lock = threading.Lock()
+
+    def _adicionar(self, metrica):
+        with self._lock:
+            self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=(), funcao=None):
+        return self._adicionar(Contador(nome, ajuda, rotulos, funcao))
+
+    def medidor(self, nome, ajuda, rotulos=(), funcao=None):
+        return self._adicionar(Medidor(nome, ajuda, rotulos, funcao))
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        return self._adicionar(Histograma(nome, ajuda, rotulos, buckets))
+
+    def exportar(self):
+        with self._lock:
+            metricas = list(self._metricas)
+        linhas = []
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+class MetricasOCR:
+    """Conjunto padrão de métricas do OCR, compartilhado pela API e pelo leitor de pastas."""
+
+    def __init__(self, registro):
+        self.registro = registro
+        self.etapas = registro.histograma(
+            "ocr_etapa_segundos", "Tempo gasto em cada etapa do OCR por imagem", rotulos=("etapa",)
+        )
+        self.idade_job = registro.histograma(
+            "ocr_idade_job_segundos", "Tempo entre a chegada do job e o início do OCR"
+        )
+        self.latencia_total = registro.histograma(
+            "ocr_latencia_total_segundos", "Tempo entre a chegada do job e o resultado"
+        )
+        self.tamanho_lote = registro.histograma(
+            "ocr_lote_tamanho", "Imagens por lote de OCR", buckets=BUCKETS_TAMANHO_LOTE
+        )
+        self.leituras = registro.contador(
+            "ocr_leituras_total",
+            "Jobs de OCR finalizados por resultado (placa, sem_placa, erro, expirado, rejeitado)",
+            rotulos=("resultado",),
+        )
+
+    def observar_tempos(self, tempos):
+        """Registra o dicionário etapa -> segundos produzido pelo util_debian/pool_ocr."""
+        for etapa, segundos in (tempos or {}).items():
+            if etapa == "fila":
+                self.idade_job.observar(segundos)
+            else:
+                self.etapas.observar(segundos, etapa=etapa)
+
+    def observar_resultado(self, resultado, latencia_s=None):
+        """Classifica o resultado de um job e registra seus tempos."""
+        if resultado.get("expirado"):
+            self.leituras.inc(resultado="expirado")
+        elif resultado.get("erro"):
+            self.leituras.inc(resultado="erro")
+        elif resultado.get("placa"):
+            self.leituras.inc(resultado="placa")
+        else:
+            self.leituras.inc(resultado="sem_placa")
+        self.observar_tempos(resultado.get("tempos"))
+        if latencia_s is not None:
+            self.latencia_total.observar(latencia_s)
+
+
+def servir_metricas(registro, porta, endereco="0.0.0.0"):
+    """Publica o registro em http://endereco:porta/metrics numa thread daemon."""
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            corpo = registro.exportar().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass  # Sem log por requisição de scrape
+
+    servidor = ThreadingHTTPServer((endereco, porta), _Handler)
+    threading.Thread(target=servidor.serve_forever, name="servidor-metricas", daemon=True).start()
+    print(f"[INFO] Métricas disponíveis em http://{endereco}:{porta}/metrics")
+    return servidor
+
+
+def gravar_metricas(registro, caminho):
+    """Grava o registro num arquivo (escrita atômica, para o textfile collector do node_exporter)."""
+    temporario = f"{caminho}.tmp"
+    try:
+        with open(temporario, "w") as f:
+            f.write(registro.exportar())
+        os.replace(temporario, caminho)
+    except OSError as e:
+        print(f"[WARN] Não foi possível gravar métricas em {caminho}: {e}")
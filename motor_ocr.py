@@ -0,0 +1,147 @@
+"""
+Motor de inferência do OCR: PaddlePaddle, ONNX Runtime ou OpenVINO (CPU).
+
+O pré e pós-processamento continuam sendo os do PaddleOCR (e o nosso, em
+util/util_debian); só a execução das redes de detecção e reconhecimento muda.
+Para onnx/openvino os modelos de detecção e reconhecimento precisam ter sido
+exportados para ONNX (paddle2onnx) e apontados por OCR_DET_MODELO / OCR_REC_MODELO.
+
+    OCR_BACKEND=paddle|onnx|openvino   (padrão: paddle)
+    OCR_DET_MODELO=/modelos/det.onnx
+    OCR_REC_MODELO=/modelos/rec.onnx
+    OCR_PRECISAO=fp32|int8             (int8: usa det_int8.onnx / rec_int8.onnx, gerados pelo quantizar_ocr.py)
+
+As threads de inferência vêm do cpu_threads passado ao PaddleOCR (OCR_CPU_THREADS
+no util_debian). onnxruntime e openvino são dependências opcionais; o PaddleOCR
+monta a sessão ONNX inicial com onnxruntime mesmo no backend openvino.
+"""
+
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+BACKENDS_OCR = ("paddle", "onnx", "openvino")
+BACKEND_OCR = os.getenv("OCR_BACKEND", "paddle").lower()
+MODELO_DET = os.getenv("OCR_DET_MODELO", "")
+MODELO_REC = os.getenv("OCR_REC_MODELO", "")
+PRECISOES_OCR = ("fp32", "int8")
+PRECISAO_OCR = os.getenv("OCR_PRECISAO", "fp32").lower()
+
+# Mesmo formato de onnxruntime.NodeArg que o PaddleOCR consulta (name, shape)
+_Tensor = namedtuple("_Tensor", "name shape")
+
+
+def sessao_onnx(caminho, threads=None):
+    """Sessão do ONNX Runtime na CPU com o número de threads controlado."""
+    import onnxruntime as ort
+
+    opcoes = ort.SessionOptions()
+    if threads:
+        opcoes.intra_op_num_threads = int(threads)
+    # Uma imagem por vez por sessão: paralelismo só dentro dos operadores
+    opcoes.inter_op_num_threads = 1
+    opcoes.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(caminho, sess_options=opcoes, providers=["CPUExecutionProvider"])
+
+
+class SessaoOpenVINO:
+    """
+    Modelo compilado pelo OpenVINO com a interface de onnxruntime.InferenceSession
+    usada pelo PaddleOCR (get_inputs, get_outputs, run).
+    """
+
+    def __init__(self, caminho, threads=None):
+        import openvino as ov
+
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = int(threads)
+        self._modelo = ov.Core().compile_model(caminho, "CPU", config)
+        self._requisicao = self._modelo.create_infer_request()
+        self._lock = threading.Lock()  # Uma requisição de inferência por sessão
+        self._entradas = [self._descrever(porta) for porta in self._modelo.inputs]
+        self._saidas = [self._descrever(porta) for porta in self._modelo.outputs]
+
+    @staticmethod
+    def _descrever(porta):
+        # Dimensões dinâmicas viram texto, como no onnxruntime (o PaddleOCR testa isso)
+        forma = [d.get_length() if d.is_static else "?" for d in porta.get_partial_shape()]
+        return _Tensor(porta.get_any_name(), forma)
+
+    def get_inputs(self):
+        return self._entradas
+
+    def get_outputs(self):
+        return self._saidas
+
+    def run(self, nomes_saida, entradas):
+        with self._lock:
+            resultado = self._requisicao.infer(entradas)
+            # Cópia: os tensores da requisição são reutilizados na próxima inferência
+            saidas = {porta.get_any_name(): np.array(resultado[porta]) for porta in self._modelo.outputs}
+        nomes = nomes_saida or [t.name for t in self._saidas]
+        return [saidas[nome] for nome in nomes]
+
+
+def caminho_modelo(caminho, precisao):
+    """Caminho do modelo na precisão pedida: det.onnx -> det_int8.onnx para int8."""
+    if precisao == "int8":
+        base, extensao = os.path.splitext(caminho)
+        return f"{base}_int8{extensao or '.onnx'}"
+    return caminho
+
+
+def configurar_motor(ocr, backend, threads=None, modelo_det=MODELO_DET, modelo_rec=MODELO_REC):
+    """
+    Troca as sessões de detecção e reconhecimento de um PaddleOCR criado com
+    use_onnx=True pelas do backend escolhido, com o número de threads pedido.
+    """
+    if backend == "paddle":
+        return ocr
+    if backend == "onnx":
+        criar = sessao_onnx
+    elif backend == "openvino":
+        criar = SessaoOpenVINO
+    else:
+        raise ValueError(f"Backend de OCR desconhecido: '{backend}' (opções: {', '.join(BACKENDS_OCR)})")
+
+    for componente, caminho in ((ocr.text_detector, modelo_det), (ocr.text_recognizer, modelo_rec)):
+        componente.predictor = criar(caminho, threads)
+        componente.input_tensor = componente.predictor.get_inputs()[0]
+        componente.output_tensors = None
+    return ocr
+
+
+def criar_ocr(backend=None, modelo_det=None, modelo_rec=None, precisao=None, **opcoes):
+    """
+    Cria o PaddleOCR com as opções dadas rodando no backend escolhido
+    (padrão: OCR_BACKEND). Para onnx/openvino, exige os modelos ONNX;
+    com precisao="int8" (padrão: OCR_PRECISAO) usa as versões quantizadas.
+    """
+    from paddleocr import PaddleOCR
+
+    backend = (backend or BACKEND_OCR).lower()
+    precisao = (precisao or PRECISAO_OCR).lower()
+    modelo_det = modelo_det or MODELO_DET
+    modelo_rec = modelo_rec or MODELO_REC
+    if backend not in BACKENDS_OCR:
+        raise ValueError(f"Backend de OCR desconhecido: '{backend}' (opções: {', '.join(BACKENDS_OCR)})")
+    if precisao not in PRECISOES_OCR:
+        raise ValueError(f"Precisão de OCR desconhecida: '{precisao}' (opções: {', '.join(PRECISOES_OCR)})")
+
+    if backend != "paddle":
+        if not (modelo_det and modelo_rec):
+            raise ValueError(f"OCR_BACKEND={backend} exige OCR_DET_MODELO e OCR_REC_MODELO (modelos .onnx)")
+        modelo_det = caminho_modelo(modelo_det, precisao)
+        modelo_rec = caminho_modelo(modelo_rec, precisao)
+        opcoes.update(use_onnx=True, det_model_dir=modelo_det, rec_model_dir=modelo_rec)
+        opcoes.pop("enable_mkldnn", None)  # Opção do PaddlePaddle
+    elif precisao != "fp32":
+        raise ValueError("OCR_PRECISAO=int8 exige OCR_BACKEND=onnx ou openvino (modelos gerados pelo quantizar_ocr.py)")
+
+    ocr = PaddleOCR(**opcoes)
+    configurar_motor(ocr, backend, opcoes.get("cpu_threads"), modelo_det, modelo_rec)
+    return ocr
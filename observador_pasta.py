@@ -0,0 +1,275 @@
+"""
+Observação da pasta de recortes por inotify (Linux), no lugar da varredura periódica.
+
+A varredura relistava pasta_base e todas as subpastas de data, ordenava por
+getmtime e dormia de 1 a 10 s entre passadas: até 10 s de atraso por placa e
+muitos stat em pastas grandes. O ObservadorPasta recebe do kernel:
+
+- IN_CLOSE_WRITE: o arquivo foi fechado por quem escrevia, já está completo;
+- IN_MOVED_TO: o arquivo foi renomeado para a pasta (escrita atômica via rename);
+- IN_CREATE/IN_MOVED_TO de diretório em pasta_base: nova subpasta de data, que
+  ganha um watch na hora e é varrida (arquivos gravados antes do watch existir).
+
+Se a fila de eventos do kernel estourar (IN_Q_OVERFLOW) ou pasta_base for
+recriada, tudo é varrido de novo com os.scandir. Arquivos achados em varredura
+não têm garantia de estar completos e voltam marcados como não fechados.
+
+inotify é chamado via ctypes (libc), sem dependência nova. Fora do Linux, ou
+com LEITOR_INOTIFY=0, o leitor segue com a varredura periódica.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import heapq
+import os
+import select
+import struct
+import time
+from collections import deque
+
+LEITOR_INOTIFY = os.getenv("LEITOR_INOTIFY", "1") != "0"
+# Espera máxima por eventos antes de devolver o controle ao laço principal (votação, métricas, limpeza)
+LEITOR_ESPERA_S = float(os.getenv("LEITOR_ESPERA_S", "1"))
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+MASCARA_BASE = IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+MASCARA_DATA = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_ONLYDIR
+
+_EVENTO = struct.Struct("iIII")  # wd, mask, cookie, len (seguido do nome com len bytes)
+_TAMANHO_LEITURA = 64 * 1024
+
+
+def _carregar_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+_libc = _carregar_libc()
+
+
+def inotify_disponivel():
+    return _libc is not None
+
+
+def listar_arquivos(pasta, aceitar_arquivo):
+    """Caminhos dos arquivos aceitos da pasta, dos mais antigos para os mais novos (mtime)."""
+    arquivos = []
+    with os.scandir(pasta) as entradas:
+        for entrada in entradas:
+            if not aceitar_arquivo(entrada.name):
+                continue
+            try:
+                if entrada.is_file():
+                    arquivos.append((entrada.stat().st_mtime, entrada.path))
+            except OSError:
+                continue  # Removido durante a varredura
+    arquivos.sort()
+    return [caminho for _, caminho in arquivos]
+
+
+class ObservadorPasta:
+    """
+    Fila de arquivos prontos em pasta_base/<data>/, alimentada por inotify.
+    proximos() espera eventos e devolve [(caminho, fechado)]; fechado indica que o
+    arquivo veio de IN_CLOSE_WRITE/IN_MOVED_TO (completo) e não de uma varredura.
+    Arquivos que falharam voltam à fila com reenfileirar().
+    """
+
+    def __init__(self, pasta_base, aceitar_arquivo=lambda nome: True):
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify indisponível (libc não encontrada)")
+        self.pasta_base = pasta_base
+        self.aceitar_arquivo = aceitar_arquivo
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            numero = ctypes.get_errno()
+            raise OSError(numero, f"inotify_init1: {os.strerror(numero)}")
+        self._pastas = {}  # wd -> caminho da pasta
+        self._wd_base = None
+        self._fila = deque()  # (caminho, fechado)
+        self._na_fila = {}  # caminho -> fechado
+        self._adiados = []  # heap de (monotonic de retorno, caminho)
+        self.eventos = 0
+        self.estouros = 0
+        self.varreduras = 0
+        self._vigiar_base()
+
+    def _adicionar_watch(self, pasta, mascara):
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(pasta), mascara)
+        if wd < 0:
+            numero = ctypes.get_errno()
+            if numero == errno.ENOSPC:
+                print(f"[WARN] Limite de watches do inotify atingido (fs.inotify.max_user_watches): {pasta}")
+            elif numero not in (errno.ENOENT, errno.ENOTDIR):
+                print(f"[WARN] Não foi possível observar {pasta}: {os.strerror(numero)}")
+            return None
+        self._pastas[wd] = pasta
+        return wd
+
+    def _vigiar_base(self):
+        """Observa pasta_base e todas as subpastas de data, e varre tudo. False se pasta_base não existe."""
+        self._wd_base = self._adicionar_watch(self.pasta_base, MASCARA_BASE)
+        if self._wd_base is None:
+            return False
+        self.varrer()
+        return True
+
+    def _vigiar_data(self, pasta):
+        # Watch antes da varredura: o que chegar entre os dois aparece nos dois e é deduplicado
+        if self._adicionar_watch(pasta, MASCARA_DATA) is not None:
+            self._varrer_data(pasta)
+
+    def _varrer_data(self, pasta):
+        try:
+            caminhos = listar_arquivos(pasta, self.aceitar_arquivo)
+        except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+            print(f"[WARN] Problema ao varrer subpasta {pasta}: {e}. Pulando.")
+            return
+        for caminho in caminhos:
+            self._enfileirar(caminho, fechado=False)
+
+    def varrer(self):
+        """Varredura completa com scandir (início, estouro da fila do kernel ou pasta_base recriada)."""
+        self.varreduras += 1
+        vigiadas = set(self._pastas.values())
+        try:
+            with os.scandir(self.pasta_base) as entradas:
+                subpastas = sorted(e.path for e in entradas if e.is_dir(follow_symlinks=False))
+        except (FileNotFoundError, PermissionError) as e:
+            print(f"[WARN] Problema ao acessar pasta base {self.pasta_base}: {e}")
+            return
+        for pasta in subpastas:
+            if pasta in vigiadas:
+                self._varrer_data(pasta)
+            else:
+                self._vigiar_data(pasta)
+
+    def _enfileirar(self, caminho, fechado):
+        if caminho in self._na_fila:
+            if fechado and not self._na_fila[caminho]:
+                self._na_fila[caminho] = True  # Achado na varredura e depois fechado: já está completo
+            return
+        self._na_fila[caminho] = fechado
+        self._fila.append(caminho)
+
+    def reenfileirar(self, caminho, atraso_s=1.0):
+        """Devolve à fila, depois de atraso_s, um arquivo que não pôde ser processado agora."""
+        heapq.heappush(self._adiados, (time.monotonic() + atraso_s, caminho))
+
+    def _ler_eventos(self):
+        try:
+            dados = os.read(self._fd, _TAMANHO_LEITURA)
+        except BlockingIOError:
+            return False
+        posicao = 0
+        while posicao + _EVENTO.size <= len(dados):
+            wd, mascara, _, tamanho = _EVENTO.unpack_from(dados, posicao)
+            inicio_nome = posicao + _EVENTO.size
+            nome = os.fsdecode(dados[inicio_nome:inicio_nome + tamanho].rstrip(b"\0"))
+            posicao = inicio_nome + tamanho
+            self.eventos += 1
+            self._tratar_evento(wd, mascara, nome)
+        return True
+
+    def _tratar_evento(self, wd, mascara, nome):
+        if mascara & IN_Q_OVERFLOW:
+            self.estouros += 1
+            print("[WARN] Fila de eventos do inotify estourou; varrendo as pastas novamente")
+            self.varrer()
+            return
+        if mascara & IN_IGNORED:  # Watch removido (pasta apagada)
+            pasta = self._pastas.pop(wd, None)
+            if wd == self._wd_base:
+                print(f"[WARN] Pasta base {pasta} deixou de existir. Aguardando...")
+                self._wd_base = None
+            return
+        pasta = self._pastas.get(wd)
+        if pasta is None:
+            return
+        if wd == self._wd_base:
+            if mascara & IN_MOVE_SELF:
+                print(f"[WARN] Pasta base {pasta} foi movida; observando o caminho original de novo")
+                self._recomecar()
+            elif mascara & IN_ISDIR and mascara & (IN_CREATE | IN_MOVED_TO):
+                self._vigiar_data(os.path.join(pasta, nome))
+            return
+        if mascara & IN_ISDIR or not nome or not (mascara & (IN_CLOSE_WRITE | IN_MOVED_TO)):
+            return
+        if self.aceitar_arquivo(nome):
+            self._enfileirar(os.path.join(pasta, nome), fechado=True)
+
+    def _recomecar(self):
+        for wd in list(self._pastas):
+            _libc.inotify_rm_watch(self._fd, wd)
+        self._pastas.clear()
+        self._wd_base = None
+
+    def _liberar_adiados(self, agora):
+        while self._adiados and self._adiados[0][0] <= agora:
+            _, caminho = heapq.heappop(self._adiados)
+            if os.path.exists(caminho):
+                self._enfileirar(caminho, fechado=False)
+
+    def proximos(self, espera_s=LEITOR_ESPERA_S):
+        """
+        Espera até espera_s por arquivos e devolve todos os prontos como [(caminho, fechado)],
+        na ordem de chegada. Lista vazia se nada chegou.
+        """
+        if self._wd_base is None and not self._vigiar_base():
+            time.sleep(espera_s)  # pasta_base ainda não existe
+            return []
+        if not self._fila:
+            espera = espera_s
+            if self._adiados:
+                espera = min(espera, max(0.0, self._adiados[0][0] - time.monotonic()))
+            prontos, _, _ = select.select([self._fd], [], [], espera)
+            if prontos:
+                while self._ler_eventos():
+                    pass
+        self._liberar_adiados(time.monotonic())
+        lote = [(caminho, self._na_fila.pop(caminho)) for caminho in self._fila]
+        self._fila.clear()
+        return lote
+
+    def pendentes(self):
+        return len(self._fila) + len(self._adiados)
+
+    def resumo(self):
+        return {
+            "pastas_observadas": len(self._pastas),
+            "pendentes": self.pendentes(),
+            "eventos": self.eventos,
+            "estouros": self.estouros,
+            "varreduras": self.varreduras,
+        }
+
+    def registrar_metricas(self, registro):
+        """Pastas com watch agora e totais de eventos do inotify e de estouros da fila do kernel."""
+        registro.medidor("observador_pastas_observadas", "Pastas com watch do inotify",
+                         funcao=lambda: len(self._pastas))
+        registro.contador("observador_eventos_total", "Eventos do inotify recebidos",
+                          funcao=lambda: self.eventos)
+        registro.contador("observador_estouros_total", "Estouros da fila de eventos do kernel (cada um gera uma varredura)",
+                          funcao=lambda: self.estouros)
+
+    def fechar(self):
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,231 @@
+"""
+Pipeline em estágios para o leitor de pastas (leitor_placas_debian).
+
+Sem o pipeline, cada arquivo passa por varredura, verificação, decodificação,
+OCR, log, gravação, remoção e gc.collect() em sequência na thread principal.
+Com LEITOR_PIPELINE=1 os estágios se sobrepõem, ligados por filas limitadas:
+
+    varredura (thread principal)
+      -> fila_decodificacao -> decodificação (LEITURA_THREADS threads)
+      -> executor de OCR (PoolOCR com OCR_WORKERS processos; 0 = LoteadorOCR numa thread)
+      -> fila_ocr (em ordem de envio) -> saída (gravação, votação, remoção, gc)
+
+Filas cheias bloqueiam o estágio anterior, então a memória fica limitada a
+PIPELINE_FILA_MAX arquivos por fila. A profundidade de cada fila aparece nas
+métricas (pipeline_*). O OCR em processos separados escala com o número de
+workers; o modelo do PaddleOCR não pode ser usado por várias threads ao mesmo
+tempo, por isso o modo em thread tem um único worker (com micro-lotes).
+
+Uma falha do executor (worker que morreu, lote que levantou exceção, executor
+parado) não diz nada sobre a imagem: o arquivo volta à varredura em vez de ser
+removido. Depois de PIPELINE_TENTATIVAS_MAX falhas seguidas do mesmo arquivo
+(um recorte que derruba o worker toda vez), ele segue para concluir() como erro.
+"""
+
+import gc
+import os
+import queue
+import threading
+from collections import deque
+
+LEITOR_PIPELINE = os.getenv("LEITOR_PIPELINE", "0") == "1"
+PIPELINE_FILA_MAX = int(os.getenv("PIPELINE_FILA_MAX", "32"))  # Capacidade de cada fila entre estágios
+# Falhas do executor de OCR num mesmo arquivo antes de desistir dele
+PIPELINE_TENTATIVAS_MAX = int(os.getenv("PIPELINE_TENTATIVAS_MAX", "3"))
+PIPELINE_GC_A_CADA = 100  # Arquivos concluídos entre um gc.collect() e outro no estágio de saída
+
+
+class PipelineLeitor:
+    """
+    Estágios de decodificação, OCR e saída em threads próprias.
+
+    decodificar(caminho) -> (img em tons de cinza, tempos) para o OCR, ou (None, None)
+    se o arquivo já foi tratado nesse estágio (ilegível, guardado pela seleção de quadros...).
+    concluir(caminho, resultado, tempos) recebe o dicionário do executor de OCR
+    ({"placa", "confianca", "tempos"} ou {"erro"}) e retorna False para tentar o arquivo de novo.
+    Arquivos que falharam saem em retornados(), para a varredura reenviar. Quando o
+    Future do OCR levanta exceção (falha do executor, não da imagem), o arquivo
+    também volta, até tentativas_max vezes; depois disso vai a concluir() com {"erro"}.
+    """
+
+    def __init__(self, decodificar, concluir, executor_ocr, decodificadores=1, fila_max=PIPELINE_FILA_MAX,
+                 tentativas_max=PIPELINE_TENTATIVAS_MAX):
+        self._decodificar = decodificar
+        self._concluir = concluir
+        self.executor_ocr = executor_ocr
+        self.num_decodificadores = max(1, int(decodificadores))
+        self.fila_decodificacao = queue.Queue(max(1, int(fila_max)))
+        self.fila_ocr = queue.Queue(max(1, int(fila_max)))  # (caminho, Future do OCR, tempos)
+        self.tentativas_max = max(1, int(tentativas_max))
+        self._lock = threading.Lock()
+        self._em_andamento = set()
+        self._tentativas = {}  # Caminho -> falhas do executor seguidas nele
+        self._retornados = deque()
+        self._threads = []
+        self.enviados = 0
+        self.concluidos = 0
+        self.falhas = 0
+        self.desistencias = 0
+
+    def iniciar(self):
+        self.executor_ocr.iniciar()
+        for indice in range(self.num_decodificadores):
+            self._threads.append(threading.Thread(
+                target=self._loop_decodificacao, name=f"pipeline-decodificacao-{indice}", daemon=True))
+        self._threads.append(threading.Thread(target=self._loop_saida, name="pipeline-saida", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        print(f"[INFO] Pipeline do leitor iniciado ({self.num_decodificadores} thread(s) de decodificação, "
+              f"filas de {self.fila_decodificacao.maxsize})")
+
+    def _reservar(self, caminho):
+        with self._lock:
+            if caminho in self._em_andamento:
+                return False
+            self._em_andamento.add(caminho)
+            self.enviados += 1
+            return True
+
+    def enviar(self, caminho):
+        """Coloca o arquivo na fila de decodificação (bloqueia se cheia). False se ele já está no pipeline."""
+        if not self._reservar(caminho):
+            return False
+        self.fila_decodificacao.put(caminho)
+        return True
+
+    def enviar_decodificado(self, caminho, img, tempos=None):
+        """Manda uma imagem já decodificada (ex.: quadro escolhido pela seleção) direto ao OCR."""
+        with self._lock:
+            self._em_andamento.add(caminho)
+            self.enviados += 1
+        self._submeter(caminho, img, tempos)
+
+    def _submeter(self, caminho, img, tempos):
+        try:
+            # Pixels crus com a forma, como o processar_lote_bytes aceita (vale para processos e thread)
+            futuro = self.executor_ocr.submeter((img.tobytes(), img.shape[:2]))
+        except Exception as e:
+            print(f"[WARN] OCR não aceitou {os.path.basename(caminho)}: {e}. Será tentado novamente")
+            self._liberar(caminho, False)
+            return
+        self.fila_ocr.put((caminho, futuro, tempos))
+
+    def _liberar(self, caminho, sucesso):
+        with self._lock:
+            self._em_andamento.discard(caminho)
+            if sucesso:
+                self._tentativas.pop(caminho, None)
+                self.concluidos += 1
+            else:
+                self.falhas += 1
+                self._retornados.append(caminho)
+
+    def _falha_executor(self, caminho):
+        """Conta uma falha do executor no arquivo. True enquanto ele ainda tem tentativas."""
+        with self._lock:
+            tentativas = self._tentativas.get(caminho, 0) + 1
+            if tentativas < self.tentativas_max:
+                self._tentativas[caminho] = tentativas
+                return True
+            self._tentativas.pop(caminho, None)
+            self.desistencias += 1
+            return False
+
+    def _loop_decodificacao(self):
+        while True:
+            caminho = self.fila_decodificacao.get()
+            if caminho is None:
+                break
+            try:
+                img, tempos = self._decodificar(caminho)
+            except Exception as e:
+                print(f"[ERRO] Falha na decodificação de {os.path.basename(caminho)}: {e}")
+                self._liberar(caminho, False)
+                continue
+            if img is None:
+                self._liberar(caminho, True)
+            else:
+                self._submeter(caminho, img, tempos)
+
+    def _loop_saida(self):
+        # Em ordem de envio: um OCR lento segura a saída dos seguintes, mas não os workers
+        saidas = 0
+        while True:
+            item = self.fila_ocr.get()
+            if item is None:
+                break
+            caminho, futuro, tempos = item
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                nome = os.path.basename(caminho)
+                if self._falha_executor(caminho):
+                    print(f"[WARN] Falha do OCR em {nome}: {e}. Será tentado novamente")
+                    self._liberar(caminho, False)
+                    continue
+                print(f"[ERRO] OCR de {nome} falhou {self.tentativas_max} vezes seguidas, desistindo: {e}")
+                resultado = {"erro": str(e)}
+            try:
+                sucesso = self._concluir(caminho, resultado, tempos)
+            except Exception as e:
+                print(f"[ERRO] Falha na saída de {os.path.basename(caminho)}: {e}")
+                sucesso = False
+            self._liberar(caminho, sucesso)
+            saidas += 1
+            if saidas % PIPELINE_GC_A_CADA == 0:
+                gc.collect()
+
+    def retornados(self):
+        """Arquivos que falharam desde a última chamada (para a varredura reenviar)."""
+        with self._lock:
+            caminhos = list(self._retornados)
+            self._retornados.clear()
+        return caminhos
+
+    def em_andamento(self):
+        with self._lock:
+            return len(self._em_andamento)
+
+    def encerrar(self, timeout=30):
+        """Termina o que já entrou no pipeline (decodificação, OCR e saída) e para os estágios."""
+        for _ in range(self.num_decodificadores):
+            self.fila_decodificacao.put(None)
+        decodificadores, saida = self._threads[:-1], self._threads[-1:]
+        for thread in decodificadores:
+            thread.join(timeout)
+        self.fila_ocr.put(None)
+        for thread in saida:
+            thread.join(timeout)
+        self.executor_ocr.parar()
+        self._threads = []
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "fila_decodificacao": self.fila_decodificacao.qsize(),
+                "fila_ocr": self.fila_ocr.qsize(),
+                "em_andamento": len(self._em_andamento),
+                "enviados": self.enviados,
+                "concluidos": self.concluidos,
+                "falhas": self.falhas,
+                "desistencias": self.desistencias,
+                "ocr": self.executor_ocr.resumo(),
+            }
+
+    def registrar_metricas(self, registro):
+        """Profundidade de cada fila e arquivos em andamento agora; totais de arquivos concluídos e devolvidos."""
+        registro.medidor("pipeline_fila_decodificacao", "Arquivos esperando decodificação no pipeline",
+                         funcao=self.fila_decodificacao.qsize)
+        registro.medidor("pipeline_fila_ocr", "Imagens enviadas ao OCR e ainda não gravadas pela saída",
+                         funcao=self.fila_ocr.qsize)
+        registro.medidor("pipeline_fila_executor", "Jobs aceitos pelo executor de OCR (fila + em processamento)",
+                         funcao=lambda: self.executor_ocr.admissao.resumo()["ocupados"])
+        registro.medidor("pipeline_em_andamento", "Arquivos em algum estágio do pipeline",
+                         funcao=self.em_andamento)
+        registro.contador("pipeline_concluidos_total", "Arquivos concluídos pelo pipeline",
+                          funcao=lambda: self.concluidos)
+        registro.contador("pipeline_falhas_total", "Arquivos devolvidos à varredura por falha no pipeline",
+                          funcao=lambda: self.falhas)
+        registro.contador("pipeline_desistencias_total",
+                          "Arquivos descartados depois de PIPELINE_TENTATIVAS_MAX falhas seguidas do executor de OCR",
+                          funcao=lambda: self.desistencias)
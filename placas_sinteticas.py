@@ -0,0 +1,133 @@
+"""
+Geração de imagens sintéticas de placas (sem arquivos externos).
+
+Usado no aquecimento do OCR ao iniciar a API ou o leitor de pastas e no
+corpus do benchmark_suite.py (gerar_corpus: placas de uma e duas linhas,
+com ruído, desfoque e rotação, reprodutível pela semente).
+"""
+
+import random
+import string
+
+import cv2
+import numpy as np
+
+
+def texto_placa_aleatorio(rng=None, mercosul=False):
+    """Sorteia um texto de placa no padrão LLLNNNN (antigo) ou LLLNLNN (Mercosul)."""
+    rng = rng or random.Random()
+    letras = "".join(rng.choice(string.ascii_uppercase) for _ in range(3))
+    if mercosul:
+        return f"{letras}{rng.choice(string.digits)}{rng.choice(string.ascii_uppercase)}{rng.choice(string.digits)}{rng.choice(string.digits)}"
+    return letras + "".join(rng.choice(string.digits) for _ in range(4))
+
+
+def gerar_placa_sintetica(texto, largura=300, altura=100, mercosul=False):
+    """
+    Desenha uma placa com o texto centralizado e devolve a imagem em tons de cinza
+    (o mesmo formato que o OCR recebe dos recortes reais).
+    """
+    img = np.full((altura, largura, 3), 235, dtype=np.uint8)
+    cv2.rectangle(img, (2, 2), (largura - 3, altura - 3), (20, 20, 20), max(1, altura // 40))
+
+    topo = 0
+    if mercosul:
+        # Faixa azul superior com "BRASIL", como nas placas Mercosul
+        topo = altura // 5
+        cv2.rectangle(img, (3, 3), (largura - 4, topo), (160, 60, 0), -1)
+        cv2.putText(img, "BRASIL", (largura // 2 - topo, topo - max(1, topo // 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, topo / 45, (255, 255, 255), 1, cv2.LINE_AA)
+
+    fonte = cv2.FONT_HERSHEY_SIMPLEX
+    espessura = max(1, altura // 25)
+    (larg_texto, alt_texto), _ = cv2.getTextSize(texto, fonte, 1.0, espessura)
+    escala = min(0.85 * largura / larg_texto, 0.55 * (altura - topo) / alt_texto)
+    (larg_texto, alt_texto), _ = cv2.getTextSize(texto, fonte, escala, espessura)
+    x = (largura - larg_texto) // 2
+    y = topo + (altura - topo + alt_texto) // 2
+    cv2.putText(img, texto, (x, y), fonte, escala, (15, 15, 15), espessura, cv2.LINE_AA)
+
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+VARIACOES_CORPUS = ("limpa", "ruido", "desfoque", "rotacao", "duas_linhas")
+
+
+def gerar_placa_duas_linhas(texto, largura=200, altura=170, mercosul=False):
+    """
+    Placa de moto: letras na linha de cima e os 4 caracteres restantes na de baixo.
+    Devolve a imagem em tons de cinza.
+    """
+    img = np.full((altura, largura, 3), 235, dtype=np.uint8)
+    cv2.rectangle(img, (2, 2), (largura - 3, altura - 3), (20, 20, 20), max(1, altura // 40))
+
+    topo = 0
+    if mercosul:
+        topo = altura // 7
+        cv2.rectangle(img, (3, 3), (largura - 4, topo), (160, 60, 0), -1)
+
+    fonte = cv2.FONT_HERSHEY_SIMPLEX
+    espessura = max(1, altura // 30)
+    altura_linha = (altura - topo) // 2
+    for indice, linha in enumerate((texto[:3], texto[3:])):
+        (larg_texto, alt_texto), _ = cv2.getTextSize(linha, fonte, 1.0, espessura)
+        escala = min(0.8 * largura / larg_texto, 0.6 * altura_linha / alt_texto)
+        (larg_texto, alt_texto), _ = cv2.getTextSize(linha, fonte, escala, espessura)
+        x = (largura - larg_texto) // 2
+        y = topo + indice * altura_linha + (altura_linha + alt_texto) // 2
+        cv2.putText(img, linha, (x, y), fonte, escala, (15, 15, 15), espessura, cv2.LINE_AA)
+
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def degradar_placa(img, rng, ruido=0.0, desfoque=0, angulo=0.0):
+    """
+    Aplica rotação (graus, com a tela ampliada para não cortar a placa), desfoque
+    gaussiano (kernel ímpar) e ruído gaussiano (desvio em níveis de cinza).
+    rng é um numpy.random.Generator, para o resultado ser reprodutível.
+    """
+    if angulo:
+        altura, largura = img.shape[:2]
+        matriz = cv2.getRotationMatrix2D((largura / 2, altura / 2), angulo, 1.0)
+        cos, sen = abs(matriz[0, 0]), abs(matriz[0, 1])
+        nova_largura = int(altura * sen + largura * cos)
+        nova_altura = int(altura * cos + largura * sen)
+        matriz[0, 2] += (nova_largura - largura) / 2
+        matriz[1, 2] += (nova_altura - altura) / 2
+        img = cv2.warpAffine(img, matriz, (nova_largura, nova_altura), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=int(rng.integers(60, 140)))
+    if desfoque:
+        img = cv2.GaussianBlur(img, (desfoque, desfoque), 0)
+    if ruido:
+        img = np.clip(img + rng.normal(0.0, ruido, img.shape), 0, 255).astype(np.uint8)
+    return img
+
+
+def gerar_corpus(quantidade, semente=0, variacoes=VARIACOES_CORPUS):
+    """
+    Corpus reprodutível de placas sintéticas, alternando as variações pedidas e
+    placas antigas/Mercosul. Retorna [(nome, img, texto esperado, variação), ...].
+    """
+    rng = random.Random(semente)
+    rng_np = np.random.default_rng(semente)
+    corpus = []
+    for i in range(quantidade):
+        variacao = variacoes[i % len(variacoes)]
+        mercosul = rng.random() < 0.5
+        texto = texto_placa_aleatorio(rng, mercosul=mercosul)
+        if variacao == "duas_linhas":
+            largura = rng.randint(120, 260)
+            img = gerar_placa_duas_linhas(texto, largura, int(largura / 1.18), mercosul=mercosul)
+            img = degradar_placa(img, rng_np, ruido=rng.uniform(0, 6))
+        else:
+            largura = rng.randint(180, 480)
+            img = gerar_placa_sintetica(texto, largura, int(largura / 3.1), mercosul=mercosul)
+            if variacao == "ruido":
+                img = degradar_placa(img, rng_np, ruido=rng.uniform(8, 22))
+            elif variacao == "desfoque":
+                img = degradar_placa(img, rng_np, desfoque=rng.choice((3, 5, 7)))
+            elif variacao == "rotacao":
+                angulo = rng.uniform(3, 8) * rng.choice((-1, 1))
+                img = degradar_placa(img, rng_np, angulo=angulo)
+        corpus.append((f"{variacao}_{i:04d}_{texto}", img, texto, variacao))
+    return corpus
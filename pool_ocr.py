@@ -0,0 +1,405 @@
+"""
+Pool de processos de OCR para o servidor FastAPI.
+
+Cada worker carrega o PaddleOCR uma única vez (import do util_debian) e recebe
+os bytes das imagens por uma fila própria, montando micro-lotes como o
+LoteadorOCR. O processo da API escolhe o worker de cada job (o com menos jobs
+atribuídos), encaminha os bytes e resolve os Futures, então o event loop
+continua livre mesmo durante rajadas de uploads.
+
+Cada worker tem a sua fila de entrada e o seu pipe de resultados: um worker
+morto (ex.: OOM) dentro do get() ou do put() de uma fila compartilhada levaria
+junto a trava dela e travaria os demais. E o pai precisa saber quais jobs
+estavam com cada worker para falhá-los quando ele morre.
+
+Um worker que morre antes de ficar pronto (ex.: o import do util_debian falha)
+é recriado com espera exponencial; depois de OCR_WORKER_FALHAS_MAX falhas
+seguidas ele é abandonado e o pool deixa de estar pronto (o /ready mostra o erro).
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+import cronometragem
+from lote_ocr import (
+    coletar_lote,
+    expirado,
+    ControleAdmissao,
+    EstatisticasLote,
+    RESULTADO_EXPIRADO,
+    TAMANHO_MAX_LOTE,
+    ESPERA_MAX_LOTE_MS,
+)
+
+# Número de processos de OCR (0 = OCR na própria API, numa thread de lotes)
+NUM_WORKERS_OCR = int(os.getenv("OCR_WORKERS", "2"))
+# Falhas seguidas de um worker antes do "pronto" até ele ser abandonado, e espera antes de cada reinício
+# (dobra a cada falha, até OCR_WORKER_ESPERA_MAX_S)
+FALHAS_INICIO_MAX = int(os.getenv("OCR_WORKER_FALHAS_MAX", "5"))
+ESPERA_REINICIO_S = float(os.getenv("OCR_WORKER_ESPERA_S", "1"))
+ESPERA_REINICIO_MAX_S = float(os.getenv("OCR_WORKER_ESPERA_MAX_S", "30"))
+
+
+def processar_lote_bytes(lista_bytes):
+    """
+    Decodifica e roda o OCR de um lote de imagens em bytes.
+    Cada item é o conteúdo de um arquivo de imagem ou uma tupla (pixels, (altura, largura))
+    com tons de cinza crus.
+    Retorna uma lista de dicionários {"placa", "confianca", "tempos"} ou {"erro"}, na ordem da entrada.
+    Usado pelos workers do pool e pelo modo sem pool (OCR_WORKERS=0).
+    """
+    # Import tardio: o modelo só é carregado no processo que de fato roda o OCR
+    from util_debian import decodificar_imagem, ler_placas2_lote
+
+    resultados = [None] * len(lista_bytes)
+    imagens = []
+    indices = []
+    tempos = []
+    for indice, imagem_bytes in enumerate(lista_bytes):
+        inicio = time.perf_counter()
+        try:
+            if isinstance(imagem_bytes, tuple):
+                img = decodificar_imagem(*imagem_bytes)
+            else:
+                img = decodificar_imagem(imagem_bytes)
+        except Exception:
+            img = None  # Uma imagem corrompida não pode derrubar o lote inteiro
+        if img is None:
+            resultados[indice] = {"erro": "Falha ao decodificar imagem"}
+        else:
+            imagens.append(img)
+            indices.append(indice)
+            tempos.append({"decodificacao": time.perf_counter() - inicio})
+
+    if imagens:
+        leituras = ler_placas2_lote(imagens, tempos=tempos)
+        for indice, (texto, confianca), tempos_item in zip(indices, leituras, tempos):
+            resultados[indice] = {
+                "placa": texto,
+                "confianca": float(confianca) if confianca is not None else None,
+                "tempos": tempos_item,
+            }
+    return resultados
+
+
+def _loop_worker(indice, fila_entrada, saida, tamanho_max, espera_max_s, cpu_threads):
+    """Laço principal de um processo worker. saida é a ponta de escrita do Pipe só deste worker."""
+    os.environ["OCR_CPU_THREADS"] = str(cpu_threads)
+    try:
+        import util_debian  # Carrega o modelo uma vez por processo
+    except Exception as e:
+        print(f"[ERRO] Worker OCR {indice} não conseguiu carregar o modelo: {e}")
+        saida.send(("erro_inicio", indice, f"{type(e).__name__}: {e}"))
+        return
+    if cronometragem.CRONOMETRAGEM:
+        cronometragem.instalar_sinal()  # O pai repassa o kill -USR1 que recebe (pids_workers)
+
+    # Só se declara pronto depois do aquecimento (kernels compilados, caches cheios)
+    try:
+        duracao_aquecimento = util_debian.aquecer_ocr()
+    except Exception as e:
+        print(f"[WARN] Worker OCR {indice} falhou no aquecimento: {e}")
+        duracao_aquecimento = None
+    saida.send(("pronto", indice, (os.getpid(), duracao_aquecimento)))
+    while True:
+        lote = coletar_lote(fila_entrada, tamanho_max, espera_max_s)
+        if lote is None:
+            break
+
+        # Jobs que passaram do prazo são descartados antes de gastar OCR com eles
+        agora = time.monotonic()
+        expirados = [(job_id, RESULTADO_EXPIRADO) for job_id, _, _, prazo in lote if expirado(prazo, agora)]
+        validos = [(job_id, imagem_bytes, enfileirado_em) for job_id, imagem_bytes, enfileirado_em, prazo in lote
+                   if not expirado(prazo, agora)]
+        if expirados:
+            saida.send(("expirados", indice, expirados))
+        if not validos:
+            continue
+
+        ids = [job_id for job_id, _, _ in validos]
+        try:
+            resultados = processar_lote_bytes([imagem_bytes for _, imagem_bytes, _ in validos])
+        except Exception as e:
+            # Falha do lote, não de uma imagem (essas vêm como {"erro"}): os Futures levantam, como no LoteadorOCR
+            print(f"[ERRO] Worker OCR {indice} falhou no lote de {len(validos)} imagens: {e}")
+            saida.send(("falha", indice, (ids, str(e))))
+            continue
+        for (_, _, enfileirado_em), resultado in zip(validos, resultados):
+            resultado.setdefault("tempos", {})["fila"] = agora - enfileirado_em
+        saida.send(("lote", indice, list(zip(ids, resultados))))
+
+
+class PoolOCR:
+    """
+    Pool de processos de OCR. submeter() recebe os bytes da imagem e devolve um
+    Future com o dicionário de resultado; workers que morrem são recriados (com
+    fila e pipe novos) e os jobs atribuídos a eles falham em vez de ficarem
+    pendentes para sempre. Quem morre antes de ficar pronto espera para ser
+    recriado e, depois de falhas_max vezes seguidas, é abandonado (erro_inicio).
+    admissao (ControleAdmissao) troca a capacidade e o prazo padrão dos jobs
+    (OCR_FILA_MAX, OCR_IDADE_MAX_S).
+    """
+
+    def __init__(self, num_workers=NUM_WORKERS_OCR, tamanho_max=TAMANHO_MAX_LOTE, espera_max_ms=ESPERA_MAX_LOTE_MS,
+                 admissao=None, falhas_max=FALHAS_INICIO_MAX, espera_reinicio_s=ESPERA_REINICIO_S):
+        self.num_workers = max(1, int(num_workers))
+        self.tamanho_max = max(1, int(tamanho_max))
+        self.espera_max_s = max(0.0, float(espera_max_ms)) / 1000.0
+        self.cpu_threads = int(os.getenv("OCR_CPU_THREADS", max(1, (os.cpu_count() or 1) // self.num_workers)))
+        self.estatisticas = EstatisticasLote()
+        self.admissao = admissao if admissao is not None else ControleAdmissao()
+
+        # spawn: o worker não herda o estado (threads, sockets) do processo da API
+        self._ctx = multiprocessing.get_context("spawn")
+        # Por worker: fila de entrada só dele (o pai escreve, ele lê) e pipe de resultados (ele escreve, o pai lê)
+        self._filas_entrada = {indice: self._ctx.Queue() for indice in range(self.num_workers)}
+        self._saidas = {}
+        self._workers = {}
+        self._workers_prontos = set()
+        self._aquecimento_concluido = False  # Todos os workers iniciais já aqueceram
+        self._inicio = None
+        self.duracao_aquecimento = None
+        self.falhas_max = max(1, int(falhas_max))
+        self.espera_reinicio_s = max(0.0, float(espera_reinicio_s))
+        self._falhas_inicio = {indice: 0 for indice in range(self.num_workers)}  # Mortes seguidas antes do "pronto"
+        self._reinicios = {}  # Índice -> instante (monotonic) em que o worker será recriado
+        self._abandonados = set()
+        self._ultimo_erro = {}  # Índice -> erro que o worker relatou ao iniciar
+        self.erro_inicio = None
+        # Índice do worker -> ids dos jobs enviados a ele e ainda sem resultado
+        self._atribuidos = {indice: set() for indice in range(self.num_workers)}
+        self._pendentes = {}
+        self._lock = threading.Lock()  # _pendentes, _atribuidos e _filas_entrada
+        self._ids = itertools.count()
+        self._parada_leitura, self._parada_escrita = self._ctx.Pipe(duplex=False)
+        self._thread_coletora = None
+        self._rodando = False
+
+    def iniciar(self):
+        if self._rodando:
+            return
+        self._rodando = True
+        self._inicio = time.monotonic()
+        for indice in range(self.num_workers):
+            self._iniciar_worker(indice)
+        self._thread_coletora = threading.Thread(target=self._coletar_resultados, name="coletor-pool-ocr", daemon=True)
+        self._thread_coletora.start()
+        print(f"[INFO] Pool de OCR iniciado com {self.num_workers} processos ({self.cpu_threads} threads de CPU cada)")
+
+    def _iniciar_worker(self, indice):
+        leitura, escrita = self._ctx.Pipe(duplex=False)
+        processo = self._ctx.Process(
+            target=_loop_worker,
+            args=(indice, self._filas_entrada[indice], escrita, self.tamanho_max, self.espera_max_s, self.cpu_threads),
+            name=f"worker-ocr-{indice}",
+            daemon=True,
+        )
+        processo.start()
+        escrita.close()  # Só o worker escreve: quando ele morre, a leitura recebe EOF
+        self._saidas[indice] = leitura
+        self._workers[indice] = processo
+
+    def parar(self, timeout=10):
+        if not self._rodando:
+            return
+        self._rodando = False
+        for fila_entrada in self._filas_entrada.values():
+            fila_entrada.put(None)
+        for processo in self._workers.values():
+            processo.join(timeout)
+            if processo.is_alive():
+                processo.terminate()
+        self._parada_escrita.send(None)
+        if self._thread_coletora is not None:
+            self._thread_coletora.join(timeout)
+
+        with self._lock:
+            pendentes = list(self._pendentes.values())
+            self._pendentes.clear()
+            for atribuidos in self._atribuidos.values():
+                atribuidos.clear()
+        for futuro in pendentes:
+            futuro.set_exception(RuntimeError("Pool de OCR finalizado"))
+
+    def submeter(self, imagem_bytes):
+        """
+        Agenda os bytes de uma imagem (ou a tupla de pixels crus aceita por
+        processar_lote_bytes). Retorna um Future com o dicionário de resultado.
+        Levanta FilaCheia se a capacidade de admissão estiver esgotada e RuntimeError
+        se todos os workers foram abandonados.
+        """
+        if len(self._abandonados) >= self.num_workers:
+            raise RuntimeError(f"Pool de OCR sem workers: {self.erro_inicio}")
+        prazo = self.admissao.reservar()
+        futuro = Future()
+        futuro.add_done_callback(self.admissao.liberar)
+        job_id = next(self._ids)
+        with self._lock:
+            # O worker com menos jobs atribuídos, de preferência um que não esteja esperando reinício;
+            # a fila é trocada junto com o worker, sob o mesmo lock
+            candidatos = [i for i in self._atribuidos if i not in self._abandonados] or list(self._atribuidos)
+            indice = min(candidatos, key=lambda i: (i in self._reinicios, len(self._atribuidos[i])))
+            self._pendentes[job_id] = futuro
+            self._atribuidos[indice].add(job_id)
+            self._filas_entrada[indice].put((job_id, imagem_bytes, time.monotonic(), prazo))
+        return futuro
+
+    def pids_workers(self):
+        return [processo.pid for processo in self._workers.values() if processo.is_alive()]
+
+    def pronto(self):
+        """
+        Pronto depois que todos os workers iniciais aqueceram e enquanto houver algum
+        pronto; nunca mais depois que algum worker foi abandonado.
+        """
+        return self.erro_inicio is None and self._aquecimento_concluido and bool(self._workers_prontos)
+
+    def resumo(self):
+        with self._lock:
+            atribuidos = {str(i): len(ids) for i, ids in sorted(self._atribuidos.items())}
+        return {
+            "modo": "processos",
+            "pronto": self.pronto(),
+            "aquecimento_s": self.duracao_aquecimento,
+            "workers": self.num_workers,
+            "workers_vivos": sum(1 for p in self._workers.values() if p.is_alive()),
+            "workers_prontos": len(self._workers_prontos),
+            "workers_abandonados": sorted(self._abandonados),
+            "erro_inicio": self.erro_inicio,
+            "pendentes": len(self._pendentes),
+            "atribuidos": atribuidos,
+            "admissao": self.admissao.resumo(),
+        }
+
+    def _coletar_resultados(self):
+        # Espera ao mesmo tempo pelos pipes de resultado e pelo fim de cada processo (sentinel)
+        while True:
+            saidas = {conexao: indice for indice, conexao in self._saidas.items()}
+            sentinelas = {processo.sentinel: indice for indice, processo in self._workers.items()}
+            espera = 1.0
+            if self._reinicios:
+                espera = min(espera, max(0.0, min(self._reinicios.values()) - time.monotonic()))
+            prontos = wait(list(saidas) + list(sentinelas) + [self._parada_leitura], timeout=espera)
+            if self._parada_leitura in prontos or not self._rodando:
+                break
+            for objeto in prontos:
+                if objeto in saidas:
+                    self._receber(saidas[objeto])
+            if any(objeto in sentinelas for objeto in prontos):
+                self._verificar_workers()
+            self._reiniciar_agendados()
+
+    def _receber(self, indice):
+        """Trata todas as mensagens já disponíveis no pipe do worker."""
+        conexao = self._saidas[indice]
+        try:
+            while conexao.poll():
+                tipo, indice, dados = conexao.recv()
+                self._tratar_mensagem(tipo, indice, dados)
+        except (EOFError, OSError):
+            pass  # Worker morreu; o sentinel dele leva a _verificar_workers
+
+    def _tratar_mensagem(self, tipo, indice, dados):
+        if tipo == "pronto":
+            pid, duracao = dados
+            self._workers_prontos.add(indice)
+            self._falhas_inicio[indice] = 0
+            self._ultimo_erro.pop(indice, None)
+            print(f"[INFO] Worker OCR {indice} pronto (pid {pid}, aquecimento {duracao or 0:.1f}s)")
+            if not self._aquecimento_concluido and len(self._workers_prontos) >= self.num_workers:
+                self._aquecimento_concluido = True
+                # Do início do pool até o último worker aquecido
+                self.duracao_aquecimento = round(time.monotonic() - self._inicio, 3)
+        elif tipo == "erro_inicio":
+            self._ultimo_erro[indice] = dados
+        elif tipo == "expirados":
+            self.admissao.registrar_expirados(len(dados))
+            self._resolver(indice, dados)
+        elif tipo == "lote":
+            self.estatisticas.registrar(len(dados))
+            self._resolver(indice, dados)
+        elif tipo == "falha":
+            ids, mensagem = dados
+            self.estatisticas.registrar(len(ids))
+            self._falhar(indice, ids, RuntimeError(mensagem))
+
+    def _resolver(self, indice, pares):
+        for job_id, resultado in pares:
+            with self._lock:
+                futuro = self._pendentes.pop(job_id, None)
+                self._atribuidos[indice].discard(job_id)
+            if futuro is not None:
+                futuro.set_result(dict(resultado))
+
+    def _falhar(self, indice, ids, erro):
+        for job_id in ids:
+            with self._lock:
+                futuro = self._pendentes.pop(job_id, None)
+                self._atribuidos[indice].discard(job_id)
+            if futuro is not None:
+                futuro.set_exception(erro)
+
+    def _verificar_workers(self):
+        """Recria (ou agenda a recriação de) workers que morreram e falha os jobs que se perderam com eles."""
+        if not self._rodando:
+            return
+        for indice, processo in list(self._workers.items()):
+            if processo.is_alive():
+                continue
+            self._receber(indice)  # Resultados que ele enviou antes de morrer ainda valem
+            self._saidas.pop(indice).close()
+            del self._workers[indice]
+            if indice in self._workers_prontos:
+                print(f"[ERRO] Worker OCR {indice} morreu (exitcode {processo.exitcode}). Reiniciando...")
+                self._workers_prontos.discard(indice)
+                self._falhar_atribuidos(indice)
+                self._iniciar_worker(indice)
+            elif not self._agendar_reinicio(indice, processo.exitcode):
+                self._falhar_atribuidos(indice)
+            # Se ainda vai ser recriado, ele não chegou a ler a fila: os jobs dela esperam o próximo processo
+
+    def _falhar_atribuidos(self, indice):
+        """Falha os jobs do worker morto (na fila dele ou já no lote) e troca a fila, cuja trava pode ter ficado presa."""
+        with self._lock:
+            futuros = [self._pendentes.pop(job_id, None) for job_id in self._atribuidos[indice]]
+            self._atribuidos[indice] = set()
+            fila_antiga = self._filas_entrada[indice]
+            self._filas_entrada[indice] = self._ctx.Queue()
+        # Ninguém mais lê essa fila: sem isso a thread de envio dela poderia segurar a saída do processo
+        fila_antiga.cancel_join_thread()
+        fila_antiga.close()
+        for futuro in futuros:
+            if futuro is not None:
+                futuro.set_exception(RuntimeError(f"Worker OCR {indice} morreu antes de devolver o resultado"))
+
+    def _agendar_reinicio(self, indice, exitcode):
+        """
+        Worker que morreu antes do "pronto": agenda a recriação com espera exponencial.
+        Retorna False se ele já falhou falhas_max vezes seguidas e foi abandonado.
+        """
+        self._falhas_inicio[indice] += 1
+        falhas = self._falhas_inicio[indice]
+        erro = self._ultimo_erro.get(indice) or f"exitcode {exitcode}"
+        if falhas >= self.falhas_max:
+            with self._lock:
+                self._abandonados.add(indice)
+            self.erro_inicio = f"Worker OCR {indice} falhou {falhas} vezes seguidas ao iniciar ({erro})"
+            print(f"[ERRO] {self.erro_inicio}. Ele não será mais recriado; pool não está pronto")
+            return False
+        espera = min(ESPERA_REINICIO_MAX_S, self.espera_reinicio_s * 2 ** (falhas - 1))
+        print(f"[WARN] Worker OCR {indice} morreu antes de ficar pronto ({erro}); "
+              f"tentativa {falhas + 1}/{self.falhas_max} em {espera:.1f}s")
+        self._reinicios[indice] = time.monotonic() + espera
+        return True
+
+    def _reiniciar_agendados(self):
+        agora = time.monotonic()
+        for indice, instante in list(self._reinicios.items()):
+            if instante <= agora and self._rodando:
+                self._reinicios.pop(indice, None)
+                self._iniciar_worker(indice)
@@ -0,0 +1,176 @@
+"""
+Quantização INT8 dos modelos ONNX do OCR (detecção e reconhecimento).
+
+1. Calibração: roda o util_debian com os modelos FP32 (OCR_BACKEND=onnx) sobre
+   uma pasta de recortes reais e grava as entradas exatas que cada rede recebe
+   (mesmo pré-processamento do PaddleOCR).
+2. Quantização estática (formato QDQ, pesos por canal) com onnxruntime.quantization,
+   gravando det_int8.onnx / rec_int8.onnx ao lado dos modelos originais, que é onde
+   o motor_ocr procura com OCR_PRECISAO=int8. --metodo dinamico quantiza só os
+   pesos, sem calibração.
+3. Relatório: mede FP32 e INT8 com o benchmark_ocr (subprocessos) e compara
+   acurácia de placa exata (já depois do corrigir_placa) e latência por imagem.
+
+Uso:
+    OCR_DET_MODELO=modelos/det.onnx OCR_REC_MODELO=modelos/rec.onnx \\
+        python quantizar_ocr.py --calibracao ~/recortes --avaliacao teste --saida relatorio.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import cv2
+
+EXTENSOES_IMAGEM = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+class GravadorEntradas:
+    """Envolve uma sessão do ONNX Runtime e guarda cópias das entradas de cada run()."""
+
+    def __init__(self, sessao, limite):
+        self._sessao = sessao
+        self.limite = limite
+        self.entradas = []
+
+    def get_inputs(self):
+        return self._sessao.get_inputs()
+
+    def get_outputs(self):
+        return self._sessao.get_outputs()
+
+    def run(self, nomes_saida, entradas):
+        if len(self.entradas) < self.limite:
+            self.entradas.append({nome: valor.copy() for nome, valor in entradas.items()})
+        return self._sessao.run(nomes_saida, entradas)
+
+
+def coletar_calibracao(pasta, limite):
+    """Roda o OCR FP32 na pasta e devolve (entradas da detecção, entradas do reconhecimento)."""
+    os.environ["OCR_BACKEND"] = "onnx"
+    os.environ["OCR_PRECISAO"] = "fp32"
+    os.environ["OCR_CACHE_TAMANHO"] = "0"
+    # Sem o caminho rápido, todas as imagens passam pelas duas redes
+    os.environ["OCR_CAMINHO_RAPIDO"] = "0"
+    import util_debian
+
+    gravador_det = GravadorEntradas(util_debian.ocr.text_detector.predictor, limite)
+    gravador_rec = GravadorEntradas(util_debian.ocr.text_recognizer.predictor, limite)
+    util_debian.ocr.text_detector.predictor = gravador_det
+    util_debian.ocr.text_recognizer.predictor = gravador_rec
+
+    arquivos = sorted(n for n in os.listdir(pasta) if n.lower().endswith(EXTENSOES_IMAGEM))
+    for nome in arquivos[:limite]:
+        img = cv2.imread(os.path.join(pasta, nome), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            util_debian.ler_placas2(img, usar_cache=False)
+    print(f"[INFO] Calibração: {len(gravador_det.entradas)} entradas de detecção, "
+          f"{len(gravador_rec.entradas)} de reconhecimento ({min(len(arquivos), limite)} imagens)")
+    return gravador_det.entradas, gravador_rec.entradas
+
+
+def quantizar_modelo(origem, destino, entradas, metodo, calibracao):
+    from onnxruntime import quantization as q
+
+    if metodo == "dinamico":
+        q.quantize_dynamic(origem, destino, weight_type=q.QuantType.QInt8)
+        return
+
+    if not entradas:
+        raise ValueError(f"Nenhuma entrada de calibração para {origem}; confira a pasta de calibração")
+
+    class _Leitor(q.CalibrationDataReader):
+        def __init__(self):
+            self._iterador = iter(entradas)
+
+        def get_next(self):
+            return next(self._iterador, None)
+
+    metodos_calibracao = {
+        "minmax": q.CalibrationMethod.MinMax,
+        "entropia": q.CalibrationMethod.Entropy,
+        "percentil": q.CalibrationMethod.Percentile,
+    }
+    q.quantize_static(
+        origem,
+        destino,
+        _Leitor(),
+        quant_format=q.QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=q.QuantType.QUInt8,
+        weight_type=q.QuantType.QInt8,
+        calibrate_method=metodos_calibracao[calibracao],
+    )
+
+
+def comparar(args):
+    """Mede FP32 e INT8 com o benchmark_ocr e devolve o relatório."""
+    import benchmark_ocr
+
+    argumentos = argparse.Namespace(pasta=args.avaliacao, sinteticas=args.sinteticas, lote=8, semente=0)
+    fp32 = benchmark_ocr.executar_em_subprocesso(args.backend, argumentos, {"OCR_PRECISAO": "fp32"})
+    int8 = benchmark_ocr.executar_em_subprocesso(args.backend, argumentos, {"OCR_PRECISAO": "int8"})
+    benchmark_ocr.imprimir_tabela([fp32, int8])
+
+    relatorio = {"fp32": fp32, "int8": int8}
+    if "erro" not in fp32 and "erro" not in int8:
+        relatorio["aceleracao_p50"] = round(fp32["latencia_ms"]["p50"] / int8["latencia_ms"]["p50"], 2)
+        if fp32["acuracia"] is not None:
+            relatorio["delta_acuracia"] = round(int8["acuracia"] - fp32["acuracia"], 4)
+        print(f"[INFO] INT8: {relatorio['aceleracao_p50']}x mais rápido (p50)"
+              + (f", acurácia {relatorio['delta_acuracia']:+.2%}" if "delta_acuracia" in relatorio else ""))
+    return relatorio
+
+
+def main():
+    from motor_ocr import MODELO_DET, MODELO_REC, caminho_modelo
+
+    parser = argparse.ArgumentParser(description="Quantiza os modelos ONNX do OCR para INT8 e compara com FP32")
+    parser.add_argument("--calibracao", help="Pasta com recortes de placas para calibração")
+    parser.add_argument("--avaliacao", help="Pasta de avaliação (placa esperada no nome); padrão: a de calibração")
+    parser.add_argument("--sinteticas", type=int, default=0, help="Placas sintéticas a incluir na avaliação")
+    parser.add_argument("--limite", type=int, default=300, help="Máximo de imagens usadas na calibração")
+    parser.add_argument("--metodo", choices=("estatico", "dinamico"), default="estatico")
+    parser.add_argument("--calibracao-metodo", dest="calibracao_metodo",
+                        choices=("minmax", "entropia", "percentil"), default="minmax")
+    parser.add_argument("--modelos", default="det,rec", help="Quais modelos quantizar (det, rec ou ambos)")
+    parser.add_argument("--backend", choices=("onnx", "openvino"), default="onnx", help="Backend do relatório")
+    parser.add_argument("--sem-relatorio", action="store_true")
+    parser.add_argument("--saida", help="Arquivo JSON para gravar o relatório")
+    args = parser.parse_args()
+
+    if not (MODELO_DET and MODELO_REC):
+        sys.exit("[ERRO] Defina OCR_DET_MODELO e OCR_REC_MODELO com os modelos ONNX FP32")
+    if args.metodo == "estatico" and not args.calibracao:
+        sys.exit("[ERRO] A quantização estática exige --calibracao com uma pasta de recortes")
+    args.avaliacao = args.avaliacao or args.calibracao
+
+    modelos = {m.strip() for m in args.modelos.split(",")}
+    entradas_det, entradas_rec = [], []
+    if args.metodo == "estatico":
+        entradas_det, entradas_rec = coletar_calibracao(args.calibracao, args.limite)
+
+    for nome, origem, entradas in (("det", MODELO_DET, entradas_det), ("rec", MODELO_REC, entradas_rec)):
+        destino = caminho_modelo(origem, "int8")
+        if nome in modelos:
+            quantizar_modelo(origem, destino, entradas, args.metodo, args.calibracao_metodo)
+            print(f"[INFO] Modelo {nome} quantizado: {destino} "
+                  f"({os.path.getsize(origem) / 1e6:.1f} MB -> {os.path.getsize(destino) / 1e6:.1f} MB)")
+        elif not os.path.exists(destino):
+            # O modo int8 carrega os dois arquivos; o modelo não quantizado segue em FP32
+            shutil.copyfile(origem, destino)
+            print(f"[INFO] Modelo {nome} mantido em FP32 em {destino}")
+
+    if args.sem_relatorio or not (args.avaliacao or args.sinteticas):
+        return
+    relatorio = comparar(args)
+    if args.saida:
+        with open(args.saida, "w") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"[INFO] Relatório gravado em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Armazém em memória dos resultados de OCR da API.
+
+Cada upload vira um job com ID próprio. O resultado (placa, confiança e
+latência) fica guardado por RESULTADOS_TTL_S segundos, com no máximo
+RESULTADOS_MAX jobs; os mais antigos são descartados primeiro.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+RESULTADOS_MAX = int(os.getenv("RESULTADOS_MAX", "10000"))
+RESULTADOS_TTL_S = float(os.getenv("RESULTADOS_TTL_S", "300"))
+
+
+class ArmazemResultados:
+    """Jobs de OCR indexados por ID, com limite de tamanho e expiração (TTL)."""
+
+    def __init__(self, max_itens=RESULTADOS_MAX, ttl_s=RESULTADOS_TTL_S):
+        self.max_itens = max(1, int(max_itens))
+        self.ttl_s = float(ttl_s)
+        self._jobs = OrderedDict()  # job_id -> (instante de criação, job, futuro)
+        self._lock = threading.Lock()
+
+    def novo_job(self, nome_arquivo, futuro):
+        """Registra um job ligado ao Future do OCR e devolve uma cópia do seu estado."""
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "arquivo": nome_arquivo,
+            "status": "pendente",
+            "placa": None,
+            "confianca": None,
+            "latencia_ms": None,
+            "recebido_em": datetime.now().isoformat(timespec="milliseconds"),
+        }
+        with self._lock:
+            self._remover_expirados()
+            self._jobs[job_id] = (time.monotonic(), job, futuro)
+            while len(self._jobs) > self.max_itens:
+                self._jobs.popitem(last=False)
+            copia = dict(job)
+
+        futuro.add_done_callback(lambda f: self._concluir(job_id, f))
+        return copia
+
+    def obter(self, job_id):
+        """Estado atual do job, ou None se não existe ou já expirou."""
+        with self._lock:
+            self._remover_expirados()
+            entrada = self._jobs.get(job_id)
+            return dict(entrada[1]) if entrada else None
+
+    async def aguardar(self, job_id, timeout):
+        """
+        Long-poll: espera o OCR do job terminar (até timeout segundos) e devolve o
+        estado do job. Retorna None se o job não existe.
+        """
+        with self._lock:
+            entrada = self._jobs.get(job_id)
+        if entrada is None:
+            return None
+
+        futuro = entrada[2]
+        if not futuro.done() and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(futuro)), timeout)
+            except asyncio.TimeoutError:
+                pass
+            except Exception:
+                pass  # O erro do OCR já fica registrado no próprio job
+        return self.obter(job_id)
+
+    def resumo(self):
+        with self._lock:
+            self._remover_expirados()
+            pendentes = sum(1 for _, job, _ in self._jobs.values() if job["status"] == "pendente")
+            return {"jobs": len(self._jobs), "pendentes": pendentes, "max_itens": self.max_itens, "ttl_s": self.ttl_s}
+
+    def _concluir(self, job_id, futuro):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            resultado = {"erro": str(e)}
+
+        with self._lock:
+            entrada = self._jobs.get(job_id)
+            if entrada is None:
+                return  # Job já descartado (TTL ou limite de tamanho)
+            criado_em, job, _ = entrada
+            job["latencia_ms"] = round((time.monotonic() - criado_em) * 1000, 1)
+            if resultado.get("erro"):
+                # Jobs descartados por idade na fila ficam com status próprio
+                job["status"] = "expirado" if resultado.get("expirado") else "erro"
+                job["erro"] = resultado["erro"]
+            else:
+                job["status"] = "concluido"
+                job["placa"] = resultado.get("placa")
+                job["confianca"] = resultado.get("confianca")
+
+    def _remover_expirados(self):
+        """Remove do início do OrderedDict (mais antigos) os jobs além do TTL. Chamar com o lock."""
+        limite = time.monotonic() - self.ttl_s
+        while self._jobs:
+            job_id, (criado_em, _, _) = next(iter(self._jobs.items()))
+            if criado_em >= limite:
+                break
+            del self._jobs[job_id]
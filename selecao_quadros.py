@@ -0,0 +1,139 @@
+"""
+Seleção dos melhores quadros por carro antes do OCR.
+
+O lado da captura grava de 5 a 20 recortes do mesmo carro (car_id no nome do
+arquivo) e cada um iria para o OCR. Aqui os recortes de um car_id ficam
+agrupados por uma janela curta (SELECAO_JANELA_S a partir do primeiro), cada
+um recebe uma nota de qualidade e só os SELECAO_TOP_K melhores seguem para o
+ler_placas2; os demais são descartados sem inferência.
+
+Nota de qualidade (produto de três fatores entre 0 e 1):
+- nitidez: variância do Laplaciano, numa escala de altura fixa para não
+  favorecer recortes só por serem maiores;
+- tamanho: altura do recorte em relação a ALTURA_REFERENCIA;
+- exposição: penaliza pixels estourados/pretos e média longe do meio da escala.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+SELECAO_QUADROS = os.getenv("SELECAO_QUADROS", "0") == "1"
+SELECAO_JANELA_S = float(os.getenv("SELECAO_JANELA_S", "2.0"))
+SELECAO_TOP_K = int(os.getenv("SELECAO_TOP_K", "2"))
+# Com tantos recortes de um carro a janela fecha antes do prazo
+SELECAO_MAX_QUADROS = int(os.getenv("SELECAO_MAX_QUADROS", "20"))
+
+ALTURA_NITIDEZ = 64  # Altura em que a variância do Laplaciano é medida
+NITIDEZ_REFERENCIA = 150.0  # Variância em que o fator de nitidez vale 0,5
+ALTURA_REFERENCIA = 60  # Altura (px) a partir da qual o tamanho não melhora a nota
+
+QuadroCandidato = namedtuple("QuadroCandidato", "nota sequencia car_id frame_nmr caminho img tempos")
+
+
+def qualidade_recorte(img):
+    """Retorna (nota, {"nitidez", "tamanho", "exposicao"}) de um recorte em tons de cinza ou BGR."""
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    altura, largura = img.shape[:2]
+    escala = img
+    if altura > ALTURA_NITIDEZ:
+        escala = cv2.resize(img, (max(1, round(largura * ALTURA_NITIDEZ / altura)), ALTURA_NITIDEZ),
+                            interpolation=cv2.INTER_AREA)
+    variancia = float(cv2.Laplacian(escala, cv2.CV_32F).var())
+    nitidez = variancia / (variancia + NITIDEZ_REFERENCIA)
+
+    tamanho = min(1.0, altura / ALTURA_REFERENCIA)
+
+    saturados = float(np.count_nonzero((escala <= 5) | (escala >= 250))) / escala.size
+    media = float(escala.mean())
+    exposicao = max(0.0, 1.0 - saturados) * (1.0 - 0.5 * abs(media - 127.5) / 127.5)
+
+    nota = nitidez * tamanho * exposicao
+    return nota, {"nitidez": round(variancia, 1), "tamanho": round(tamanho, 3), "exposicao": round(exposicao, 3)}
+
+
+class SeletorQuadros:
+    """
+    Agrupa recortes por car_id numa janela de tempo e guarda só os top_k de melhor nota.
+    Thread-safe; o tempo vem de time.monotonic (ou do parâmetro agora, nos testes).
+    """
+
+    def __init__(self, janela_s=SELECAO_JANELA_S, top_k=SELECAO_TOP_K, max_quadros=SELECAO_MAX_QUADROS):
+        self.janela_s = float(janela_s)
+        self.top_k = max(1, int(top_k))
+        self.max_quadros = max(self.top_k, int(max_quadros))
+        self._lock = threading.Lock()
+        self._grupos = {}  # car_id -> {"inicio": monotonic, "recebidos": n, "melhores": [QuadroCandidato]}
+        self._sequencia = 0
+        self.recebidos = 0
+        self.selecionados = 0
+        self.descartados = 0
+
+    def adicionar(self, car_id, img, caminho=None, frame_nmr=-1, tempos=None, agora=None):
+        """
+        Dá nota ao recorte e o guarda no grupo do car_id se estiver entre os top_k.
+        Retorna a lista de QuadroCandidato que saíram do top_k (o próprio, se não entrou):
+        esses não vão ao OCR e seus arquivos podem ser removidos.
+        """
+        nota, _ = qualidade_recorte(img)
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            self._sequencia += 1
+            candidato = QuadroCandidato(nota, self._sequencia, car_id, frame_nmr, caminho, img, tempos)
+            grupo = self._grupos.setdefault(car_id, {"inicio": agora, "recebidos": 0, "melhores": []})
+            grupo["recebidos"] += 1
+            self.recebidos += 1
+            melhores = grupo["melhores"]
+            melhores.append(candidato)
+            # Empate na nota: fica o quadro mais recente (carro mais perto da câmera)
+            melhores.sort(key=lambda q: (q.nota, q.sequencia), reverse=True)
+            descartados = melhores[self.top_k:]
+            del melhores[self.top_k:]
+            self.descartados += len(descartados)
+            return descartados
+
+    def prontos(self, agora=None, forcar=False):
+        """
+        Fecha os grupos cuja janela venceu (ou que atingiram max_quadros; todos, com forcar)
+        e devolve [(car_id, [QuadroCandidato, ...] do melhor para o pior)].
+        """
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            fechados = [
+                car_id for car_id, grupo in self._grupos.items()
+                if forcar or agora - grupo["inicio"] >= self.janela_s or grupo["recebidos"] >= self.max_quadros
+            ]
+            saida = [(car_id, self._grupos.pop(car_id)["melhores"]) for car_id in fechados]
+            self.selecionados += sum(len(melhores) for _, melhores in saida)
+        return saida
+
+    def pendentes(self):
+        """Quantidade de car_ids com janela aberta."""
+        with self._lock:
+            return len(self._grupos)
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "janela_s": self.janela_s,
+                "top_k": self.top_k,
+                "grupos_abertos": len(self._grupos),
+                "recebidos": self.recebidos,
+                "selecionados": self.selecionados,
+                "descartados": self.descartados,
+                "taxa_descarte": round(self.descartados / self.recebidos, 3) if self.recebidos else 0.0,
+            }
+
+    def registrar_metricas(self, registro):
+        """Totais de recortes recebidos e descartados sem OCR, e quantos car_ids têm janela aberta agora."""
+        registro.contador("selecao_quadros_recebidos_total", "Recortes recebidos pela seleção de quadros por car_id",
+                          funcao=lambda: self.resumo()["recebidos"])
+        registro.contador("selecao_quadros_descartados_total", "Recortes descartados pela seleção de quadros sem passar pelo OCR",
+                          funcao=lambda: self.resumo()["descartados"])
+        registro.medidor("selecao_quadros_grupos_abertos", "car_ids com janela de seleção aberta",
+                         funcao=lambda: self.resumo()["grupos_abertos"])
@@ -0,0 +1,229 @@
+"""
+Servidor da API em modo pre-fork.
+
+O processo pai importa o util_debian (carrega o PaddleOCR) uma única vez, sem
+rodar inferência; depois congela o heap do Python (gc.freeze) e cria os
+workers com fork. Os workers herdam o modelo já carregado e compartilham as páginas
+de memória com o pai (copy-on-write) em vez de cada um carregar uma cópia,
+como acontece com `uvicorn api_server:app --workers N`.
+
+Cada worker roda o uvicorn no mesmo socket (o kernel distribui as conexões)
+e faz o OCR no próprio processo (OCR_WORKERS=0, loteador em thread).
+O pai reinicia workers que morrerem e imprime periodicamente a memória
+residente (RSS), proporcional (PSS) e compartilhada de cada um.
+
+Uso:
+    python servidor_prefork.py --workers 4 --port 8000
+
+Cada worker faz o próprio aquecimento depois do fork (no loteador, antes de
+responder /ready). Inferência no pai antes do fork cria os pools de threads e
+travas do Paddle/MKL-DNN/OpenMP, que o filho herdaria num estado indefinido
+e que podem travar nele. PREFORK_AQUECER=1 aquece no pai mesmo assim (os
+workers ficam prontos mais cedo); use só se o conjunto de bibliotecas da
+imagem já foi testado assim.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import cronometragem
+
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", "2"))
+PREFORK_AQUECER = os.getenv("PREFORK_AQUECER", "0") == "1"  # Aquecimento no pai, antes do fork (arriscado)
+PREFORK_RELATORIO_S = float(os.getenv("PREFORK_RELATORIO_S", "300"))  # 0 = só o relatório inicial
+
+CAMPOS_SMAPS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "compartilhada_mb",
+    "Shared_Dirty": "compartilhada_mb",
+    "Private_Clean": "privada_mb",
+    "Private_Dirty": "privada_mb",
+}
+
+
+def memoria_processo(pid="self"):
+    """
+    Memória de um processo em MB, lida de /proc/<pid>/smaps_rollup:
+    rss_mb (residente), pss_mb (residente com páginas compartilhadas divididas
+    entre os processos que as usam), compartilhada_mb e privada_mb.
+    Sem smaps_rollup (kernels antigos), usa /proc/<pid>/statm (sem PSS).
+    """
+    memoria = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for linha in f:
+                partes = linha.split()
+                campo = CAMPOS_SMAPS.get(partes[0].rstrip(":"))
+                if campo is not None:
+                    memoria[campo] = memoria.get(campo, 0.0) + int(partes[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                _, residente, compartilhada = (int(v) for v in f.read().split()[:3])
+        except (OSError, ValueError):
+            return {}
+        pagina_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        memoria = {
+            "rss_mb": residente * pagina_mb,
+            "compartilhada_mb": compartilhada * pagina_mb,
+            "privada_mb": (residente - compartilhada) * pagina_mb,
+        }
+    return {campo: round(valor, 1) for campo, valor in memoria.items()}
+
+
+def relatorio_memoria(workers):
+    """Imprime a memória do pai e de cada worker (dict pid -> índice)."""
+    processos = [("pai", os.getpid())] + [(f"worker {i}", pid) for pid, i in sorted(workers.items(), key=lambda x: x[1])]
+    total_pss = 0.0
+    for nome, pid in processos:
+        m = memoria_processo(pid)
+        if not m:
+            continue
+        total_pss += m.get("pss_mb", m["rss_mb"])
+        print(f"[INFO] Memória {nome} (pid {pid}): RSS {m['rss_mb']:.1f} MB, "
+              f"PSS {m.get('pss_mb', float('nan')):.1f} MB, compartilhada {m['compartilhada_mb']:.1f} MB, "
+              f"privada {m['privada_mb']:.1f} MB")
+    print(f"[INFO] Memória total (soma do PSS): {total_pss:.1f} MB")
+
+
+def criar_socket(host, porta, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _executar_worker(indice, app, sock, log_level):
+    """Corpo do processo filho: roda o uvicorn no socket herdado e nunca retorna."""
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if cronometragem.CRONOMETRAGEM:
+        cronometragem.instalar_sinal()  # Substitui o do pai, que só repassa o sinal
+    codigo = 0
+    try:
+        print(f"[INFO] Worker {indice} iniciado (pid {os.getpid()})")
+        servidor = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        servidor.run(sockets=[sock])
+    except BaseException as e:
+        print(f"[ERRO] Worker {indice} terminou com erro: {e}")
+        codigo = 1
+    finally:
+        sys.stdout.flush()
+        os._exit(codigo)
+
+
+def _forkar_worker(indice, app, sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        _executar_worker(indice, app, sock, log_level)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de placas com o modelo carregado uma vez e workers via fork")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    num_workers = max(1, args.workers)
+
+    # OCR dentro de cada worker (o pool de processos usa spawn e recarregaria o modelo)
+    os.environ["OCR_WORKERS"] = "0"
+    # Divide os núcleos entre os workers, se não configurado
+    os.environ.setdefault("OCR_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // num_workers)))
+
+    inicio = time.perf_counter()
+    import util_debian
+    print(f"[INFO] Modelo de OCR carregado no processo pai em {time.perf_counter() - inicio:.1f}s")
+    duracao_aquecimento = None
+    if PREFORK_AQUECER:
+        print("[WARN] PREFORK_AQUECER=1: aquecendo no processo pai; os workers herdam threads e travas "
+              "das bibliotecas de inferência já usadas")
+        duracao_aquecimento = util_debian.aquecer_ocr()
+
+    import api_server
+    if duracao_aquecimento is not None:
+        api_server.executor_ocr.marcar_aquecido(duracao_aquecimento)
+
+    sock = criar_socket(args.host, args.port)
+
+    # Objetos que sobreviveram até aqui (modelo, módulos) saem do alcance do coletor:
+    # sem isso, cada coleta nos filhos escreveria nos cabeçalhos e copiaria as páginas
+    gc.collect()
+    gc.freeze()
+
+    workers = {}  # pid -> índice
+    for indice in range(num_workers):
+        workers[_forkar_worker(indice, api_server.app, sock, args.log_level)] = indice
+    print(f"[INFO] Servidor pre-fork em http://{args.host}:{args.port} com {num_workers} workers")
+
+    parando = False
+
+    def _parar(signum, frame):
+        nonlocal parando
+        parando = True
+
+    signal.signal(signal.SIGTERM, _parar)
+    signal.signal(signal.SIGINT, _parar)
+    if cronometragem.CRONOMETRAGEM:
+        # kill -USR1 <pid do pai> chega a todos os workers, onde estão os tempos
+        cronometragem.instalar_sinal(repassar=lambda: list(workers))
+
+    # Primeiro relatório depois que os workers atenderam o startup
+    proximo_relatorio = time.monotonic() + 10
+    while not parando:
+        time.sleep(0.5)
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0:
+                break
+            indice = workers.pop(pid, None)
+            if indice is None or parando:
+                continue
+            print(f"[WARN] Worker {indice} (pid {pid}) terminou (status {status}); reiniciando")
+            workers[_forkar_worker(indice, api_server.app, sock, args.log_level)] = indice
+
+        if proximo_relatorio is not None and time.monotonic() >= proximo_relatorio:
+            relatorio_memoria(workers)
+            proximo_relatorio = time.monotonic() + PREFORK_RELATORIO_S if PREFORK_RELATORIO_S > 0 else None
+
+    print("[INFO] Encerrando workers...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    limite = time.monotonic() + 10
+    while workers and time.monotonic() < limite:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.1)
+        else:
+            workers.pop(pid, None)
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Admissão de /processar_imagem/ antes da leitura do corpo (AdmissaoUploadMiddleware)."""
+
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("OCR_WORKERS", "1")  # Não carrega o modelo no import do api_server
+
+pytest.importorskip("multipart")
+import api_server
+from lote_ocr import ControleAdmissao, LoteadorOCR
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = LoteadorOCR(lambda itens: [{"placa": None, "confianca": None} for _ in itens],
+                           admissao=ControleAdmissao(capacidade=1))
+    monkeypatch.setattr(api_server, "executor_ocr", executor)
+    return executor
+
+
+def chamar(cabecalhos, partes):
+    """Chama a aplicação ASGI direto e devolve (status, cabeçalhos, partes do corpo lidas pela aplicação)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/processar_imagem/", "raw_path": b"/processar_imagem/", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=x")] + cabecalhos,
+        "server": ("teste", 80), "client": ("teste", 1234),
+    }
+    lidas = []
+    enviadas = []
+
+    async def receive():
+        if len(lidas) < len(partes):
+            lidas.append(partes[len(lidas)])
+            return {"type": "http.request", "body": lidas[-1], "more_body": len(lidas) < len(partes)}
+        return {"type": "http.disconnect"}
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    asyncio.run(api_server.app(scope, receive, send))
+    inicio = enviadas[0]
+    return inicio["status"], dict(inicio["headers"]), lidas
+
+
+def test_fila_cheia_responde_sem_ler_o_corpo(executor):
+    executor.admissao.reservar()
+    status, cabecalhos, lidas = chamar([(b"content-length", b"100")], [b"x" * 100])
+    assert status == 429
+    assert cabecalhos[b"retry-after"] == str(api_server.RETRY_AFTER_S).encode()
+    assert lidas == []
+    assert executor.admissao.resumo()["rejeitados"] == 1
+
+
+def test_content_length_grande_responde_sem_ler_o_corpo(executor):
+    tamanho = str(api_server.TAMANHO_MAX_UPLOAD + api_server.MARGEM_MULTIPART + 1).encode()
+    status, _, lidas = chamar([(b"content-length", tamanho)], [b"x"])
+    assert status == 413
+    assert lidas == []
+
+
+def test_chunked_para_de_ler_no_limite(executor, monkeypatch):
+    monkeypatch.setattr(api_server, "TAMANHO_MAX_UPLOAD", 1000)
+    monkeypatch.setattr(api_server, "MARGEM_MULTIPART", 0)
+    partes = [b"x" * 400] * 10
+    status, _, lidas = chamar([], partes)
+    assert status == 413
+    assert len(lidas) == 3  # 1200 bytes: a terceira parte já passou do limite
+
+
+def test_upload_normal_passa_pelo_middleware(executor):
+    from fastapi.testclient import TestClient
+
+    with TestClient(api_server.app) as cliente:
+        resposta = cliente.post("/processar_imagem/?wait=true", files={"file": ("a.jpg", b"conteudo", "image/jpeg")})
+    assert resposta.status_code == 200
+    assert resposta.json()["status"] == "concluido"
@@ -0,0 +1,99 @@
+"""
+/processar_lote/ com um executor de OCR falso (sem PaddleOCR).
+
+O corpo NDJSON é gerado depois que o endpoint retorna; na versão do FastAPI
+fixada em requirements.txt (~=0.111) os arquivos do multipart são fechados
+nesse momento, então estes testes leem todos os uploads durante o streaming.
+"""
+
+import io
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+os.environ.setdefault("OCR_WORKERS", "1")  # Não carrega o modelo no import do api_server
+
+pytest.importorskip("multipart")
+from fastapi.testclient import TestClient
+
+import api_server
+from lote_ocr import LoteadorOCR
+
+
+def ocr_falso(itens):
+    # A "placa" é o próprio conteúdo enviado, para conferir que cada arquivo foi lido inteiro
+    return [{"placa": item.decode(), "confianca": 0.9, "tempos": {}} for item in itens]
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    monkeypatch.setattr(api_server, "executor_ocr", LoteadorOCR(ocr_falso))
+    with TestClient(api_server.app) as cliente:
+        yield cliente
+
+
+def linhas(resposta):
+    assert resposta.status_code == 200
+    return sorted((json.loads(linha) for linha in resposta.text.splitlines()), key=lambda r: r["arquivo"])
+
+
+def test_lote_multipart(cliente):
+    arquivos = [("files", (f"{i}.jpg", f"PLACA{i}".encode(), "image/jpeg")) for i in range(3)]
+    arquivos.append(("files", ("leia.txt", b"texto", "text/plain")))
+    resultado = linhas(cliente.post("/processar_lote/", files=arquivos))
+    assert [(r["arquivo"], r.get("placa")) for r in resultado] == [
+        ("0.jpg", "PLACA0"), ("1.jpg", "PLACA1"), ("2.jpg", "PLACA2"), ("leia.txt", None),
+    ]
+    assert resultado[-1]["status"] == "erro"
+
+
+def test_lote_zip(cliente):
+    dados = io.BytesIO()
+    with zipfile.ZipFile(dados, "w") as zf:
+        zf.writestr("a/ABC1234.jpg", b"ABC1234")
+        zf.writestr("a/XYZ9876.png", b"XYZ9876")
+        zf.writestr("a/notas.txt", b"ignorado")
+    resposta = cliente.post("/processar_lote/", files=[("files", ("lote.zip", dados.getvalue(), "application/zip"))])
+    assert [(r["arquivo"], r["placa"]) for r in linhas(resposta)] == [
+        ("a/ABC1234.jpg", "ABC1234"), ("a/XYZ9876.png", "XYZ9876"),
+    ]
+
+
+def test_lote_tar_gz(cliente):
+    dados = io.BytesIO()
+    with tarfile.open(fileobj=dados, mode="w:gz") as tar:
+        for nome in ("DEF5678.jpg", "GHI0001.jpg"):
+            conteudo = nome[:7].encode()
+            info = tarfile.TarInfo(nome)
+            info.size = len(conteudo)
+            tar.addfile(info, io.BytesIO(conteudo))
+    resposta = cliente.post("/processar_lote/", files=[("files", ("lote.tar.gz", dados.getvalue(), "application/gzip"))])
+    assert [(r["arquivo"], r["placa"]) for r in linhas(resposta)] == [
+        ("DEF5678.jpg", "DEF5678"), ("GHI0001.jpg", "GHI0001"),
+    ]
+
+
+@pytest.mark.parametrize("nome,tipo", [("lote.zip", "application/zip"), ("lote.tar.gz", "application/gzip")])
+def test_lote_compactado_corrompido(cliente, nome, tipo):
+    dados = os.urandom(4096)
+    resposta = cliente.post("/processar_lote/", files=[("files", (nome, dados, tipo))])
+    assert resposta.status_code == 400
+    assert "compactado" in resposta.json()["detail"]
+
+
+def test_lote_tar_truncado(cliente):
+    dados = io.BytesIO()
+    with tarfile.open(fileobj=dados, mode="w:gz") as tar:
+        for nome, conteudo in (("JKL2345.jpg", b"JKL2345"), ("grande.jpg", os.urandom(256 * 1024))):
+            info = tarfile.TarInfo(nome)
+            info.size = len(conteudo)
+            tar.addfile(info, io.BytesIO(conteudo))
+    truncado = dados.getvalue()[:len(dados.getvalue()) // 2]
+    resposta = cliente.post("/processar_lote/", files=[("files", ("lote.tar.gz", truncado, "application/gzip"))])
+    assert resposta.status_code == 200
+    *imagens, final = [json.loads(linha) for linha in resposta.text.splitlines()]
+    assert [(r["arquivo"], r["placa"]) for r in imagens] == [("JKL2345.jpg", "JKL2345")]
+    assert final["status"] == "erro" and final["arquivo"] == "lote.tar.gz"
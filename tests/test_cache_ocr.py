@@ -0,0 +1,49 @@
+import numpy as np
+
+from cache_ocr import CacheResultadosOCR
+from metricas import RegistroMetricas
+
+
+def recorte(valor=0):
+    img = np.full((20, 60), valor, np.uint8)
+    img[5:15, 10:50] = 255 - valor
+    return img
+
+
+def test_acerto_exato_similar_e_falha():
+    cache = CacheResultadosOCR(max_itens=4, ttl_s=60, distancia_dhash=4)
+    chaves = cache.chaves(recorte())
+    assert cache.obter(chaves) is None
+    cache.guardar(chaves, ("ABC1234", 0.9))
+    assert cache.obter(chaves) == ("ABC1234", 0.9)
+    # Mesmo desenho com 1 nível de cinza a mais: outro hash exato, mesmo dHash
+    assert cache.obter(cache.chaves(recorte(1))) == ("ABC1234", 0.9)
+    resumo = cache.resumo()
+    assert (resumo["acertos_exatos"], resumo["acertos_similares"], resumo["falhas"]) == (1, 1, 1)
+
+
+def test_limite_evicta_o_menos_usado():
+    cache = CacheResultadosOCR(max_itens=1, ttl_s=60)
+    primeira, segunda = cache.chaves(recorte(0)), cache.chaves(recorte(100))
+    cache.guardar(primeira, ("ABC1234", 0.9))
+    cache.guardar(segunda, ("XYZ9876", 0.9))
+    assert cache.obter(primeira) is None
+    assert cache.resumo()["evictados"] == 1
+
+
+def test_metricas_exportam_totais_como_contadores():
+    registro = RegistroMetricas()
+    cache = CacheResultadosOCR(max_itens=1, ttl_s=60)
+    cache.registrar_metricas(registro)
+    chaves = cache.chaves(recorte())
+    cache.obter(chaves)
+    cache.guardar(chaves, ("ABC1234", 0.9))
+    cache.obter(chaves)
+    cache.guardar(cache.chaves(recorte(100)), ("XYZ9876", 0.9))
+    texto = registro.exportar()
+    assert "# TYPE ocr_cache_acertos_total counter" in texto
+    assert 'ocr_cache_acertos_total{tipo="exato"} 1' in texto
+    assert 'ocr_cache_acertos_total{tipo="similar"} 0' in texto
+    assert "ocr_cache_falhas_total 1" in texto
+    assert "ocr_cache_evictados_total 1" in texto
+    assert "# TYPE ocr_cache_itens gauge" in texto
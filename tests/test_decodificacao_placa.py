@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from decodificacao_placa import DecodificadorPlaca, ajustar_calibracao, calibrar_confianca
+
+# Classes no formato do decodificador CTC do PaddleOCR: 0 = blank
+CARACTERES = ["blank"] + list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-")
+CHAR_TO_INT = {'O': '0', 'I': '1', 'J': '3', 'A': '4', 'G': '6', 'S': '5', 'B': '8'}
+INT_TO_CHAR = {'0': 'O', '1': 'I', '3': 'J', '4': 'A', '6': 'G', '5': 'S', '8': 'B'}
+
+
+def matriz(quadros, p_caractere=0.9, p_branco=0.95):
+    """
+    Matriz T x C com um quadro por item de quadros: None é um blank, um caractere
+    tem p_caractere, e um dict {caractere: p} define o quadro. O resto da massa é espalhado.
+    """
+    linhas = []
+    for quadro in quadros:
+        if quadro is None:
+            quadro = {"blank": p_branco}
+        elif isinstance(quadro, str):
+            quadro = {quadro: p_caractere}
+        linha = np.full(len(CARACTERES), (1.0 - sum(quadro.values())) / (len(CARACTERES) - len(quadro)))
+        for caractere, p in quadro.items():
+            linha[CARACTERES.index(caractere)] = p
+        linhas.append(linha)
+    return np.array(linhas, dtype=np.float32)
+
+
+def intercalar(texto):
+    quadros = [None]
+    for caractere in texto:
+        quadros += [caractere, None]
+    return quadros
+
+
+@pytest.fixture
+def decodificador():
+    return DecodificadorPlaca(CARACTERES, CHAR_TO_INT, INT_TO_CHAR)
+
+
+def test_placa_limpa(decodificador):
+    texto, confianca, padrao = decodificador.decodificar([matriz(intercalar("ABC1234"))])
+    assert (texto, padrao) == ("ABC1234", "LLLNNNN")
+    # Escala da confiança média do PaddleOCR (0.9 por caractere), menos o custo dos blanks
+    assert 0.8 < confianca <= 0.9
+
+
+def test_mercosul(decodificador):
+    texto, _, padrao = decodificador.decodificar([matriz(intercalar("BRA2E19"))])
+    assert (texto, padrao) == ("BRA2E19", "LLLNLNN")
+
+
+def test_confundiveis_seguem_a_gramatica(decodificador):
+    # "8" e "0" em posições de letra, "I" em posição de número
+    texto, confianca, _ = decodificador.decodificar([matriz(intercalar("A80I234"))])
+    assert texto == "ABO1234"
+    assert confianca > 0.8
+
+
+def test_caractere_sobrando_e_recusado(decodificador):
+    assert decodificador.decodificar([matriz(intercalar("ABC12345"))]) is None
+
+
+def test_caixa_extra_e_recusada(decodificador):
+    assert decodificador.decodificar([matriz(intercalar("ABC1234")), matriz(intercalar("XY"))]) is None
+
+
+def test_quadro_absorvido_custa_confianca(decodificador):
+    limpa = decodificador.decodificar([matriz(intercalar("ABC1234"))])[1]
+    # Quadro depois do "4" com um "Z" fraco: a leitura gulosa o ignora, mas o caminho paga o blank incerto
+    quadros = intercalar("ABC1234")[:-1] + [{"Z": 0.25, "blank": 0.3}, None]
+    texto, confianca, _ = decodificador.decodificar([matriz(quadros)])
+    assert texto == "ABC1234"
+    assert confianca < limpa * 0.9
+
+
+def test_caminho_restrito_muito_pior_que_o_guloso(decodificador):
+    # "2" (sem letra equivalente) em duas posições de letra: a gramática teria que trocar os dois
+    assert decodificador.decodificar([matriz(intercalar("A221234"), p_caractere=0.97)]) is None
+
+
+def test_confianca_baixa_e_recusada(decodificador):
+    assert decodificador.decodificar([matriz(intercalar("ABC1234"), p_caractere=0.3)]) is None
+
+
+def test_poucos_quadros(decodificador):
+    assert decodificador.decodificar([matriz(list("ABC"))]) is None
+    assert decodificador.decodificar([]) is None
+
+
+def test_calibracao():
+    assert calibrar_confianca(0.7, (1.0, 0.0)) == pytest.approx(0.7)
+    rng = np.random.default_rng(0)
+    confiancas = rng.uniform(0.05, 0.95, 4000)
+    # Leituras cuja chance real de acerto é calibrar_confianca(c, (2, -1))
+    acertos = rng.random(4000) < [calibrar_confianca(c, (2.0, -1.0)) for c in confiancas]
+    a, b = ajustar_calibracao(confiancas, acertos)
+    assert a == pytest.approx(2.0, abs=0.3)
+    assert b == pytest.approx(-1.0, abs=0.3)
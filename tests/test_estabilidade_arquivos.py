@@ -0,0 +1,103 @@
+import os
+import time
+
+import pytest
+
+from estabilidade_arquivos import RastreadorEstabilidade
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    caminho = tmp_path / "recorte.jpg"
+    caminho.write_bytes(b"\xff\xd8" + b"\x00" * 100)
+    return str(caminho)
+
+
+def envelhecer(caminho, segundos):
+    antigo = time.time() - segundos
+    os.utime(caminho, (antigo, antigo))
+
+
+def test_fechado_fica_pronto_na_hora(arquivo):
+    rastreador = RastreadorEstabilidade(10)
+    rastreador.marcar_fechado(arquivo)
+    assert rastreador.estavel(arquivo)
+    assert rastreador.resumo()["prontos_evento"] == 1
+    assert rastreador.pendentes() == 0
+
+
+def test_mtime_antigo_fica_pronto_na_hora(arquivo):
+    rastreador = RastreadorEstabilidade(10)
+    envelhecer(arquivo, 11)
+    assert rastreador.estavel(arquivo)
+    assert rastreador.resumo()["prontos_idade"] == 1
+
+
+def test_recente_pronto_depois_do_intervalo_sem_mudar(arquivo):
+    rastreador = RastreadorEstabilidade(10)
+    assert not rastreador.estavel(arquivo, agora=100.0)
+    assert rastreador.pendentes() == 1
+    assert not rastreador.estavel(arquivo, agora=105.0)
+    assert rastreador.estavel(arquivo, agora=110.0)
+    assert rastreador.resumo()["prontos_observados"] == 1
+    assert rastreador.pendentes() == 0
+
+
+def test_mudanca_reinicia_o_intervalo(arquivo):
+    rastreador = RastreadorEstabilidade(10)
+    assert not rastreador.estavel(arquivo, agora=100.0)
+    with open(arquivo, "ab") as f:
+        f.write(b"\x00" * 10)
+    assert not rastreador.estavel(arquivo, agora=108.0)
+    assert not rastreador.estavel(arquivo, agora=112.0)  # Só 4 s desde a mudança
+    assert rastreador.estavel(arquivo, agora=118.0)
+
+
+def test_arquivo_sumiu(arquivo):
+    rastreador = RastreadorEstabilidade(10)
+    assert not rastreador.estavel(arquivo, agora=100.0)
+    os.remove(arquivo)
+    assert not rastreador.estavel(arquivo, agora=200.0)
+    assert rastreador.pendentes() == 0
+
+
+def test_espera_restante(arquivo, tmp_path):
+    rastreador = RastreadorEstabilidade(10)
+    assert rastreador.espera_restante() is None
+    outro = tmp_path / "outro.jpg"
+    outro.write_bytes(b"\x00")
+    rastreador.estavel(arquivo, agora=100.0)
+    rastreador.estavel(str(outro), agora=104.0)
+    assert rastreador.espera_restante(agora=106.0) == pytest.approx(4.0)
+    assert rastreador.espera_restante(str(outro), agora=106.0) == pytest.approx(8.0)
+    assert rastreador.espera_restante(str(tmp_path / "nenhum.jpg")) is None
+
+
+def test_pausa_menor_com_pendente(arquivo):
+    rastreador = RastreadorEstabilidade(2)
+    assert rastreador.pausa(30) == 30
+    rastreador.estavel(arquivo)
+    assert 1.5 < rastreador.pausa(30) <= 2.05
+    assert rastreador.pausa(1) == 1
+
+
+def test_esquecer(arquivo):
+    rastreador = RastreadorEstabilidade(10)
+    rastreador.estavel(arquivo, agora=100.0)
+    rastreador.marcar_fechado(arquivo)
+    rastreador.esquecer(arquivo)
+    assert rastreador.pendentes() == 0
+    assert not rastreador.estavel(arquivo, agora=100.0)  # O fechamento também foi esquecido
+
+
+def test_metricas(arquivo):
+    from metricas import RegistroMetricas
+
+    registro = RegistroMetricas()
+    rastreador = RastreadorEstabilidade(10)
+    rastreador.registrar_metricas(registro)
+    rastreador.estavel(arquivo, agora=100.0)
+    texto = registro.exportar()
+    assert "# TYPE estabilidade_arquivos_pendentes gauge" in texto
+    assert "estabilidade_arquivos_pendentes 1" in texto
+    assert "# TYPE estabilidade_prontos_observados_total counter" in texto
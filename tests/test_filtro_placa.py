@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+import pytest
+
+from filtro_placa import FiltroPresencaPlaca, nota_presenca
+from metricas import RegistroMetricas
+
+
+def placa(texto="ABC1234", fundo=230, tinta=20):
+    img = np.full((60, 200), fundo, np.uint8)
+    cv2.putText(img, texto, (8, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.4, tinta, 4)
+    return img
+
+
+def ruido():
+    return np.random.default_rng(0).integers(0, 256, (60, 200)).astype(np.uint8)
+
+
+def test_nota_placa_alta():
+    assert nota_presenca(placa()) > 0.8
+
+
+def test_nota_colorida_igual_a_cinza():
+    assert nota_presenca(cv2.cvtColor(placa(), cv2.COLOR_GRAY2BGR)) == pytest.approx(nota_presenca(placa()))
+
+
+@pytest.mark.parametrize("img", [
+    np.full((60, 200), 120, np.uint8),  # Sem contraste (asfalto liso, sombra)
+    np.tile(np.linspace(0, 255, 200), (60, 1)).astype(np.uint8),  # Contraste sem traços de caracteres
+    ruido(),  # Transições demais para serem caracteres (textura)
+], ids=["liso", "gradiente", "ruido"])
+def test_nota_sem_placa_baixa(img):
+    assert nota_presenca(img) < 0.25
+
+
+def test_nota_no_intervalo():
+    for img in (placa(), placa()[::4, ::4], ruido()):
+        assert 0.0 <= nota_presenca(img) <= 1.0
+
+
+def test_descartar_conta_descartes():
+    filtro = FiltroPresencaPlaca(limiar=0.25, avaliacao=False)
+    assert filtro.descartar(placa()) == (False, False)
+    assert filtro.descartar(ruido()) == (True, True)
+    resumo = filtro.resumo()
+    assert (resumo["avaliados"], resumo["descartados"], resumo["taxa_descarte"]) == (2, 1, 0.5)
+
+
+def test_avaliacao_nao_descarta_e_conta_falso_descarte():
+    filtro = FiltroPresencaPlaca(limiar=0.25, avaliacao=True)
+    descartar, descartaria = filtro.descartar(ruido())
+    assert (descartar, descartaria) == (False, True)
+    filtro.conferir(descartaria, ("ABC1234", 0.9))
+    filtro.conferir(descartaria, (None, None))
+    filtro.conferir(False, ("ABC1234", 0.9))
+    assert filtro.resumo()["falsos_descartes"] == 1
+
+
+def test_metricas_sao_contadores():
+    registro = RegistroMetricas()
+    filtro = FiltroPresencaPlaca(limiar=0.25)
+    filtro.registrar_metricas(registro)
+    filtro.descartar(ruido())
+    texto = registro.exportar()
+    assert "# TYPE ocr_filtro_descartados_total counter" in texto
+    assert "ocr_filtro_avaliados_total 1" in texto
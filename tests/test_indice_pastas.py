@@ -0,0 +1,128 @@
+import os
+import shutil
+import time
+
+import pytest
+
+from indice_pastas import IndiceDiretorios
+
+ANTIGO = time.time() - 3600
+
+
+def criar(pasta, nome, idade_s):
+    """Cria pasta/nome com mtime idade_s antes de ANTIGO."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, nome)
+    with open(caminho, "wb") as f:
+        f.write(b"\xff\xd8")
+    os.utime(caminho, (ANTIGO - idade_s, ANTIGO - idade_s))
+    return caminho
+
+
+def envelhecer_pastas(*pastas, segundos=0):
+    """mtime das pastas em ANTIGO + segundos: fora da margem de MARGEM_MTIME_S da listagem."""
+    for pasta in pastas:
+        os.utime(pasta, (ANTIGO + segundos, ANTIGO + segundos))
+
+
+@pytest.fixture
+def base(tmp_path):
+    base = str(tmp_path / "placas")
+    dia1, dia2 = os.path.join(base, "2024-01-01"), os.path.join(base, "2024-01-02")
+    criar(dia1, "a_1_1.jpg", 30)
+    criar(dia1, "c_3_1.jpg", 10)
+    criar(dia2, "b_2_2.jpg", 20)
+    criar(dia2, "ignorado.tmp", 40)
+    criar(base, "solto.jpg", 50)  # Fora das subpastas de data
+    os.makedirs(os.path.join(dia2, "aninhada"))
+    envelhecer_pastas(os.path.join(dia2, "aninhada"), dia1, dia2, base)
+    return base
+
+
+def novo_indice(base):
+    return IndiceDiretorios(base, lambda nome: not nome.endswith(".tmp"))
+
+
+def nomes(caminhos):
+    return [os.path.basename(c) for c in caminhos]
+
+
+def test_pendentes_em_ordem_de_mtime(base):
+    indice = novo_indice(base)
+    indice.atualizar()
+    assert nomes(indice.retirar()) == ["a_1_1.jpg", "b_2_2.jpg", "c_3_1.jpg"]
+    assert indice.pendentes() == 3  # Retirar não conclui
+    assert indice.retirar() == []
+
+
+def test_pasta_sem_mudanca_nao_e_listada_de_novo(base):
+    indice = novo_indice(base)
+    indice.atualizar()
+    for caminho in indice.retirar():
+        indice.concluir(caminho)
+    listagens = indice.listagens
+    indice.atualizar()
+    assert indice.listagens == listagens
+    assert indice.resumo()["subpastas_puladas"] == 2
+    assert indice.retirar() == []
+
+
+def test_arquivo_novo_so_ele_volta(base):
+    indice = novo_indice(base)
+    indice.atualizar()
+    for caminho in indice.retirar():
+        indice.concluir(caminho)
+    dia1 = os.path.join(base, "2024-01-01")
+    criar(dia1, "d_4_1.jpg", 0)
+    envelhecer_pastas(dia1, segundos=60)  # mtime da pasta mudou (e continua fora da margem)
+    indice.atualizar()
+    assert nomes(indice.retirar()) == ["d_4_1.jpg"]
+
+
+def test_pasta_modificada_dentro_da_margem_e_listada_de_novo(base):
+    indice = novo_indice(base)
+    dia1 = os.path.join(base, "2024-01-01")
+    os.utime(dia1)  # Agora: uma entrada nova ainda pode aparecer com o mesmo mtime
+    indice.atualizar()
+    listagens = indice.listagens
+    indice.atualizar()
+    assert indice.listagens == listagens + 1
+
+
+def test_adiar_e_concluir(base):
+    indice = novo_indice(base)
+    indice.atualizar()
+    a, b, c = indice.retirar()
+    indice.concluir(a)
+    indice.adiar(b)
+    indice.concluir(c)
+    indice.adiar(c)  # Concluído mas devolvido (ex.: pelo pipeline): volta se ainda existir
+    os.remove(a)
+    indice.adiar(a)  # Concluído e removido: não volta
+    indice.atualizar()
+    assert nomes(indice.retirar()) == ["b_2_2.jpg", "c_3_1.jpg"]
+
+
+def test_subpasta_removida_e_esquecida(base):
+    indice = novo_indice(base)
+    indice.atualizar()
+    shutil.rmtree(os.path.join(base, "2024-01-02"))
+    envelhecer_pastas(base, segundos=60)
+    indice.atualizar()
+    assert nomes(indice.retirar()) == ["a_1_1.jpg", "c_3_1.jpg"]
+    assert indice.resumo()["subpastas"] == 1
+
+
+def test_arquivo_removido_sai_dos_pendentes(base):
+    indice = novo_indice(base)
+    indice.atualizar()
+    dia2 = os.path.join(base, "2024-01-02")
+    os.remove(os.path.join(dia2, "b_2_2.jpg"))
+    envelhecer_pastas(dia2, segundos=60)
+    indice.atualizar()
+    assert nomes(indice.retirar()) == ["a_1_1.jpg", "c_3_1.jpg"]
+
+
+def test_pasta_base_inexistente(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        IndiceDiretorios(str(tmp_path / "nenhuma")).atualizar()
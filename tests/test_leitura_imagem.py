@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+import pytest
+
+from leitura_imagem import decodificar_arquivo, dimensoes_jpeg, fator_reducao
+
+
+def jpeg(largura, altura, progressivo=False):
+    img = np.random.default_rng(0).integers(0, 256, (altura, largura)).astype(np.uint8)
+    flags = [cv2.IMWRITE_JPEG_PROGRESSIVE, 1] if progressivo else []
+    ok, dados = cv2.imencode(".jpg", img, flags)
+    assert ok
+    return dados
+
+
+@pytest.mark.parametrize("largura,altura", [(1920, 1080), (640, 480), (37, 11)])
+def test_dimensoes_jpeg(largura, altura):
+    assert dimensoes_jpeg(jpeg(largura, altura)) == (largura, altura)
+    assert dimensoes_jpeg(jpeg(largura, altura).tobytes()) == (largura, altura)
+
+
+def test_dimensoes_jpeg_progressivo():
+    # Progressivo usa SOF2 em vez de SOF0
+    assert dimensoes_jpeg(jpeg(800, 600, progressivo=True)) == (800, 600)
+
+
+def test_dimensoes_jpeg_pula_preenchimento_e_segmentos():
+    dados = jpeg(320, 240).tobytes()
+    # Um APP e bytes de preenchimento 0xFF antes dos segmentos originais
+    app = b"\xff\xe1\x00\x07teste"
+    assert dimensoes_jpeg(dados[:2] + b"\xff\xff" + app + dados[2:]) == (320, 240)
+
+
+@pytest.mark.parametrize("dados", [
+    b"",
+    b"\xff\xd8",
+    b"\x89PNG\r\n\x1a\n" + b"\x00" * 32,
+    b"\xff\xd8\xff\xda\x00\x08" + b"\x00" * 16,  # Dados comprimidos antes de qualquer SOF
+    b"\xff\xd8\x00" + b"\x00" * 16,  # Lixo onde deveria haver um marcador
+])
+def test_dimensoes_jpeg_invalido(dados):
+    assert dimensoes_jpeg(dados) is None
+
+
+def test_dimensoes_jpeg_png():
+    _, dados = cv2.imencode(".png", np.zeros((10, 10), np.uint8))
+    assert dimensoes_jpeg(dados) is None
+
+
+@pytest.mark.parametrize("largura,altura,esperado", [
+    (5120, 2880, 8),  # 640x360 em 1/8
+    (2560, 1440, 4),
+    (1280, 720, 2),
+    (1279, 720, 1),  # 639 em 1/2: abaixo do lado alvo
+    (640, 480, 1),
+    (5120, 480, 4),  # Faixa larga: em 1/4 a altura (120) ainda passa, em 1/8 (60) não
+])
+def test_fator_reducao(largura, altura, esperado):
+    assert fator_reducao(largura, altura, lado_alvo=640, altura_min=64) == esperado
+
+
+def test_fator_reducao_respeita_altura_minima():
+    assert fator_reducao(2560, 200, lado_alvo=640, altura_min=64) == 2
+    assert fator_reducao(2560, 100, lado_alvo=640, altura_min=64) == 1
+
+
+def test_decodificar_arquivo_reduzido(tmp_path):
+    caminho = tmp_path / "quadro.jpg"
+    jpeg(1280, 720).tofile(str(caminho))
+    img, fator, assinatura = decodificar_arquivo(str(caminho), reduzida=True)
+    assert fator == 2 and img.shape == (360, 640)
+    assert assinatura[0] == caminho.stat().st_size
+    img, fator, _ = decodificar_arquivo(str(caminho), reduzida=False)
+    assert fator == 1 and img.shape == (720, 1280)
@@ -0,0 +1,138 @@
+import os
+import shutil
+import sys
+import time
+
+import pytest
+
+from observador_pasta import IN_Q_OVERFLOW, ObservadorPasta, inotify_disponivel
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux") or not inotify_disponivel(),
+                                reason="inotify só existe no Linux")
+
+
+def escrever(caminho, dados=b"\xff\xd8"):
+    with open(caminho, "wb") as f:
+        f.write(dados)
+    return caminho
+
+
+def coletar(observador, quantidade, timeout_s=5.0):
+    """Chama proximos() até juntar quantidade itens (ou estourar o timeout)."""
+    itens = []
+    limite = time.monotonic() + timeout_s
+    while len(itens) < quantidade and time.monotonic() < limite:
+        itens.extend(observador.proximos(espera_s=0.1))
+    return itens
+
+
+@pytest.fixture
+def base(tmp_path):
+    base = tmp_path / "placas"
+    (base / "2024-01-01").mkdir(parents=True)
+    return str(base)
+
+
+@pytest.fixture
+def observador(base):
+    observador = ObservadorPasta(base, lambda nome: nome.endswith(".jpg"))
+    yield observador
+    observador.fechar()
+
+
+def test_varredura_inicial_em_ordem_de_mtime(tmp_path):
+    base = tmp_path / "placas"
+    dia = base / "2024-01-01"
+    dia.mkdir(parents=True)
+    for nome, idade in (("novo.jpg", 10), ("velho.jpg", 30), ("ignorado.tmp", 40)):
+        caminho = escrever(str(dia / nome))
+        os.utime(caminho, (time.time() - idade, time.time() - idade))
+    observador = ObservadorPasta(str(base), lambda nome: nome.endswith(".jpg"))
+    try:
+        itens = observador.proximos(espera_s=0)
+        assert [(os.path.basename(c), fechado) for c, fechado in itens] == [("velho.jpg", False), ("novo.jpg", False)]
+    finally:
+        observador.fechar()
+
+
+def test_arquivo_fechado_chega_como_completo(observador, base):
+    assert observador.proximos(espera_s=0) == []
+    caminho = escrever(os.path.join(base, "2024-01-01", "a_1_1.jpg"))
+    escrever(os.path.join(base, "2024-01-01", "parcial.tmp"))
+    assert coletar(observador, 1) == [(caminho, True)]
+    assert observador.proximos(espera_s=0) == []
+
+
+def test_renomeado_para_a_pasta(observador, base, tmp_path):
+    temporario = escrever(str(tmp_path / "escrevendo.jpg"))
+    destino = os.path.join(base, "2024-01-01", "b_2_1.jpg")
+    os.rename(temporario, destino)
+    assert coletar(observador, 1) == [(destino, True)]
+
+
+def test_subpasta_nova_ganha_watch(observador, base):
+    dia = os.path.join(base, "2024-01-02")
+    os.mkdir(dia)
+    observador.proximos(espera_s=0.2)  # Evento da subpasta: watch e varredura
+    caminho = escrever(os.path.join(dia, "c_3_2.jpg"))
+    assert coletar(observador, 1) == [(caminho, True)]
+    assert observador.resumo()["pastas_observadas"] == 3
+
+
+def test_arquivo_de_subpasta_recem_criada_nao_se_perde(observador, base, tmp_path):
+    # Subpasta criada já com o arquivo (rename): ele só pode vir da varredura
+    preparada = tmp_path / "2024-01-03"
+    preparada.mkdir()
+    escrever(str(preparada / "d_4_3.jpg"))
+    os.rename(str(preparada), os.path.join(base, "2024-01-03"))
+    itens = coletar(observador, 1)
+    assert itens == [(os.path.join(base, "2024-01-03", "d_4_3.jpg"), False)]
+
+
+def test_reenfileirar_depois_do_atraso(observador, base):
+    caminho = escrever(os.path.join(base, "2024-01-01", "e_5_1.jpg"))
+    assert coletar(observador, 1) == [(caminho, True)]
+    observador.reenfileirar(caminho, atraso_s=0.3)
+    assert observador.pendentes() == 1
+    inicio = time.monotonic()
+    assert coletar(observador, 1) == [(caminho, False)]
+    assert time.monotonic() - inicio >= 0.25
+
+
+def test_reenfileirado_que_sumiu_nao_volta(observador, base):
+    caminho = escrever(os.path.join(base, "2024-01-01", "f_6_1.jpg"))
+    coletar(observador, 1)
+    observador.reenfileirar(caminho, atraso_s=0)
+    os.remove(caminho)
+    assert observador.proximos(espera_s=0.1) == []
+
+
+def test_pasta_base_recriada(observador, base):
+    shutil.rmtree(base)
+    assert coletar(observador, 1, timeout_s=0.5) == []
+    dia = os.path.join(base, "2024-01-09")
+    os.makedirs(dia)
+    caminho = escrever(os.path.join(dia, "g_7_9.jpg"))
+    itens = coletar(observador, 1)
+    assert [c for c, _ in itens] == [caminho]
+
+
+def test_estouro_varre_de_novo(observador, base):
+    caminho = escrever(os.path.join(base, "2024-01-01", "h_8_1.jpg"))
+    coletar(observador, 1)
+    observador._tratar_evento(-1, IN_Q_OVERFLOW, "")
+    assert observador.proximos(espera_s=0) == [(caminho, False)]
+    assert observador.resumo()["estouros"] == 1
+
+
+def test_metricas(observador, base):
+    from metricas import RegistroMetricas
+
+    registro = RegistroMetricas()
+    observador.registrar_metricas(registro)
+    escrever(os.path.join(base, "2024-01-01", "i_9_1.jpg"))
+    coletar(observador, 1)
+    texto = registro.exportar()
+    assert "observador_pastas_observadas 2" in texto
+    assert "# TYPE observador_eventos_total counter" in texto
+    assert "# TYPE observador_estouros_total counter" in texto
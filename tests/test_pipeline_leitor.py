@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from pipeline_leitor import PipelineLeitor
+
+
+class ExecutorFalso:
+    """Resolve cada job na hora com o próximo item de respostas (um dicionário ou uma exceção)."""
+
+    def __init__(self, respostas):
+        self.respostas = list(respostas)
+
+    def iniciar(self):
+        pass
+
+    def parar(self):
+        pass
+
+    def resumo(self):
+        return {}
+
+    def submeter(self, carga):
+        futuro = Future()
+        resposta = self.respostas.pop(0)
+        if isinstance(resposta, Exception):
+            futuro.set_exception(resposta)
+        else:
+            futuro.set_result(resposta)
+        return futuro
+
+
+@pytest.fixture
+def concluidos():
+    return []
+
+
+def pipeline(respostas, concluidos):
+    def concluir(caminho, resultado, tempos):
+        concluidos.append((caminho, resultado))
+        return True
+
+    pipeline = PipelineLeitor(lambda caminho: (np.zeros((4, 4), np.uint8), {}), concluir,
+                              ExecutorFalso(respostas), tentativas_max=2)
+    pipeline.iniciar()
+    return pipeline
+
+
+def processar(pipeline, caminho, timeout_s=5.0):
+    """Envia o arquivo, espera ele sair do pipeline e devolve os retornados."""
+    pipeline.enviar(caminho)
+    limite = time.monotonic() + timeout_s
+    while pipeline.em_andamento() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return pipeline.retornados()
+
+
+def test_falha_do_executor_devolve_o_arquivo(concluidos):
+    leitor = pipeline([RuntimeError("Worker OCR 0 morreu"), {"placa": "ABC1234", "confianca": 0.9}], concluidos)
+    assert processar(leitor, "a.jpg") == ["a.jpg"]
+    assert concluidos == []
+    assert processar(leitor, "a.jpg") == []
+    assert concluidos == [("a.jpg", {"placa": "ABC1234", "confianca": 0.9})]
+    assert leitor.resumo()["desistencias"] == 0
+
+
+def test_desiste_depois_de_tentativas_max(concluidos):
+    leitor = pipeline([RuntimeError("morreu"), RuntimeError("morreu de novo")], concluidos)
+    assert processar(leitor, "b.jpg") == ["b.jpg"]
+    assert processar(leitor, "b.jpg") == []
+    assert concluidos == [("b.jpg", {"erro": "morreu de novo"})]
+    assert leitor.resumo()["desistencias"] == 1
+
+
+def test_erro_da_imagem_nao_volta(concluidos):
+    leitor = pipeline([{"erro": "Falha ao decodificar imagem"}], concluidos)
+    assert processar(leitor, "c.jpg") == []
+    assert concluidos == [("c.jpg", {"erro": "Falha ao decodificar imagem"})]
@@ -0,0 +1,35 @@
+import sys
+import time
+
+import pytest
+
+from pool_ocr import PoolOCR
+
+
+@pytest.fixture
+def modelo_quebrado(tmp_path, monkeypatch):
+    """util_debian que não importa: os workers (spawn) herdam o sys.path do pai."""
+    (tmp_path / "util_debian.py").write_text('raise ImportError("modelo ausente")\n')
+    monkeypatch.setattr(sys, "path", [str(tmp_path)] + sys.path)
+    monkeypatch.delitem(sys.modules, "util_debian", raising=False)
+
+
+def test_worker_que_nao_inicia_e_abandonado(modelo_quebrado):
+    pool = PoolOCR(1, falhas_max=3, espera_reinicio_s=0.1)
+    pool.iniciar()
+    try:
+        futuro = pool.submeter(b"x")
+        limite = time.monotonic() + 30
+        while pool.erro_inicio is None and time.monotonic() < limite:
+            time.sleep(0.05)
+        assert "falhou 3 vezes seguidas" in pool.erro_inicio
+        assert "modelo ausente" in pool.erro_inicio
+        assert not pool.pronto()
+        # O job esperou os reinícios e só falhou quando o worker foi abandonado
+        with pytest.raises(RuntimeError):
+            futuro.result(timeout=5)
+        with pytest.raises(RuntimeError, match="sem workers"):
+            pool.submeter(b"y")
+        assert pool.resumo()["workers_abandonados"] == [0]
+    finally:
+        pool.parar()
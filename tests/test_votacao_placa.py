@@ -0,0 +1,89 @@
+import pytest
+
+from votacao_placa import AgregadorPlacas
+
+
+@pytest.fixture
+def agregador():
+    return AgregadorPlacas(confianca_alvo=0.9, peso_prior=0.25, janela_s=10, ttl_finalizado_s=60)
+
+
+def test_leitura_isolada_nao_fecha_o_carro(agregador):
+    # 0.99 / (0.99 + 0.25) < 0.9: o prior exige mais de uma leitura
+    assert agregador.adicionar(1, "ABC1234", 0.99, agora=0) is None
+    assert agregador.pendentes() == 1
+
+
+def test_consenso_atinge_o_alvo(agregador):
+    assert agregador.adicionar(1, "ABC1234", 0.9, frame_nmr=10, agora=0) is None
+    assert agregador.adicionar(1, "ABC1234", 0.9, frame_nmr=11, agora=1) is None  # 1.8 / 2.05
+    final = agregador.adicionar(1, "ABC1234", 0.9, frame_nmr=12, agora=2)  # 2.7 / 2.95
+    assert final["placa"] == "ABC1234" and final["leituras"] == 3
+    assert final["confianca"] == pytest.approx(2.7 / 2.95)
+    assert final["frame_nmr"] == 10  # Primeiro quadro com a maior confiança entre os que leram o consenso
+    assert agregador.resumo()["finalizados_consenso"] == 1
+    assert agregador.pendentes() == 0
+
+
+def test_votacao_por_caractere(agregador):
+    agregador.adicionar(1, "ABC1Z34", 0.5, frame_nmr=1, agora=0)
+    agregador.adicionar(1, "ABC1234", 0.8, frame_nmr=2, agora=0)
+    agregador.adicionar(1, "A8C1234", 0.6, frame_nmr=3, agora=0)
+    final, = agregador.expirados(forcar=True, agora=0)
+    assert final["placa"] == "ABC1234"
+    assert final["frame_nmr"] == 2
+    # Posição mais disputada: 'B' com 1.3 de 1.9 (+ prior)
+    assert final["confianca"] == pytest.approx(1.3 / 2.15)
+
+
+def test_leituras_fora_do_formato_sao_ignoradas(agregador):
+    assert agregador.adicionar(1, "ABC123", 0.9, agora=0) is None
+    assert agregador.adicionar(1, None, 0.9, agora=0) is None
+    assert agregador.adicionar(1, "ABC1234", None, agora=0) is None
+    assert agregador.pendentes() == 0 and agregador.resumo()["leituras"] == 0
+
+
+def test_janela_finaliza_abaixo_do_alvo(agregador):
+    agregador.adicionar(1, "ABC1234", 0.7, agora=0)
+    agregador.adicionar(2, "XYZ9876", 0.7, agora=5)
+    assert agregador.expirados(agora=9) == []
+    finais = agregador.expirados(agora=10)
+    assert [f["car_id"] for f in finais] == [1]
+    assert finais[0]["confianca"] == pytest.approx(0.7 / 0.95)
+    assert agregador.resumo()["finalizados_janela"] == 1
+    assert agregador.pendentes() == 1
+
+
+def test_finalizado_descarta_recortes_ate_o_ttl(agregador):
+    for _ in range(3):
+        agregador.adicionar(1, "ABC1234", 0.9, agora=0)
+    assert agregador.finalizado(1, agora=30, contar_descarte=True)
+    assert agregador.adicionar(1, "ABC1234", 0.9, agora=30) is None  # Não reabre o carro
+    assert agregador.pendentes() == 0
+    assert agregador.resumo()["recortes_descartados"] == 1
+    # Depois do ttl o rastreador pode reaproveitar o car_id
+    assert not agregador.finalizado(1, agora=61)
+    assert agregador.adicionar(1, "XYZ9876", 0.9, agora=61) is None
+    assert agregador.pendentes() == 1
+
+
+def test_expirados_esquece_finalizados_antigos(agregador):
+    agregador.adicionar(1, "ABC1234", 0.7, agora=0)
+    agregador.expirados(forcar=True, agora=0)
+    assert agregador.finalizado(1, agora=1)
+    agregador.expirados(agora=61)
+    assert agregador.adicionar(1, "ABC1234", 0.7, agora=62) is None
+    assert agregador.pendentes() == 1
+
+
+def test_metricas(agregador):
+    from metricas import RegistroMetricas
+
+    registro = RegistroMetricas()
+    agregador.registrar_metricas(registro)
+    agregador.adicionar(1, "ABC1234", 0.7, agora=0)
+    agregador.expirados(forcar=True, agora=0)
+    texto = registro.exportar()
+    assert "# TYPE votacao_carros_abertos gauge" in texto
+    assert "# TYPE votacao_finalizados_janela_total counter" in texto
+    assert "votacao_finalizados_janela_total 1" in texto
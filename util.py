@@ -2,17 +2,21 @@ import string
 import psycopg2
 import cv2
 import numpy as np
-from paddleocr import PaddleOCR
+from motor_ocr import criar_ocr
 from datetime import datetime
+import cronometragem
 
 
 
-ocr = PaddleOCR(
+ocr = criar_ocr(  # Backend de inferência via OCR_BACKEND (motor_ocr.py)
     lang='pt',
     use_angle_cls=False,
   
     det_limit_side_len=640
 )
+# Marcam, no cronômetro da leitura em andamento, detecção e reconhecimento dentro do ocr.ocr()
+ocr.text_detector = cronometragem.EtapaCronometrada(ocr.text_detector, "ocr_preparo", "deteccao")
+ocr.text_recognizer = cronometragem.EtapaCronometrada(ocr.text_recognizer, "recorte", "reconhecimento")
 char_to_int = {'O': '0', 'I': '1', 'J': '3', 'A': '4', 'G': '6', 'S': '5', 'B': '8'} # Added B:8
 int_to_char = {'0': 'O', '1': 'I', '3': 'J', '4': 'A', '6': 'G', '5': 'S', '8': 'B'} # Added 8:B
 
@@ -165,14 +169,31 @@ def limpar_texto_placa(texto):
     caracteres_remover = "-.!@#$%^&*()[]{};:,<>?/\\|`~'\""
     return ''.join(c for c in texto if c not in caracteres_remover).strip().upper()
 
-def ler_placas2(placa_carro_crop): # PaddleOCR based
+def ler_placas2(placa_carro_crop, tempos=None, cronometrar=False): # PaddleOCR based
+    """
+    Se tempos (dict) for passado, recebe os segundos gastos em cada etapa: conversao_cor,
+    ocr_preparo, deteccao, recorte, reconhecimento, ocr_final (dentro do ocr.ocr) e
+    pos_processamento. Com tempos, cronometrar=True ou OCR_CRONOMETRAGEM=1 o retorno
+    é um cronometragem.ResultadoOCR (tupla com .marcas e .tempos).
+    """
+    cronometro = cronometragem.iniciar(cronometrar or tempos is not None)
     if len(placa_carro_crop.shape) == 2:
         img_rgb = cv2.cvtColor(placa_carro_crop, cv2.COLOR_GRAY2RGB)
     else:
         img_rgb = cv2.cvtColor(placa_carro_crop, cv2.COLOR_BGR2RGB)
+    cronometro.marcar("conversao_cor")
 
-    results = ocr.ocr(img_rgb, cls=False)
-    
+    cronometragem.definir_atual(cronometro)
+    try:
+        results = ocr.ocr(img_rgb, cls=False)
+    finally:
+        cronometragem.definir_atual(None)
+    cronometro.marcar("ocr_final")
+    resultado = _interpretar_resultados(results)
+    cronometro.marcar("pos_processamento")
+    return cronometragem.concluir(cronometro, resultado, tempos)
+
+def _interpretar_resultados(results):
     if not results or not results[0]:
         # print("[INFO] Nenhum texto detectado pelo OCR (PaddleOCR) ou resultado vazio.")
         return None, None
@@ -1,27 +1,92 @@
 import string
+import copy
 import psycopg2
 import cv2
 import numpy as np
 from paddleocr import PaddleOCR
-from datetime import datetime
+from motor_ocr import criar_ocr, BACKEND_OCR, PRECISAO_OCR
+# Módulos internos do PaddleOCR (ficam importáveis depois do import acima),
+# usados para rodar detecção e reconhecimento como estágios separados
+from tools.infer.predict_system import sorted_boxes
+from tools.infer.utility import get_rotate_crop_image, get_minarea_rect_crop
 import os
 import sys
+import threading
+import time
+from cache_ocr import CacheResultadosOCR, CACHE_TAMANHO
+from decodificacao_placa import DecodificadorPlaca
+from filtro_placa import FiltroPresencaPlaca, FILTRO_PRESENCA
+import cronometragem
+# Gravação das leituras (PostgreSQL), reexportada aqui; ver banco_debian.py
+from banco_debian import salvar_no_postgres, flush_buffer_leituras, close_db_connection  # noqa: F401
 
 # Configuração específica para ambiente Debian/Linux
 # Otimizações para melhor performance em servidores Linux
-ocr = PaddleOCR(
+# Backend de inferência (paddle, onnx, openvino) via OCR_BACKEND; ver motor_ocr.py
+ocr = criar_ocr(
     lang='pt',
     use_angle_cls=False,
     det_limit_side_len=640,
     # Configurações específicas para Linux
     use_gpu=False,  # Pode ser True se CUDA estiver disponível
     show_log=False,  # Reduz logs verbosos
-    enable_mkldnn=True  # Otimização Intel MKL-DNN para CPU
+    enable_mkldnn=True,  # Otimização Intel MKL-DNN para CPU
+    # Quantos recortes o reconhecedor processa por chamada da rede; no modo em
+    # lote (ler_placas2_lote) os recortes de várias imagens dividem a mesma chamada
+    rec_batch_num=int(os.getenv('OCR_REC_LOTE', '16')),
+    # Threads de CPU por instância; o pool de processos da API divide os núcleos entre os workers
+    cpu_threads=int(os.getenv('OCR_CPU_THREADS', '10')),
 )
 
+# Cache de resultados por conteúdo do recorte (OCR_CACHE_TAMANHO=0 desliga)
+cache_ocr = CacheResultadosOCR() if CACHE_TAMANHO > 0 else None
+
+# Pré-filtro de presença de placa: recortes sem cara de placa (sombra, asfalto,
+# para-choque) não vão ao OCR. OCR_FILTRO_PRESENCA=0 desliga; ver filtro_placa.py
+filtro_presenca = FiltroPresencaPlaca() if FILTRO_PRESENCA else None
+
+# Caminho rápido: recortes que já são a placa inteira (saída do detector de placas)
+# vão direto para o reconhecimento, sem a rede de detecção de texto.
+# Se a leitura não passar em license_complies_format, cai no caminho completo.
+CAMINHO_RAPIDO = os.getenv('OCR_CAMINHO_RAPIDO', '1') != '0'
+# Proporção largura/altura de uma placa justa: carro 400x130 mm (~3,1), moto 200x170 mm (~1,2)
+RAZAO_PLACA_UMA_LINHA = (2.0, 6.0)
+RAZAO_PLACA_DUAS_LINHAS = (0.8, 1.6)
+ALTURA_MIN_PLACA = 16  # Recortes menores que isso não têm resolução para o reconhecedor sozinho
+LARGURA_MAX_PLACA = 1000  # Recortes maiores provavelmente contêm mais que a placa
+
 char_to_int = {'O': '0', 'I': '1', 'J': '3', 'A': '4', 'G': '6', 'S': '5', 'B': '8'} # Added B:8
 int_to_char = {'0': 'O', '1': 'I', '3': 'J', '4': 'A', '6': 'G', '5': 'S', '8': 'B'} # Added 8:B
 
+class _DecodificacaoComProbabilidades:
+    """
+    Envolve o decodificador CTC do reconhecedor do PaddleOCR para que cada
+    resultado leve também a matriz T x C de probabilidades do recorte.
+    Só o reconhecer_regioes consome esses triplos; ocr.ocr() não é usado neste módulo.
+    """
+
+    def __init__(self, original):
+        self.original = original
+        self.character = original.character
+
+    def __call__(self, preds, *args, **kwargs):
+        resultado = self.original(preds, *args, **kwargs)
+        matriz = preds[-1] if isinstance(preds, (list, tuple)) else preds
+        if not isinstance(matriz, np.ndarray) or matriz.ndim != 3:
+            return resultado
+        return [(texto, score, matriz[i]) for i, (texto, score) in enumerate(resultado)]
+
+# Decodificação restrita às gramáticas de placa sobre as probabilidades do reconhecedor
+# (OCR_DECODIFICACAO_RESTRITA=0 desliga e volta só à leitura gulosa)
+decodificador_placa = None
+if os.getenv('OCR_DECODIFICACAO_RESTRITA', '1') != '0':
+    try:
+        _decodificador_ctc = ocr.text_recognizer.postprocess_op
+        decodificador_placa = DecodificadorPlaca(_decodificador_ctc.character, char_to_int, int_to_char)
+        ocr.text_recognizer.postprocess_op = _DecodificacaoComProbabilidades(_decodificador_ctc)
+    except AttributeError:
+        print("[WARN] Reconhecedor sem decodificador CTC acessível; decodificação restrita desligada")
+
 PALAVRAS_IGNORAR = {
     'BRASIL', 'MERCOSUL', 'BRAZIL', # País e bloco
     # Estados (siglas e nomes comuns, já limpos e em maiúsculas)
@@ -110,185 +175,6 @@ def corrigir_placa(text, pattern_code):
     
     return "".join(corrected_plate)
 
-# Configuração de banco de dados para ambiente Linux/Debian
-# COMENTADO: Conexão com PostgreSQL temporariamente desabilitada
-# def get_db_config():
-#     """
-#     Obtém configuração de banco de dados via variáveis de ambiente
-#     ou arquivo de configuração específico para Linux.
-#     """
-#     # Configuração via variáveis de ambiente (recomendado para produção)
-#     db_config = {
-#         'host': os.getenv('DB_HOST', 'localhost'),
-#         'port': os.getenv('DB_PORT', '5432'),
-#         'database': os.getenv('DB_NAME', 'guarita'),
-#         'user': os.getenv('DB_USER', 'postgres'),
-#         'password': os.getenv('DB_PASSWORD', ''),
-#     }
-#     
-#     # Arquivo de configuração alternativo (se não houver variáveis de ambiente)
-#     config_file = os.path.expanduser('~/.config/guarita/db_config')
-#     if not any(db_config.values()) and os.path.exists(config_file):
-#         try:
-#             with open(config_file, 'r') as f:
-#                 for line in f:
-#                     if '=' in line and not line.strip().startswith('#'):
-#                         key, value = line.strip().split('=', 1)
-#                         if key.upper() in ['HOST', 'PORT', 'DATABASE', 'USER', 'PASSWORD']:
-#                             db_config[key.lower()] = value
-#         except Exception as e:
-#             print(f"[WARN] Erro ao ler arquivo de configuração {config_file}: {e}")
-#     
-#     return db_config
-
-# Inicialização das variáveis globais
-# COMENTADO: Variáveis de banco PostgreSQL temporariamente desabilitadas
-# conexao = None
-# cursor = None
-# buffer_leituras = []
-# BUFFER_SIZE = 10  # Increased buffer size
-
-# def init_db_connection():
-#     """
-#     Inicializa a conexão com o banco de dados PostgreSQL.
-#     Adaptado para ambiente Linux com melhor tratamento de erro.
-#     """
-#     global conexao, cursor
-#     
-#     if conexao is not None:
-#         return True  # Já conectado
-#     
-#     try:
-#         db_config = get_db_config()
-#         print(f"[DB_INFO] Conectando ao PostgreSQL em {db_config['host']}:{db_config['port']}")
-#         
-#         conexao = psycopg2.connect(
-#             host=db_config['host'],
-#             port=db_config['port'],
-#             database=db_config['database'],
-#             user=db_config['user'],
-#             password=db_config['password'],
-#             # Configurações específicas para Linux
-#             connect_timeout=30,
-#             application_name='guarita_leitor_placas_debian'
-#         )
-#         
-#         cursor = conexao.cursor()
-#         
-#         # Teste de conectividade
-#         cursor.execute("SELECT version();")
-#         version = cursor.fetchone()
-#         print(f"[DB_INFO] Conectado ao PostgreSQL: {version[0]}")
-#         
-#         return True
-#         
-#     except psycopg2.OperationalError as e:
-#         print(f"[DB_ERROR] Erro de conectividade PostgreSQL: {e}")
-#         print("[DB_INFO] Verifique se o PostgreSQL está rodando e as credenciais estão corretas")
-#         return False
-#     except Exception as e:
-#         print(f"[DB_ERROR] Erro inesperado ao conectar ao PostgreSQL: {e}")
-#         return False
-
-def salvar_no_postgres(frame_nmr, car_id, license_number, license_number_score):
-    """
-    COMENTADO: Função de salvamento no PostgreSQL temporariamente desabilitada.
-    Apenas exibe os dados no terminal para testes.
-    """
-    # global buffer_leituras, conexao, cursor
-    
-    # # Inicializa conexão se necessário
-    # if not conexao or conexao.closed:
-    #     if not init_db_connection():
-    #         print("[DB_ERROR] Não foi possível conectar ao banco. Dados não salvos.")
-    #         return
-    
-    data_hora_atual = datetime.now()
-    
-    # MODO TESTE: Apenas exibe no terminal
-    print(f"🚗 [PLACA_DETECTADA] Frame: {frame_nmr}, Car ID: {car_id}")
-    print(f"📋 [PLACA_DETECTADA] Placa: {license_number}")
-    print(f"📊 [PLACA_DETECTADA] Confiança: {license_number_score:.2f}")
-    print(f"🕒 [PLACA_DETECTADA] Data/Hora: {data_hora_atual.strftime('%Y-%m-%d %H:%M:%S')}")
-    print("-" * 60)
-    
-    # buffer_leituras.append((int(frame_nmr), int(car_id), license_number, float(license_number_score), data_hora_atual))
-    
-    # if len(buffer_leituras) >= BUFFER_SIZE:
-    #     try:
-    #         comando_sql = """
-    #         INSERT INTO transito_leitura_placa (frame_nmr,car_id,license_number,license_number_score,data_hora)
-    #         VALUES (%s, %s, %s, %s, %s);
-    #         """
-    #         cursor.executemany(comando_sql, buffer_leituras)
-    #         conexao.commit()
-    #         print(f"[DB_INFO] Lote de {len(buffer_leituras)} leituras salvo no banco de dados.")
-    #         buffer_leituras = []
-    #     except psycopg2.Error as e:
-    #         print(f"[DB_ERROR] Erro ao salvar lote no PostgreSQL: {e}")
-    #         # Tenta reconectar em caso de erro de conexão
-    #         if "connection" in str(e).lower():
-    #             print("[DB_INFO] Tentando reconectar ao banco...")
-    #             init_db_connection()
-    #         conexao.rollback() if conexao and not conexao.closed else None
-    #         buffer_leituras = [] # Clear buffer on error to avoid retrying bad data
-    #     except Exception as ex:
-    #         print(f"[DB_ERROR] Erro inesperado ao salvar lote: {ex}")
-    #         conexao.rollback() if conexao and not conexao.closed else None
-    #         buffer_leituras = []
-
-def flush_buffer_leituras():
-    """
-    COMENTADO: Função de flush do buffer temporariamente desabilitada.
-    """
-    # global buffer_leituras, conexao, cursor
-    
-    # if not buffer_leituras:
-    #     return
-    
-    print("[INFO] Modo teste: não há buffer para descarregar (PostgreSQL desabilitado)")
-    
-    # # Inicializa conexão se necessário
-    # if not conexao or conexao.closed:
-    #     if not init_db_connection():
-    #         print("[DB_ERROR] Não foi possível conectar ao banco para flush. Dados perdidos.")
-    #         buffer_leituras = []
-    #         return
-    
-    # try:
-    #     comando_sql = """
-    #     INSERT INTO transito_leitura_placa (frame_nmr,car_id,license_number,license_number_score,data_hora)
-    #     VALUES (%s, %s, %s, %s, %s);
-    #     """
-    #     cursor.executemany(comando_sql, buffer_leituras)
-    #     conexao.commit()
-    #     print(f"[DB_INFO] Buffer final de {len(buffer_leituras)} leituras salvo no banco de dados.")
-    # except psycopg2.Error as e:
-    #     print(f"[DB_ERROR] Erro ao fazer flush do buffer para o PostgreSQL: {e}")
-    #     conexao.rollback() if conexao and not conexao.closed else None
-    # except Exception as ex:
-    #     print(f"[DB_ERROR] Erro inesperado ao fazer flush do buffer: {ex}")
-    #     conexao.rollback() if conexao and not conexao.closed else None
-    # finally:
-    #     buffer_leituras = [] # Always clear after attempting flush
-
-def close_db_connection():
-    """
-    COMENTADO: Função de fechamento da conexão temporariamente desabilitada.
-    """
-    # global conexao, cursor
-    print("[INFO] Modo teste: não há conexão de banco para fechar (PostgreSQL desabilitado)")
-    # flush_buffer_leituras()
-    
-    # try:
-    #     if cursor:
-    #         cursor.close()
-    #     if conexao and not conexao.closed:
-    #         conexao.close()
-    #     print("[DB_INFO] Conexão com PostgreSQL fechada.")
-    # except Exception as e:
-    #     print(f"[DB_WARN] Erro ao fechar conexão: {e}")
-
 def limpar_texto_placa(texto):
     """
     Remove caracteres especiais e normaliza texto da placa.
@@ -297,79 +183,555 @@ def limpar_texto_placa(texto):
     caracteres_remover = "-.!@#$%^&*()[]{};:,<>?/\\|`~'\""
     return ''.join(c for c in texto if c not in caracteres_remover).strip().upper()
 
-def ler_placas2(placa_carro_crop): # PaddleOCR based - Versão Debian
+def decodificar_imagem(imagem_bytes, forma=None):
     """
-    Função de leitura de placas otimizada para ambiente Linux/Debian.
+    Decodifica bytes de imagem (JPEG, PNG, ...) para tons de cinza. Retorna None se falhar.
+    Com forma=(altura, largura) os bytes são tratados como pixels em tons de cinza crus.
+    """
+    if not imagem_bytes:
+        return None
+    nparr = np.frombuffer(imagem_bytes, np.uint8)
+    if forma is not None:
+        altura, largura = forma
+        if nparr.size != altura * largura:
+            return None
+        return nparr.reshape(altura, largura)
+    return cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+
+# Normalização de contraste (alpha=1.2, beta=10) como tabela: uma passada, sem float intermediário
+TABELA_CONTRASTE = cv2.convertScaleAbs(np.arange(256, dtype=np.uint8), alpha=1.2, beta=10)
+
+# Pré-processamento direto: recortes em tons de cinza ficam com um canal até o tensor
+# da detecção e só os recortes de texto (pequenos) são expandidos para 3 canais.
+# OCR_PREPROCESSAMENTO_DIRETO=0 volta ao caminho com cvtColor + convertScaleAbs + PaddleOCR.
+PREPROCESSAMENTO_DIRETO = os.getenv('OCR_PREPROCESSAMENTO_DIRETO', '1') != '0'
+
+_buffers = threading.local()  # Buffers reutilizados por thread (cada worker tem os seus)
+
+def _buffer(nome, forma, dtype):
+    """
+    View de um buffer reutilizável da thread com a forma pedida. A área de memória
+    só é realocada quando precisa crescer, então tamanhos variados não geram alocações.
     """
+    tamanho = int(np.prod(forma))
+    atual = getattr(_buffers, nome, None)
+    if atual is None or atual.size < tamanho or atual.dtype != dtype:
+        atual = np.empty(max(tamanho, 2 * (atual.size if atual is not None else 0)), dtype=dtype)
+        setattr(_buffers, nome, atual)
+    return atual[:tamanho].reshape(forma)
+
+def preprocessar_placa(placa_carro_crop, reutilizar_buffer=False):
+    """
+    Aplica a normalização de contraste usada pelo OCR.
+    Recortes em tons de cinza continuam com um canal (pré-processamento direto);
+    recortes coloridos são convertidos para RGB.
+    Com reutilizar_buffer, o resultado fica num buffer da thread, válido até a próxima chamada.
+    """
+    if len(placa_carro_crop.shape) == 2 and PREPROCESSAMENTO_DIRETO:
+        destino = _buffer("contraste", placa_carro_crop.shape, np.uint8) if reutilizar_buffer else None
+        return cv2.LUT(placa_carro_crop, TABELA_CONTRASTE, dst=destino)
+
+    if len(placa_carro_crop.shape) == 2:
+        img_rgb = cv2.cvtColor(placa_carro_crop, cv2.COLOR_GRAY2RGB)
+    else:
+        img_rgb = cv2.cvtColor(placa_carro_crop, cv2.COLOR_BGR2RGB)
+
+    # Preprocessamento adicional para melhor OCR em Linux
+    # Normalização de contraste
+    return cv2.convertScaleAbs(img_rgb, alpha=1.2, beta=10)
+
+def _parametros_deteccao():
+    """
+    Lê do pré-processamento do detector do PaddleOCR (DetResizeForTest + NormalizeImage)
+    o redimensionamento e monta uma tabela de normalização por canal.
+    Retorna None se a configuração não for a esperada (aí o detector é chamado normalmente).
+    """
+    if hasattr(_parametros_deteccao, "cache"):
+        return _parametros_deteccao.cache
+    parametros = None
+    detector = ocr.text_detector
     try:
-        if len(placa_carro_crop.shape) == 2:
-            img_rgb = cv2.cvtColor(placa_carro_crop, cv2.COLOR_GRAY2RGB)
+        redimensionar, normalizar = detector.preprocess_op[0], detector.preprocess_op[1]
+        if (type(redimensionar).__name__ == "DetResizeForTest" and redimensionar.resize_type == 0
+                and redimensionar.limit_type in ("max", "min", "resize_long")
+                and type(normalizar).__name__ == "NormalizeImage" and normalizar.mean.shape == (1, 1, 3)
+                and detector.det_algorithm in ("DB", "DB++", "PSE")):
+            valores = np.arange(256, dtype=np.float32).reshape(256, 1)
+            # Mesmas operações em float32 do NormalizeImage, feitas uma vez para os 256 níveis
+            tabela = (valores * normalizar.scale - normalizar.mean.reshape(1, -1)) / normalizar.std.reshape(1, -1)
+            parametros = (
+                redimensionar.limit_side_len,
+                redimensionar.limit_type,
+                [np.ascontiguousarray(tabela[:, c], dtype=np.float32) for c in range(tabela.shape[1])],
+            )
+    except (AttributeError, IndexError):
+        parametros = None
+    _parametros_deteccao.cache = parametros
+    return parametros
+
+def _tamanho_deteccao(altura, largura, limite, tipo_limite):
+    """Mesmo cálculo do DetResizeForTest (resize_type 0): lados múltiplos de 32."""
+    if tipo_limite == "max":
+        razao = float(limite) / max(altura, largura) if max(altura, largura) > limite else 1.
+    elif tipo_limite == "min":
+        razao = float(limite) / min(altura, largura) if min(altura, largura) < limite else 1.
+    else:  # resize_long
+        razao = float(limite) / max(altura, largura)
+    nova_altura = max(int(round(int(altura * razao) / 32) * 32), 32)
+    nova_largura = max(int(round(int(largura * razao) / 32) * 32), 32)
+    return nova_altura, nova_largura
+
+def _detectar_cinza(img_cinza, parametros):
+    """
+    Detecção de texto a partir de uma imagem de um canal: redimensiona e normaliza
+    direto para o tensor de entrada (buffers reutilizados) e chama a rede e o
+    pós-processamento do detector do PaddleOCR, sem as cópias do TextDetector.__call__.
+    """
+    detector = ocr.text_detector
+    limite, tipo_limite, tabelas = parametros
+    altura, largura = img_cinza.shape
+    entrada = img_cinza
+    if altura + largura < 64:
+        # Como o DetResizeForTest: imagens minúsculas são completadas com zeros até 32 px
+        entrada = np.zeros((max(32, altura), max(32, largura)), np.uint8)
+        entrada[:altura, :largura] = img_cinza
+    altura_entrada, largura_entrada = entrada.shape
+    nova_altura, nova_largura = _tamanho_deteccao(altura_entrada, largura_entrada, limite, tipo_limite)
+
+    redimensionada = _buffer("det_redimensionada", (nova_altura, nova_largura), np.uint8)
+    cv2.resize(entrada, (nova_largura, nova_altura), dst=redimensionada)
+    tensor = _buffer("det_tensor", (1, len(tabelas), nova_altura, nova_largura), np.float32)
+    for canal, tabela in enumerate(tabelas):
+        np.take(tabela, redimensionada, out=tensor[0, canal])
+
+    if detector.use_onnx:
+        saidas = detector.predictor.run(detector.output_tensors, {detector.input_tensor.name: tensor})
+    else:
+        detector.input_tensor.copy_from_cpu(tensor)
+        detector.predictor.run()
+        saidas = [saida.copy_to_cpu() for saida in detector.output_tensors]
+
+    formas = np.array([[altura, largura, nova_altura / float(altura_entrada), nova_largura / float(largura_entrada)]])
+    caixas = detector.postprocess_op({'maps': saidas[0]}, formas)[0]['points']
+    if ocr.args.det_box_type == 'poly':
+        return detector.filter_tag_det_res_only_clip(caixas, img_cinza.shape)
+    return detector.filter_tag_det_res(caixas, img_cinza.shape)
+
+def detectar_regioes(img_ocr):
+    """
+    Roda apenas a detecção de texto do PaddleOCR.
+    img_ocr é a saída de preprocessar_placa (um canal no pré-processamento direto, ou RGB).
+    Retorna (caixas, recortes) ordenados de cima para baixo, da esquerda para a direita.
+    """
+    parametros = _parametros_deteccao() if img_ocr.ndim == 2 else None
+    if parametros is not None:
+        dt_boxes = _detectar_cinza(img_ocr, parametros)
+    else:
+        dt_boxes, _ = ocr.text_detector(img_ocr if img_ocr.ndim == 3 else cv2.cvtColor(img_ocr, cv2.COLOR_GRAY2RGB))
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return [], []
+
+    caixas = sorted_boxes(dt_boxes)
+    recortes = []
+    for caixa in caixas:
+        if ocr.args.det_box_type == 'quad':
+            recortes.append(get_rotate_crop_image(img_ocr, copy.deepcopy(caixa)))
         else:
-            img_rgb = cv2.cvtColor(placa_carro_crop, cv2.COLOR_BGR2RGB)
+            recortes.append(get_minarea_rect_crop(img_ocr, copy.deepcopy(caixa)))
+    return caixas, recortes
 
-        # Preprocessamento adicional para melhor OCR em Linux
-        # Normalização de contraste
-        img_rgb = cv2.convertScaleAbs(img_rgb, alpha=1.2, beta=10)
+def reconhecer_regioes(recortes, probabilidades=None):
+    """
+    Roda o reconhecimento de texto em uma lista de recortes (de uma ou várias imagens).
+    Recortes de um canal são expandidos para RGB aqui, já pequenos.
+    Retorna uma lista de (texto, score) na mesma ordem. Se probabilidades (lista) for
+    passada, recebe a matriz T x C de probabilidades de cada recorte (ou None).
+    """
+    if not recortes:
+        return []
+    recortes = [cv2.cvtColor(r, cv2.COLOR_GRAY2RGB) if r.ndim == 2 else r for r in recortes]
+    rec_res, _ = ocr.text_recognizer(recortes)
+    if probabilidades is not None:
+        probabilidades.extend(r[2] if len(r) > 2 else None for r in rec_res)
+    return [(r[0], r[1]) for r in rec_res]
+
+def layout_recorte_placa(img):
+    """
+    Classifica um recorte pela proporção e tamanho: "uma_linha" (placa de carro),
+    "duas_linhas" (placa de moto) ou None quando não parece ser uma placa justa.
+    """
+    altura, largura = img.shape[:2]
+    if altura < ALTURA_MIN_PLACA or largura > LARGURA_MAX_PLACA:
+        return None
+    razao = largura / altura
+    if RAZAO_PLACA_UMA_LINHA[0] <= razao <= RAZAO_PLACA_UMA_LINHA[1]:
+        return "uma_linha"
+    if RAZAO_PLACA_DUAS_LINHAS[0] <= razao <= RAZAO_PLACA_DUAS_LINHAS[1]:
+        return "duas_linhas"
+    return None
 
-        results = ocr.ocr(img_rgb, cls=False)
-        
-        if not results or not results[0]:
-            # print("[INFO] Nenhum texto detectado pelo OCR (PaddleOCR) ou resultado vazio.")
-            return None, None
+def linhas_placa(img_ocr, layout):
+    """
+    Divide uma placa justa em linhas de texto para o reconhecedor, sem a rede de detecção.
+    Placas de duas linhas são cortadas na faixa com menos pixels escuros perto do meio.
+    Retorna (caixas, recortes) no mesmo formato de detectar_regioes.
+    """
+    altura, largura = img_ocr.shape[:2]
+    if layout == "duas_linhas":
+        cinza = img_ocr if img_ocr.ndim == 2 else cv2.cvtColor(img_ocr, cv2.COLOR_RGB2GRAY)
+        escuros_por_linha = (cinza < cinza.mean()).sum(axis=1)
+        inicio, fim = int(altura * 0.35), int(altura * 0.65) + 1
+        corte = inicio + int(np.argmin(escuros_por_linha[inicio:fim]))
+        faixas = [(0, corte), (corte, altura)]
+    else:
+        faixas = [(0, altura)]
+
+    caixas = [
+        np.array([[0, y0], [largura, y0], [largura, y1], [0, y1]], dtype=np.float32)
+        for y0, y1 in faixas
+    ]
+    recortes = [img_ocr[y0:y1] for y0, y1 in faixas]
+    return caixas, recortes
+
+def montar_deteccoes(caixas, reconhecimentos):
+    """
+    Junta caixas e textos no formato de ocr.ocr(): [[caixa, (texto, score)], ...],
+    descartando leituras abaixo do drop_score configurado no PaddleOCR.
+    """
+    return [
+        [caixa.tolist(), (texto, score)]
+        for caixa, (texto, score) in zip(caixas, reconhecimentos)
+        if score >= ocr.drop_score
+    ]
 
-        all_detections_for_image = results[0]
+def interpretar_deteccoes(all_detections_for_image):
+    """
+    Combina/filtra as detecções de uma imagem e devolve (placa, confiança) ou (None, None).
+    """
+    # Tenta combinar múltiplas detecções
+    if all_detections_for_image and len(all_detections_for_image) > 1:
+        texts_to_combine = []
+        scores_to_combine = []
         
-        # Tenta combinar múltiplas detecções
-        if all_detections_for_image and len(all_detections_for_image) > 1:
-            texts_to_combine = []
-            scores_to_combine = []
+        # Ordenar por posição X (da esquerda para direita) e depois Y (de cima para baixo)
+        try:
+            sorted_detections = sorted(all_detections_for_image, key=lambda det: (det[0][0][0], det[0][0][1]))
+        except (TypeError, IndexError) as e: # Melhor tratamento de erro para Linux
+            print(f"[WARN] Não foi possível ordenar as detecções do OCR: {e}. Usando ordem original.")
+            sorted_detections = all_detections_for_image
+
+        for detection_item in sorted_detections:
+            text_ocr = detection_item[1][0]
+            score_ocr = detection_item[1][1]
             
-            # Ordenar por posição X (da esquerda para direita) e depois Y (de cima para baixo)
-            try:
-                sorted_detections = sorted(all_detections_for_image, key=lambda det: (det[0][0][0], det[0][0][1]))
-            except (TypeError, IndexError) as e: # Melhor tratamento de erro para Linux
-                print(f"[WARN] Não foi possível ordenar as detecções do OCR: {e}. Usando ordem original.")
-                sorted_detections = all_detections_for_image
-
-            for detection_item in sorted_detections:
-                text_ocr = detection_item[1][0]
-                score_ocr = detection_item[1][1]
-                
-                processed_text = limpar_texto_placa(text_ocr)
-
-                if processed_text and processed_text not in PALAVRAS_IGNORAR and len(processed_text) > 0:
-                    texts_to_combine.append(processed_text)
-                    scores_to_combine.append(score_ocr)
+            processed_text = limpar_texto_placa(text_ocr)
+
+            if processed_text and processed_text not in PALAVRAS_IGNORAR and len(processed_text) > 0:
+                texts_to_combine.append(processed_text)
+                scores_to_combine.append(score_ocr)
+        
+        if texts_to_combine:
+            combined_text = "".join(texts_to_combine)
+            pattern = license_complies_format(combined_text)
+            if pattern:
+                avg_score = sum(scores_to_combine) / len(scores_to_combine) if scores_to_combine else 0.0
+                corrected_plate = corrigir_placa(combined_text, pattern)
+                print(f"[INFO] Placa combinada: {corrected_plate} (de '{combined_text}'), Confiança Média: {avg_score:.2f} de {len(texts_to_combine)} partes.")
+                return corrected_plate, avg_score
+
+    # Lógica para detecção única ou fallback
+    if all_detections_for_image:
+        for detection_item in all_detections_for_image:
+            text_ocr = detection_item[1][0]
+            score_ocr = detection_item[1][1]
+
+            processed_text = limpar_texto_placa(text_ocr)
             
-            if texts_to_combine:
-                combined_text = "".join(texts_to_combine)
-                pattern = license_complies_format(combined_text)
-                if pattern:
-                    avg_score = sum(scores_to_combine) / len(scores_to_combine) if scores_to_combine else 0.0
-                    corrected_plate = corrigir_placa(combined_text, pattern)
-                    print(f"[INFO] Placa combinada: {corrected_plate} (de '{combined_text}'), Confiança Média: {avg_score:.2f} de {len(texts_to_combine)} partes.")
-                    return corrected_plate, avg_score
-
-        # Lógica para detecção única ou fallback
-        if all_detections_for_image:
-            for detection_item in all_detections_for_image:
-                text_ocr = detection_item[1][0]
-                score_ocr = detection_item[1][1]
-
-                processed_text = limpar_texto_placa(text_ocr)
-                
-                pattern = license_complies_format(processed_text)
-                if pattern:
-                    corrected_plate = corrigir_placa(processed_text, pattern)
-                    print(f"[INFO] Placa individual: {corrected_plate} (de '{processed_text}'), Confiança: {score_ocr:.2f}")
-                    return corrected_plate, score_ocr
+            pattern = license_complies_format(processed_text)
+            if pattern:
+                corrected_plate = corrigir_placa(processed_text, pattern)
+                print(f"[INFO] Placa individual: {corrected_plate} (de '{processed_text}'), Confiança: {score_ocr:.2f}")
+                return corrected_plate, score_ocr
+
+    return None, None
 
+def interpretar_leituras(caixas, reconhecimentos, probabilidades=None):
+    """
+    Interpreta as leituras dos recortes de uma imagem e devolve (placa, confiança) ou (None, None).
+    Com as probabilidades do reconhecedor, tenta primeiro a decodificação restrita às
+    gramáticas de placa (decodificacao_placa.py); senão, ou se ela não achar uma placa
+    confiável, usa a leitura gulosa com license_complies_format/corrigir_placa.
+    """
+    if decodificador_placa is not None and probabilidades and all(p is not None for p in probabilidades):
+        matrizes = [
+            matriz for (texto, _), matriz in zip(reconhecimentos, probabilidades)
+            if limpar_texto_placa(texto) not in PALAVRAS_IGNORAR
+        ]
+        decodificada = decodificador_placa.decodificar(matrizes)
+        if decodificada:
+            placa, confianca, padrao = decodificada
+            print(f"[INFO] Placa (decodificação restrita, {padrao}): {placa}, Confiança: {confianca:.2f}")
+            return placa, confianca
+
+    deteccoes = montar_deteccoes(caixas, reconhecimentos)
+    if not deteccoes:
         return None, None
+    return interpretar_deteccoes(deteccoes)
+
+def _marcar_tempo(tempos, etapa, inicio):
+    """Soma em tempos[etapa] o tempo desde inicio (se tempos foi pedido) e devolve o instante atual."""
+    agora = time.perf_counter()
+    if tempos is not None:
+        tempos[etapa] = tempos.get(etapa, 0.0) + (agora - inicio)
+    return agora
+
+def _filtrar_presenca(placa_carro_crop):
+    """Consulta o pré-filtro de presença. Retorna (descartar, descartaria); ver FiltroPresencaPlaca."""
+    try:
+        return filtro_presenca.descartar(placa_carro_crop)
+    except Exception as e:
+        print(f"[WARN] Erro no filtro de presença de placa, seguindo para o OCR: {e}")
+        return False, False
+
+def ler_placas2(placa_carro_crop, tempos=None, usar_cache=True, usar_filtro=True, cronometrar=False): # PaddleOCR based - Versão Debian
+    """
+    Função de leitura de placas otimizada para ambiente Linux/Debian.
+    Se tempos (dict) for passado, recebe os segundos gastos em cada etapa
+    (cache, filtro, preprocessamento, deteccao, reconhecimento, pos_processamento;
+    só "cache" quando o resultado veio do cache de recortes repetidos).
+    Com tempos, cronometrar=True ou OCR_CRONOMETRAGEM=1 o retorno é um
+    cronometragem.ResultadoOCR (tupla com .marcas e .tempos).
+    """
+    cronometro = cronometragem.iniciar(cronometrar or tempos is not None)
+    cache = cache_ocr if usar_cache else None
+    chaves = None
+    if cache is not None:
+        chaves = cache.chaves(placa_carro_crop)
+        em_cache = cache.obter(chaves)
+        cronometro.marcar("cache")
+        if em_cache is not None:
+            return cronometragem.concluir(cronometro, em_cache, tempos)
+
+    descartaria = False
+    if usar_filtro and filtro_presenca is not None:
+        descartar, descartaria = _filtrar_presenca(placa_carro_crop)
+        cronometro.marcar("filtro")
+        if descartar:
+            if chaves is not None:
+                cache.guardar(chaves, (None, None))
+            return cronometragem.concluir(cronometro, (None, None), tempos)
+
+    try:
+        img_rgb = preprocessar_placa(placa_carro_crop, reutilizar_buffer=True)
+        cronometro.marcar("preprocessamento")
+
+        resultado = None
+        layout = layout_recorte_placa(img_rgb) if CAMINHO_RAPIDO else None
+        if layout is not None:
+            # Caminho rápido: só reconhecimento, nas linhas da placa
+            caixas, recortes = linhas_placa(img_rgb, layout)
+            probabilidades = []
+            reconhecimentos = reconhecer_regioes(recortes, probabilidades)
+            cronometro.marcar("reconhecimento")
+            placa, confianca = interpretar_leituras(caixas, reconhecimentos, probabilidades)
+            if placa:
+                resultado = (placa, confianca)
+            cronometro.marcar("pos_processamento")
+
+        if resultado is None:
+            caixas, recortes = detectar_regioes(img_rgb)
+            cronometro.marcar("deteccao")
+            probabilidades = []
+            reconhecimentos = reconhecer_regioes(recortes, probabilidades)
+            cronometro.marcar("reconhecimento")
+
+            # (None, None) quando nenhum texto foi detectado pelo OCR ou nada forma uma placa
+            resultado = interpretar_leituras(caixas, reconhecimentos, probabilidades)
+            cronometro.marcar("pos_processamento")
+
+        if descartaria:
+            filtro_presenca.conferir(descartaria, resultado)
+        # Erros não entram no cache (caem no except); "sem placa" entra
+        if chaves is not None:
+            cache.guardar(chaves, resultado)
+        return cronometragem.concluir(cronometro, resultado, tempos)
         
     except Exception as e:
         print(f"[ERRO] Erro no processamento OCR: {e}")
         return None, None
 
+def _rodada_lote(entradas, rapido, resultados, tempos, chaves_por_imagem):
+    """
+    Uma rodada de ler_placas2_lote sobre entradas [(índice, img_rgb), ...]: monta os
+    recortes de texto de cada imagem (pelas linhas da placa se rapido, senão pela
+    detecção), reconhece todos numa única chamada e preenche resultados.
+    Retorna as entradas que ainda precisam do caminho completo (só quando rapido).
+    """
+    restantes = []
+    caixas_por_imagem = []  # (índice, índice do primeiro recorte em todos_recortes, caixas)
+    todos_recortes = []
+    for indice, img_rgb in entradas:
+        try:
+            t = time.perf_counter()
+            if rapido:
+                layout = layout_recorte_placa(img_rgb)
+                if layout is None:
+                    restantes.append((indice, img_rgb))
+                    continue
+                caixas, recortes = linhas_placa(img_rgb, layout)
+            else:
+                caixas, recortes = detectar_regioes(img_rgb)
+                _marcar_tempo(tempos[indice], "deteccao", t)
+        except Exception as e:
+            print(f"[ERRO] Erro na detecção do item {indice} do lote: {e}")
+            chaves_por_imagem.pop(indice, None)
+            continue
+        caixas_por_imagem.append((indice, len(todos_recortes), caixas, img_rgb))
+        todos_recortes.extend(recortes)
+
+    try:
+        t = time.perf_counter()
+        probabilidades = []
+        reconhecimentos = reconhecer_regioes(todos_recortes, probabilidades)
+        parcela = (time.perf_counter() - t) / max(1, len(caixas_por_imagem))
+        for indice, _, _, _ in caixas_por_imagem:
+            if tempos[indice] is not None:
+                tempos[indice]["reconhecimento"] = tempos[indice].get("reconhecimento", 0.0) + parcela
+    except Exception as e:
+        print(f"[ERRO] Erro no reconhecimento do lote ({len(todos_recortes)} recortes): {e}")
+        if rapido:
+            return restantes + [(indice, img_rgb) for indice, _, _, img_rgb in caixas_por_imagem]
+        for indice, _, _, _ in caixas_por_imagem:
+            chaves_por_imagem.pop(indice, None)
+        return restantes
+
+    for indice, inicio, caixas, img_rgb in caixas_por_imagem:
+        if not caixas:
+            continue
+        try:
+            t = time.perf_counter()
+            fim = inicio + len(caixas)
+            resultados[indice] = interpretar_leituras(caixas, reconhecimentos[inicio:fim], probabilidades[inicio:fim])
+            _marcar_tempo(tempos[indice], "pos_processamento", t)
+        except Exception as e:
+            print(f"[ERRO] Erro no pós-processamento do item {indice} do lote: {e}")
+            chaves_por_imagem.pop(indice, None)
+            continue
+        if rapido and not resultados[indice][0]:
+            restantes.append((indice, img_rgb))
+    return restantes
+
+def ler_placas2_lote(placas_carro_crops, tempos=None, usar_cache=True, usar_filtro=True):
+    """
+    Versão em lote de ler_placas2.
+    A detecção roda imagem a imagem (cada recorte tem um tamanho diferente), mas os
+    recortes de texto de todas as imagens passam por uma única chamada do reconhecedor.
+    Imagens encontradas no cache de recortes ou descartadas pelo pré-filtro de
+    presença não passam pelo OCR; com o caminho
+    rápido, placas justas são reconhecidas primeiro sem detecção e só as que
+    falharem voltam numa segunda rodada completa.
+    Retorna uma lista de (placa, confiança) na mesma ordem da entrada.
+    Se tempos for uma lista de dicts (um por imagem), cada um recebe os tempos
+    por etapa daquela imagem; o reconhecimento de cada rodada é dividido igualmente.
+    """
+    resultados = [(None, None)] * len(placas_carro_crops)
+    chaves_por_imagem = {}  # índice -> chaves do cache, para guardar o resultado no final
+    entradas = []  # (índice, img_rgb)
+    cache = cache_ocr if usar_cache else None
+    filtro = filtro_presenca if usar_filtro else None
+    descartariam = []  # Índices abaixo do limiar do filtro, conferidos no modo de avaliação
+    if tempos is None:
+        # Com OCR_CRONOMETRAGEM=1 os tempos de cada imagem vão para o agregador do processo
+        tempos = [{} if cronometragem.CRONOMETRAGEM else None for _ in placas_carro_crops]
+
+    for indice, placa_carro_crop in enumerate(placas_carro_crops):
+        if cache is not None:
+            t = time.perf_counter()
+            chaves = cache.chaves(placa_carro_crop)
+            em_cache = cache.obter(chaves)
+            if em_cache is not None:
+                resultados[indice] = em_cache
+                _marcar_tempo(tempos[indice], "cache", t)
+                continue
+            chaves_por_imagem[indice] = chaves
+
+        if filtro is not None:
+            t = time.perf_counter()
+            descartar, descartaria = _filtrar_presenca(placa_carro_crop)
+            _marcar_tempo(tempos[indice], "filtro", t)
+            if descartar:
+                continue  # Fica (None, None); entra no cache assim
+            if descartaria:
+                descartariam.append(indice)
+
+        try:
+            t = time.perf_counter()
+            entradas.append((indice, preprocessar_placa(placa_carro_crop)))
+            _marcar_tempo(tempos[indice], "preprocessamento", t)
+        except Exception as e:
+            print(f"[ERRO] Erro no pré-processamento do item {indice} do lote: {e}")
+            chaves_por_imagem.pop(indice, None)
+
+    if CAMINHO_RAPIDO:
+        entradas = _rodada_lote(entradas, True, resultados, tempos, chaves_por_imagem)
+    _rodada_lote(entradas, False, resultados, tempos, chaves_por_imagem)
+    for indice in descartariam:
+        filtro.conferir(True, resultados[indice])
+
+    if cache is not None:
+        for indice, chaves in chaves_por_imagem.items():
+            cache.guardar(chaves, resultados[indice])
+    if cronometragem.CRONOMETRAGEM:
+        for tempos_imagem in tempos:
+            if tempos_imagem:
+                cronometragem.agregador.observar(tempos_imagem)
+    return resultados
+
+def tamanhos_aquecimento():
+    """
+    Lê OCR_AQUECIMENTO_TAMANHOS ("LxA,LxA,...") com os tamanhos de recorte usados em produção.
+    """
+    tamanhos = []
+    for item in os.getenv('OCR_AQUECIMENTO_TAMANHOS', '240x80,300x100,400x130,640x200').split(','):
+        try:
+            largura, altura = (int(v) for v in item.lower().split('x'))
+            tamanhos.append((largura, altura))
+        except ValueError:
+            print(f"[WARN] Tamanho de aquecimento inválido ignorado: '{item}'")
+    return tamanhos
+
+def aquecer_ocr(iteracoes=None, tamanhos=None):
+    """
+    Roda placas sintéticas por ler_placas2 e ler_placas2_lote em cada tamanho de
+    entrada, para que os kernels MKL-DNN sejam compilados e os caches preenchidos
+    antes do tráfego real. Retorna a duração do aquecimento em segundos.
+    """
+    from placas_sinteticas import gerar_placa_sintetica, texto_placa_aleatorio
+
+    if iteracoes is None:
+        iteracoes = int(os.getenv('OCR_AQUECIMENTO_ITERACOES', '3'))
+    if tamanhos is None:
+        tamanhos = tamanhos_aquecimento()
+    if iteracoes <= 0 or not tamanhos:
+        return 0.0
+
+    inicio = time.perf_counter()
+    imagens = [
+        gerar_placa_sintetica(texto_placa_aleatorio(mercosul=(i % 2 == 1)), largura, altura, mercosul=(i % 2 == 1))
+        for i, (largura, altura) in enumerate(tamanhos)
+    ]
+    # Sem cache: a partir da segunda iteração as mesmas imagens acertariam o cache
+    for _ in range(iteracoes):
+        for img in imagens:
+            ler_placas2(img, usar_cache=False, usar_filtro=False)
+            # O caminho rápido pode dispensar a detecção; ela é aquecida à parte
+            detectar_regioes(preprocessar_placa(img))
+        ler_placas2_lote(imagens, usar_cache=False, usar_filtro=False)
+
+    duracao = time.perf_counter() - inicio
+    print(f"[INFO] Aquecimento do OCR concluído em {duracao:.1f}s ({iteracoes} iterações, {len(tamanhos)} tamanhos)")
+    return duracao
+
 # Inicialização automática da conexão ao importar o módulo (Linux style)
 # COMENTADO: Inicialização de banco temporariamente desabilitada
 # def __init_module():
@@ -387,5 +749,5 @@ def ler_placas2(placa_carro_crop): # PaddleOCR based - Versão Debian
 # # Chama inicialização quando módulo é importado
 # __init_module()
 
-print("[INFO] Módulo util_debian carregado - Modo TESTE (PostgreSQL desabilitado)")
+print(f"[INFO] Módulo util_debian carregado - Modo TESTE (PostgreSQL desabilitado, OCR {BACKEND_OCR}/{PRECISAO_OCR})")
 print("[INFO] As placas detectadas serão exibidas apenas no terminal")
@@ -0,0 +1,159 @@
+"""
+Votação por caractere entre as leituras de um mesmo carro (car_id).
+
+Cada recorte de um carro era lido e gravado por conta própria, e o mesmo
+car_id acabava com várias placas levemente diferentes. O agregador soma, para
+cada uma das 7 posições, a confiança das leituras em cada caractere. A
+confiança do consenso numa posição é
+
+    peso do caractere vencedor / (peso total + VOTACAO_PESO_PRIOR)
+
+e a do consenso da placa é a menor entre as posições. O prior impede que uma
+leitura isolada feche o carro sozinha. Quando o consenso atinge
+VOTACAO_CONFIANCA_ALVO, o carro é finalizado: sai uma única leitura e os
+recortes ainda pendentes dele são descartados sem OCR. Carros que não chegam
+ao alvo são finalizados com o melhor consenso depois de VOTACAO_JANELA_S sem
+novas leituras.
+"""
+
+import os
+import threading
+import time
+
+VOTACAO_PLACA = os.getenv("VOTACAO_PLACA", "0") == "1"
+VOTACAO_CONFIANCA_ALVO = float(os.getenv("VOTACAO_CONFIANCA_ALVO", "0.9"))
+VOTACAO_PESO_PRIOR = float(os.getenv("VOTACAO_PESO_PRIOR", "0.25"))
+VOTACAO_JANELA_S = float(os.getenv("VOTACAO_JANELA_S", "10"))
+# Por quanto tempo um car_id finalizado continua descartando recortes (o rastreador reaproveita ids)
+VOTACAO_TTL_FINALIZADO_S = float(os.getenv("VOTACAO_TTL_FINALIZADO_S", "120"))
+
+TAMANHO_PLACA = 7
+
+
+class AgregadorPlacas:
+    """Consenso por car_id com parada antecipada. Thread-safe; agora (monotonic) é opcional, para testes."""
+
+    def __init__(self, confianca_alvo=VOTACAO_CONFIANCA_ALVO, peso_prior=VOTACAO_PESO_PRIOR,
+                 janela_s=VOTACAO_JANELA_S, ttl_finalizado_s=VOTACAO_TTL_FINALIZADO_S):
+        self.confianca_alvo = float(confianca_alvo)
+        self.peso_prior = max(0.0, float(peso_prior))
+        self.janela_s = float(janela_s)
+        self.ttl_finalizado_s = float(ttl_finalizado_s)
+        self._lock = threading.Lock()
+        # car_id -> {"votos": [dict caractere -> peso] x 7, "leituras": n, "ultima": monotonic, "melhor_frame": (conf, frame)}
+        self._carros = {}
+        self._finalizados = {}  # car_id -> monotonic da finalização
+        self.leituras = 0
+        self.finalizados_consenso = 0
+        self.finalizados_janela = 0
+        self.recortes_descartados = 0
+
+    def _consenso(self, carro):
+        placa = []
+        confiancas = []
+        for votos in carro["votos"]:
+            caractere, peso = max(votos.items(), key=lambda item: item[1])
+            placa.append(caractere)
+            confiancas.append(peso / (sum(votos.values()) + self.peso_prior))
+        return "".join(placa), min(confiancas)
+
+    def _finalizar(self, car_id, agora):
+        carro = self._carros.pop(car_id)
+        self._finalizados[car_id] = agora
+        placa, confianca = self._consenso(carro)
+        return {
+            "car_id": car_id,
+            "frame_nmr": carro["melhor_frame"][1],
+            "placa": placa,
+            "confianca": confianca,
+            "leituras": carro["leituras"],
+        }
+
+    def finalizado(self, car_id, agora=None, contar_descarte=False):
+        """
+        True se o car_id já teve a leitura final (recortes dele não precisam de OCR).
+        Com contar_descarte, o recorte consultado entra na contagem de descartados.
+        """
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            momento = self._finalizados.get(car_id)
+            if momento is None:
+                return False
+            if agora - momento > self.ttl_finalizado_s:
+                del self._finalizados[car_id]
+                return False
+            if contar_descarte:
+                self.recortes_descartados += 1
+            return True
+
+    def adicionar(self, car_id, placa, confianca, frame_nmr=-1, agora=None):
+        """
+        Soma uma leitura aos votos do car_id. Retorna a leitura final (dict com car_id,
+        frame_nmr, placa, confianca, leituras) se o consenso atingiu o alvo, senão None.
+        Leituras fora do formato de 7 caracteres ou de carros já finalizados são ignoradas.
+        """
+        if not placa or len(placa) != TAMANHO_PLACA or confianca is None:
+            return None
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            if car_id in self._finalizados:
+                return None
+            carro = self._carros.get(car_id)
+            if carro is None:
+                carro = {"votos": [{} for _ in range(TAMANHO_PLACA)], "leituras": 0, "melhor_frame": (-1.0, frame_nmr)}
+                self._carros[car_id] = carro
+            for votos, caractere in zip(carro["votos"], placa):
+                votos[caractere] = votos.get(caractere, 0.0) + float(confianca)
+            carro["leituras"] += 1
+            carro["ultima"] = agora
+            self.leituras += 1
+
+            placa_consenso, confianca_consenso = self._consenso(carro)
+            if placa == placa_consenso and confianca > carro["melhor_frame"][0]:
+                carro["melhor_frame"] = (confianca, frame_nmr)
+            if confianca_consenso < self.confianca_alvo:
+                return None
+            self.finalizados_consenso += 1
+            return self._finalizar(car_id, agora)
+
+    def expirados(self, agora=None, forcar=False):
+        """
+        Finaliza com o melhor consenso os carros sem leitura nova há janela_s (todos, com forcar)
+        e devolve a lista de leituras finais. Também esquece car_ids finalizados há mais de ttl.
+        """
+        agora = time.monotonic() if agora is None else agora
+        with self._lock:
+            vencidos = [car_id for car_id, carro in self._carros.items()
+                        if forcar or agora - carro["ultima"] >= self.janela_s]
+            self.finalizados_janela += len(vencidos)
+            finais = [self._finalizar(car_id, agora) for car_id in vencidos]
+            for car_id in [c for c, momento in self._finalizados.items() if agora - momento > self.ttl_finalizado_s]:
+                del self._finalizados[car_id]
+        return finais
+
+    def pendentes(self):
+        """Quantidade de car_ids com votação aberta."""
+        with self._lock:
+            return len(self._carros)
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "confianca_alvo": self.confianca_alvo,
+                "carros_abertos": len(self._carros),
+                "leituras": self.leituras,
+                "finalizados_consenso": self.finalizados_consenso,
+                "finalizados_janela": self.finalizados_janela,
+                "recortes_descartados": self.recortes_descartados,
+            }
+
+    def registrar_metricas(self, registro):
+        """Carros com votação aberta agora e totais de carros finalizados (por consenso ou janela) e de recortes descartados."""
+        registro.medidor("votacao_carros_abertos", "car_ids com votação de placa em aberto",
+                         funcao=lambda: self.resumo()["carros_abertos"])
+        registro.contador("votacao_finalizados_consenso_total", "Carros finalizados ao atingir a confiança alvo do consenso",
+                          funcao=lambda: self.resumo()["finalizados_consenso"])
+        registro.contador("votacao_finalizados_janela_total", "Carros finalizados pelo fim da janela, abaixo da confiança alvo",
+                          funcao=lambda: self.resumo()["finalizados_janela"])
+        registro.contador("votacao_recortes_descartados_total", "Recortes de carros já finalizados descartados sem OCR",
+                          funcao=lambda: self.resumo()["recortes_descartados"])